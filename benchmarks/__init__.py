@@ -0,0 +1,5 @@
+# Benchmarks package
+import os
+
+# Бенчмаркам не нужен настоящий бот, но src.config требует токен при импорте
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
@@ -0,0 +1,176 @@
+"""Корпус HTML-страниц твитов для бенчмарков и регрессионных тестов парсера.
+
+Собрать корпус из дампов DUMP_TWEET_HTML=1 (/tmp/tweet_<id>.html):
+    python -m benchmarks.corpus build /tmp/tweet_*.html
+    python -m benchmarks.corpus build /tmp/tweet_*.html --out benchmarks/corpus --per-kind 5
+
+Дамп анонимизируется: имена пользователей, отображаемые имена, id твитов и
+медиа заменяются стабильными псевдонимами. Текст твитов остаётся как есть -
+перед коммитом его стоит просмотреть. Каждая страница попадает в
+index.json с видами, которые в ней нашёл парсер (plain, quote, poll,
+mosaic, video, photo, translated:<язык заголовка>).
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Optional
+
+from src.twitter.models import Tweet
+from src.twitter.parser import TRANSLATION_HEADER_PATTERNS, normalize_text_breaks, parse_tweet_html
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+INDEX_FILE = "index.json"
+
+# Язык служебной строки "📑 Translated from ..." по шаблону парсера
+HEADER_LANGUAGES = ("en", "ru", "uk", "es", "fr", "de", "it", "pt")
+
+_HANDLE = re.compile(r"@([A-Za-z0-9_]{1,15})\b")
+_URL_HANDLE = re.compile(r"(?:x|twitter|fxtwitter|fixupx|vxtwitter)\.com/([A-Za-z0-9_]{1,15})(?=/status)")
+_QUERY_HANDLE = re.compile(r"([?&](?:author|screen_name)=)([A-Za-z0-9_]{1,15})")
+_DISPLAY_NAME = re.compile(r"([^\n\"<>;]{1,50}?) \(@([A-Za-z0-9_]{1,15})\)")
+_QUOTE_PREFIX = re.compile(r"(?:Quoting|Цитируя|Цитирует|Citando|Citant|Zitiert)\s+")
+_LONG_ID = re.compile(r"\b\d{15,20}\b")
+_MEDIA_ID = re.compile(r"(pbs\.twimg\.com/(?:media|ext_tw_video_thumb/\d+/pu/img|amplify_video_thumb/\d+/img|tweet_video_thumb)/)([A-Za-z0-9_-]+)")
+_MOSAIC = re.compile(r"(mosaic\.fxtwitter\.com/\w+/\d+)((?:/[A-Za-z0-9_-]+)+)")
+_VIDEO_FILE = re.compile(r"(video\.twimg\.com/[^\"'\s]*/)([A-Za-z0-9_-]+)(\.mp4)")
+_PROFILE_IMAGE = re.compile(r"https://pbs\.twimg\.com/profile_images/[^\"'\s]+")
+
+
+def _digest(value: str, length: int, digits: bool = False) -> str:
+    raw = hashlib.sha256(value.encode()).hexdigest()
+    if digits:
+        return str(int(raw, 16))[:length].rjust(length, "1")
+    return raw[:length]
+
+
+def anonymize(html: str, url: str) -> tuple[str, str]:
+    """Заменяет идентификаторы в странице и ссылке стабильными псевдонимами"""
+    handles: dict[str, str] = {}
+    for match in [*_URL_HANDLE.finditer(url), *_URL_HANDLE.finditer(html), *_HANDLE.finditer(html),
+                  *_QUERY_HANDLE.finditer(html)]:
+        handle = match.group(match.re.groups).lower()
+        if handle not in handles and handle not in ("status", "i"):
+            handles[handle] = f"user{len(handles) + 1}"
+
+    names: dict[str, str] = {}
+    for match in _DISPLAY_NAME.finditer(html):
+        name = _QUOTE_PREFIX.split(match.group(1).strip())[-1].strip()
+        alias = handles.get(match.group(2).lower())
+        if name and alias and name not in names:
+            names[name] = f"User {alias[4:]}"
+
+    def replace(text: str) -> str:
+        for name, alias in sorted(names.items(), key=lambda item: -len(item[0])):
+            # Имя, совпадающее с username, не трогаем внутри @упоминаний и ссылок
+            text = re.sub(r"(?<![@/=\w])" + re.escape(name) + r"(?!\w)", alias, text)
+        text = _PROFILE_IMAGE.sub("https://pbs.twimg.com/profile_images/0/avatar.jpg", text)
+        text = _MOSAIC.sub(lambda m: m.group(1) + "".join(
+            "/" + _digest(part, len(part)) for part in m.group(2).split("/") if part
+        ), text)
+        text = _MEDIA_ID.sub(lambda m: m.group(1) + _digest(m.group(2), len(m.group(2))), text)
+        text = _VIDEO_FILE.sub(lambda m: m.group(1) + _digest(m.group(2), len(m.group(2))) + m.group(3), text)
+        text = _LONG_ID.sub(lambda m: _digest(m.group(0), len(m.group(0)), digits=True), text)
+        text = _HANDLE.sub(lambda m: "@" + handles.get(m.group(1).lower(), m.group(1)), text)
+        text = _QUERY_HANDLE.sub(lambda m: m.group(1) + handles.get(m.group(2).lower(), m.group(2)), text)
+        return _URL_HANDLE.sub(
+            lambda m: m.group(0).replace(m.group(1), handles.get(m.group(1).lower(), m.group(1))), text
+        )
+
+    return replace(html), replace(url)
+
+
+def header_language(html: str) -> Optional[str]:
+    """Язык служебной строки перевода в og:description"""
+    match = re.search(r'property="og:description"\s+content="([^"]*)"', html)
+    if not match:
+        return None
+    first_line = next((line for line in normalize_text_breaks(match.group(1)).split("\n") if line.strip()), "")
+    cleaned = re.sub(r"\s+", " ", first_line.lstrip("📑 ").replace("’", "'"))
+    for pattern, language in zip(TRANSLATION_HEADER_PATTERNS, HEADER_LANGUAGES):
+        if re.match(pattern, cleaned, flags=re.IGNORECASE):
+            return language
+    return None
+
+
+def classify(tweet: Tweet, html: str) -> list[str]:
+    """Виды страницы, которые нашёл парсер"""
+    kinds = []
+    if tweet.quoted_tweet:
+        kinds.append("quote")
+    if tweet.poll:
+        kinds.append("poll")
+    if "mosaic.fxtwitter.com" in html:
+        kinds.append("mosaic")
+    elif any(item.type == "video" for item in tweet.media):
+        kinds.append("video")
+    elif tweet.media:
+        kinds.append("photo")
+    if tweet.source_language or tweet.translated_text:
+        kinds.append(f"translated:{header_language(html) or 'other'}")
+    return kinds or ["plain"]
+
+
+def load_corpus(directory: Path = CORPUS_DIR) -> list[dict]:
+    """Записи index.json с добавленным полем html"""
+    entries = json.loads((directory / INDEX_FILE).read_text(encoding="utf-8"))
+    for entry in entries:
+        entry["html"] = (directory / entry["file"]).read_text(encoding="utf-8")
+    return entries
+
+
+def build(dumps: list[Path], directory: Path, per_kind: int) -> list[dict]:
+    """Добавляет дампы в корпус, не больше per_kind страниц на набор видов"""
+    directory.mkdir(parents=True, exist_ok=True)
+    index_path = directory / INDEX_FILE
+    entries = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else []
+    counts: dict[str, int] = {}
+    for entry in entries:
+        key = "+".join(entry["kinds"])
+        counts[key] = counts.get(key, 0) + 1
+
+    added = []
+    for dump in dumps:
+        match = re.search(r"tweet_(\d+)\.html$", dump.name)
+        if not match:
+            continue
+        raw = dump.read_text(encoding="utf-8")
+        html, url = anonymize(raw, f"https://x.com/i/status/{match.group(1)}")
+        tweet = parse_tweet_html(html, url)
+        if tweet is None:
+            print(f"{dump}: парсер не разобрал страницу, пропускаю", file=sys.stderr)
+            continue
+        kinds = classify(tweet, html)
+        key = "+".join(kinds)
+        if counts.get(key, 0) >= per_kind:
+            continue
+        counts[key] = counts.get(key, 0) + 1
+        name = f"{key.replace(':', '_').replace('+', '_')}_{counts[key]}.html"
+        (directory / name).write_text(html, encoding="utf-8")
+        entry = {"file": name, "url": url, "kinds": kinds}
+        entries.append(entry)
+        added.append(entry)
+
+    index_path.write_text(json.dumps(entries, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="Добавить дампы в корпус")
+    build_parser.add_argument("dumps", nargs="+", type=Path, help="Файлы /tmp/tweet_<id>.html")
+    build_parser.add_argument("--out", type=Path, default=CORPUS_DIR, help="Каталог корпуса")
+    build_parser.add_argument("--per-kind", type=int, default=3, help="Страниц на один набор видов")
+    args = parser.parse_args()
+
+    added = build(args.dumps, args.out, args.per_kind)
+    for entry in added:
+        print(f"{entry['file']}: {', '.join(entry['kinds'])}")
+    print(f"Добавлено страниц: {len(added)}")
+
+
+if __name__ == "__main__":
+    main()
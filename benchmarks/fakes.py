@@ -0,0 +1,225 @@
+"""Локальные заменители FxTwitter и Telegram Bot API для нагрузочных тестов.
+
+Оба сервера - минимальный HTTP/1.1 на asyncio с keep-alive, без внешних
+зависимостей. Задержки и доля ошибок задаются параметрами, чтобы
+воспроизводить медленные и нестабильные источники.
+"""
+import asyncio
+import email.parser
+import io
+import json
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+# (статус, Content-Type, тело)
+Response = tuple[int, str, bytes]
+Handler = Callable[[str, str, dict, bytes], Awaitable[Response]]
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 503: "Service Unavailable"}
+
+
+async def serve_http(handler: Handler, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+    """HTTP-сервер: handler(метод, путь, заголовки, тело) -> (статус, тип, тело)"""
+
+    async def on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = b""
+                if headers.get("content-length"):
+                    body = await reader.readexactly(int(headers["content-length"]))
+                method, path = request_line.decode("latin-1").split()[:2]
+                status, content_type, payload = await handler(method, path, headers, body)
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, 'Status')}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(on_connection, host, port)
+
+
+def make_photo(width: int = 1600, height: int = 900, seed: int = 0) -> bytes:
+    """JPEG с шумом: плохо сжимается, размер близок к настоящим фото"""
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+# Виды твитов и их доли по умолчанию
+DEFAULT_MIX = {"text": 0.3, "photo": 0.4, "album": 0.1, "video": 0.2}
+
+
+@dataclass
+class FakeFxTwitter:
+    """Страницы твитов с Open Graph разметкой, JSON API и сами медиа"""
+    latency: float = 0.05
+    media_latency: float = 0.02
+    error_rate: float = 0.0
+    mix: dict = field(default_factory=lambda: dict(DEFAULT_MIX))
+    photo_bytes: bytes = b""
+    video_bytes: bytes = b""
+    base_url: str = ""
+    requests: Counter = field(default_factory=Counter)
+
+    def __post_init__(self):
+        self._rng = random.Random(1)
+        if not self.photo_bytes:
+            self.photo_bytes = make_photo()
+        if not self.video_bytes:
+            self.video_bytes = random.Random(2).randbytes(2 * 1024 * 1024)
+
+    def kind(self, tweet_id: int) -> str:
+        """Вид твита детерминированно зависит от id"""
+        point = random.Random(tweet_id).random()
+        for kind, share in self.mix.items():
+            if point < share:
+                return kind
+            point -= share
+        return "text"
+
+    async def _delay(self, mean: float):
+        if mean > 0:
+            await asyncio.sleep(mean * self._rng.uniform(0.5, 1.5))
+
+    def _html(self, username: str, tweet_id: int) -> str:
+        kind = self.kind(tweet_id)
+        media = f"{self.base_url}/media"
+        tags = [
+            f'<meta property="og:title" content="Load Test (@{username})" />',
+            f'<meta property="og:description" content="Синтетический твит {tweet_id} для нагрузочного теста" />',
+            '<meta property="article:published_time" content="2026-01-01T00:00:00Z" />',
+        ]
+        if kind == "photo":
+            tags.append(f'<meta property="og:image" content="{media}/{tweet_id}_0.jpg" />')
+        elif kind == "album":
+            tags.append(f'<meta property="og:image" content="{media}/{tweet_id}_0.jpg" />')
+            tags += [
+                f'<meta property="twitter:image:{i}" content="{media}/{tweet_id}_{i}.jpg" />'
+                for i in range(1, 4)
+            ]
+        elif kind == "video":
+            tags.append(f'<meta property="og:video" content="{media}/{tweet_id}.mp4" />')
+            tags.append(f'<meta property="og:image" content="{media}/amplify_video_thumb/{tweet_id}.jpg" />')
+        return "<html><head>" + "".join(tags) + "</head><body></body></html>"
+
+    async def __call__(self, method: str, path: str, headers: dict, body: bytes) -> Response:
+        parts = urlparse(path).path.strip("/").split("/")
+        if parts[0] == "media":
+            self.requests["media"] += 1
+            await self._delay(self.media_latency)
+            if parts[-1].endswith(".mp4"):
+                return 200, "video/mp4", self.video_bytes
+            return 200, "image/jpeg", self.photo_bytes
+
+        self.requests["page"] += 1
+        await self._delay(self.latency)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.requests["errors"] += 1
+            return 503, "text/plain", b"unavailable"
+        if parts[0] == "api" and len(parts) >= 3 and parts[2].isdigit():
+            tweet = {"id": parts[2], "text": f"Синтетический твит {parts[2]}", "author": {"screen_name": "loadtest"}}
+            return 200, "application/json", json.dumps({"code": 200, "tweet": tweet}).encode()
+        if len(parts) >= 3 and parts[1] == "status" and parts[2].isdigit():
+            return 200, "text/html; charset=utf-8", self._html(parts[0], int(parts[2])).encode()
+        return 404, "text/plain", b"not found"
+
+
+def _form_fields(headers: dict, body: bytes) -> dict:
+    """Поля запроса Bot API: x-www-form-urlencoded, multipart или JSON"""
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + body
+        )
+        fields = {}
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            if name and not part.get_filename():
+                fields[name] = part.get_payload(decode=True).decode()
+        return fields
+    if content_type.startswith("application/json"):
+        return {key: json.dumps(value) if not isinstance(value, str) else value
+                for key, value in json.loads(body or b"{}").items()}
+    return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+
+@dataclass
+class FakeBotApi:
+    """Принимает вызовы Bot API и записывает, сколько их было и когда"""
+    latency: float = 0.03
+    calls: Counter = field(default_factory=Counter)
+    first_call: Optional[float] = None
+    last_call: Optional[float] = None
+
+    def __post_init__(self):
+        self._rng = random.Random(3)
+        self._message_id = 0
+
+    def _message(self, chat_id: int, media_type: Optional[str] = None) -> dict:
+        self._message_id += 1
+        message = {
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": "Load"},
+        }
+        file = {"file_id": f"file{self._message_id}", "file_unique_id": f"u{self._message_id}",
+                "width": 1280, "height": 720}
+        if media_type == "photo":
+            message["photo"] = [file]
+        elif media_type == "video":
+            message["video"] = {**file, "duration": 10}
+        return message
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "first_call": self.first_call, "last_call": self.last_call}
+
+    async def __call__(self, method: str, path: str, headers: dict, body: bytes) -> Response:
+        api_method = path.rstrip("/").rsplit("/", 1)[-1]
+        if api_method == "stats":
+            return 200, "application/json", json.dumps(self.stats()).encode()
+
+        now = time.time()
+        self.first_call = self.first_call or now
+        self.last_call = now
+        self.calls[api_method] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency * self._rng.uniform(0.5, 1.5))
+
+        fields = _form_fields(headers, body)
+        chat_id = int(fields.get("chat_id", 0) or 0)
+        if api_method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Load Test", "username": "loadtest_bot"}
+        elif api_method == "sendMediaGroup":
+            media = json.loads(fields.get("media", "[]"))
+            result = [self._message(chat_id, item.get("type")) for item in media]
+        elif api_method in ("sendPhoto", "sendVideo"):
+            result = self._message(chat_id, api_method[4:].lower())
+        elif api_method.startswith("send") and api_method != "sendChatAction" or api_method.startswith("edit"):
+            result = self._message(chat_id)
+        else:
+            result = True
+        return 200, "application/json", json.dumps({"ok": True, "result": result}).encode()
@@ -0,0 +1,215 @@
+"""Нагрузочный тест всего конвейера на локальных FxTwitter и Bot API.
+
+Запуск из корня репозитория:
+    python -m benchmarks.loadtest --updates 500 --rate 50
+    python -m benchmarks.loadtest --updates 2000 --rate 200 --fx-latency 0.3 --fx-error-rate 0.05 --json
+
+Заменители источников (benchmarks/fakes.py) работают в отдельном процессе,
+поэтому CPU и RSS в отчёте - только самого бота. Синтетические сообщения
+проходят через настоящий handle_message: rate limit, кэши, загрузку и
+разбор HTML, скачивание и сжатие медиа, отправку в Telegram.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import time
+from typing import Optional
+
+import httpx
+
+from benchmarks.fakes import DEFAULT_MIX, FakeBotApi, FakeFxTwitter, serve_http
+
+BOT_TOKEN = "123456:LOADTEST"
+
+
+def _run_fakes(args: argparse.Namespace, ports: "multiprocessing.Queue"):
+    """Процесс с заменителями: сообщает порты и работает до завершения родителя"""
+
+    async def main():
+        fx = FakeFxTwitter(
+            latency=args.fx_latency,
+            media_latency=args.media_latency,
+            error_rate=args.fx_error_rate,
+            mix=_parse_mix(args.mix),
+        )
+        fx_server = await serve_http(fx)
+        fx.base_url = f"http://127.0.0.1:{fx_server.sockets[0].getsockname()[1]}"
+        bot_server = await serve_http(FakeBotApi(latency=args.bot_latency))
+        ports.put((fx.base_url, f"http://127.0.0.1:{bot_server.sockets[0].getsockname()[1]}"))
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def _parse_mix(text: Optional[str]) -> dict:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        kind, _, share = part.partition("=")
+        mix[kind.strip()] = float(share)
+    total = sum(mix.values()) or 1
+    return {kind: share / total for kind, share in mix.items()}
+
+
+def _rss_mb() -> tuple[float, float]:
+    """Текущий и пиковый RSS процесса в МБ"""
+    current = peak = 0.0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return current, peak
+
+
+def _percentile(values: list[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(args: argparse.Namespace, fx_url: str, bot_url: str) -> dict:
+    # Конфигурация читается при импорте модулей бота, поэтому импорты здесь
+    from telegram import Update
+    from telegram.ext import Application, MessageHandler, filters
+    from src.handlers.messages import handle_message
+    from src.utils.metrics import CARDS_TOTAL, STAGE_SECONDS
+
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(f"{bot_url}/bot")
+        .base_file_url(f"{bot_url}/file/bot")
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    await application.initialize()
+
+    latencies: list[float] = []
+
+    async def one(index: int):
+        user_id = 10_000 + index % args.users
+        tweet_id = 1_000_000 + index % args.tweets
+        update = Update.de_json({
+            "update_id": index + 1,
+            "message": {
+                "message_id": index + 1,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": "Load"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+                "text": f"https://x.com/loadtest/status/{tweet_id}",
+            },
+        }, application.bot)
+        started = time.perf_counter()
+        await application.process_update(update)
+        latencies.append(time.perf_counter() - started)
+
+    cpu_started = os.times()
+    started = time.perf_counter()
+    tasks = []
+    for index in range(args.updates):
+        delay = started + index / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(index)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    cpu_finished = os.times()
+
+    async with httpx.AsyncClient() as client:
+        bot_stats = (await client.get(f"{bot_url}/bot{BOT_TOKEN}/stats")).json()
+    await application.shutdown()
+
+    cpu = (cpu_finished.user - cpu_started.user) + (cpu_finished.system - cpu_started.system)
+    rss, rss_peak = _rss_mb()
+    return {
+        "updates": args.updates,
+        "rate": args.rate,
+        "elapsed": elapsed,
+        "cards_ok": CARDS_TOTAL.value(result="ok"),
+        "cards_failed": CARDS_TOTAL.value(result="failed"),
+        "cards_per_sec": CARDS_TOTAL.value(result="ok") / elapsed,
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p95": _percentile(latencies, 0.95),
+        "latency_p99": _percentile(latencies, 0.99),
+        "latency_max": max(latencies, default=None),
+        "stage_p95": {
+            labels["stage"]: STAGE_SECONDS.quantile(0.95, stage=labels["stage"])
+            for labels in STAGE_SECONDS.label_values()
+        },
+        "cpu_seconds": cpu,
+        "cpu_percent": cpu / elapsed * 100,
+        "rss_mb": rss,
+        "rss_peak_mb": rss_peak,
+        "bot_api_calls": bot_stats["calls"],
+    }
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value * 1000:,.0f} мс" if value is not None else "—"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=500, help="Сколько сообщений отправить")
+    parser.add_argument("--rate", type=float, default=50, help="Сообщений в секунду")
+    parser.add_argument("--users", type=int, default=100_000, help="Число разных пользователей (личных чатов)")
+    parser.add_argument("--tweets", type=int, default=100_000, help="Число разных твитов; меньше --updates - повторы из кэша")
+    parser.add_argument("--mix", help="Доли видов твитов, например text=0.3,photo=0.4,album=0.1,video=0.2")
+    parser.add_argument("--fx-latency", type=float, default=0.05, help="Средняя задержка страниц FxTwitter (сек)")
+    parser.add_argument("--fx-error-rate", type=float, default=0.0, help="Доля ответов 503 от FxTwitter")
+    parser.add_argument("--media-latency", type=float, default=0.02, help="Средняя задержка отдачи медиа (сек)")
+    parser.add_argument("--bot-latency", type=float, default=0.03, help="Средняя задержка Bot API (сек)")
+    parser.add_argument("--json", action="store_true", help="Вывести результат одним JSON для сравнения прогонов")
+    args = parser.parse_args()
+
+    ports: multiprocessing.Queue = multiprocessing.Queue()
+    fakes = multiprocessing.Process(target=_run_fakes, args=(args, ports), daemon=True)
+    fakes.start()
+    fx_url, bot_url = ports.get(timeout=30)
+
+    os.environ.update({
+        "BOT_TOKEN": BOT_TOKEN,
+        "FX_BASE_URL": fx_url,
+        "FX_MIRRORS": fx_url,
+        "TELEGRAM_USER_IDS": "",
+        "STORAGE_PATH": ":memory:",
+        "STATE_BACKEND_URL": "memory://",
+    })
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        result = asyncio.run(run(args, fx_url, bot_url))
+    finally:
+        fakes.terminate()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    print(f"Сообщений:           {result['updates']:,} за {result['elapsed']:.1f}с ({args.rate:g}/с)")
+    print(f"Карточек:            {result['cards_ok']:,.0f} успешно, {result['cards_failed']:,.0f} с ошибкой")
+    print(f"Карточек в секунду:  {result['cards_per_sec']:,.1f}")
+    print(f"Задержка:            p50 {_ms(result['latency_p50'])}, p95 {_ms(result['latency_p95'])}, "
+          f"p99 {_ms(result['latency_p99'])}, max {_ms(result['latency_max'])}")
+    print("p95 этапов:          " + ", ".join(
+        f"{stage} {_ms(value)}" for stage, value in sorted(result["stage_p95"].items())
+    ))
+    print(f"CPU:                 {result['cpu_seconds']:.1f}с ({result['cpu_percent']:.0f}%)")
+    print(f"RSS:                 {result['rss_mb']:.0f} МБ, пик {result['rss_peak_mb']:.0f} МБ")
+    print("Вызовы Bot API:      " + ", ".join(
+        f"{method} {count}" for method, count in sorted(result["bot_api_calls"].items())
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Бенчмарк медиа-конвейера: скачивание с локального сервера, сжатие, проверка размера.
+
+Запуск из корня репозитория:
+    python -m benchmarks.media
+    python -m benchmarks.media --max-mb 5 --image-size 6000x4000 --video-seconds 10 --json
+
+Картинки (PNG, JPEG, WebP) генерируются Pillow, ролики (h264, vp9) -
+ffmpeg; без ffmpeg видео пропускаются. Каждый файл проходит тот же путь,
+что и в боте: download_media_file через локальный HTTP-сервер, затем
+compress_image/compress_video. В отчёте - время, CPU (вместе с дочерними
+процессами ffmpeg), размер до и после, укладывается ли результат в
+MAX_MEDIA_MB и сколько раз пришлось кодировать.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Optional
+
+from PIL import Image
+
+from benchmarks.fakes import serve_http
+from src.config import config
+from src.media.compress import compress_image, compress_video
+from src.media.download import download_media_file
+from src.utils.metrics import COMPRESS_ATTEMPTS
+
+IMAGE_FORMATS = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+VIDEO_CODECS = {"h264": ("libx264", ".mp4"), "vp9": ("libvpx-vp9", ".webm")}
+
+
+def make_image(width: int, height: int, image_format: str) -> bytes:
+    """Похожее на фото изображение: градиент с шумом, плохо сжимается без потерь"""
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 64)
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    buffer = io.BytesIO()
+    options = {"quality": 95} if image_format != "png" else {}
+    image.save(buffer, IMAGE_FORMATS[image_format], **options)
+    return buffer.getvalue()
+
+
+def make_video(codec: str, seconds: float, size: str, bitrate: str) -> Optional[bytes]:
+    """Тестовый ролик с шумом, чтобы кодеку было что сжимать"""
+    encoder, suffix = VIDEO_CODECS[codec]
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="bench_video_")
+    os.close(fd)
+    try:
+        cmd = [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30,noise=alls=40:allf=t",
+            "-f", "lavfi", "-i", "sine=frequency=440",
+            "-t", str(seconds), "-c:v", encoder, "-b:v", bitrate, "-c:a",
+            "aac" if codec == "h264" else "libopus", path,
+        ]
+        result = subprocess.run(cmd, capture_output=True)
+        if result.returncode != 0:
+            print(f"ffmpeg не смог создать {codec}: {result.stderr.decode()[-200:]}")
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def _cpu() -> float:
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+async def _measure(name: str, media_type: str, url: str, source_bytes: int) -> dict:
+    attempts_before = COMPRESS_ATTEMPTS.value(type=media_type)
+    wall_started, cpu_started = time.perf_counter(), _cpu()
+    path = await download_media_file(url, media_type)
+    downloaded = time.perf_counter()
+    compress = compress_image if media_type == "photo" else compress_video
+    output = compress(path)
+    wall, cpu = time.perf_counter() - wall_started, _cpu() - cpu_started
+
+    output_bytes = os.path.getsize(output)
+    for file_path in {path, output}:
+        os.remove(file_path)
+    return {
+        "name": name,
+        "type": media_type,
+        "input_mb": source_bytes / 1024 / 1024,
+        "output_mb": output_bytes / 1024 / 1024,
+        "fits": output_bytes <= config.MAX_MEDIA_MB * 1024 * 1024,
+        "download_seconds": downloaded - wall_started,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "attempts": int(COMPRESS_ATTEMPTS.value(type=media_type) - attempts_before),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    width, height = (int(part) for part in args.image_size.split("x"))
+    samples: dict[str, tuple[str, bytes]] = {}
+    for image_format in args.image_formats.split(","):
+        samples[f"{image_format}-{args.image_size}"] = ("photo", make_image(width, height, image_format))
+    if shutil.which("ffmpeg"):
+        for codec in args.video_codecs.split(","):
+            data = make_video(codec, args.video_seconds, args.video_size, args.video_bitrate)
+            if data:
+                samples[f"{codec}-{args.video_size}-{args.video_seconds:g}s"] = ("video", data)
+    else:
+        print("ffmpeg не найден: видео пропущены")
+
+    async def handler(method: str, path: str, headers: dict, body: bytes):
+        media_type, data = samples[path.strip("/").split("/")[-1].rsplit(".", 1)[0]]
+        return 200, "video/mp4" if media_type == "video" else "application/octet-stream", data
+
+    server = await serve_http(handler)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    results = []
+    try:
+        for name, (media_type, data) in samples.items():
+            extension = name.split("-", 1)[0].replace("jpeg", "jpg") if media_type == "photo" else "mp4"
+            for _ in range(args.repeat):
+                results.append(await _measure(name, media_type, f"{base_url}/{name}.{extension}", len(data)))
+    finally:
+        server.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-mb", type=float, default=config.MAX_MEDIA_MB, help="MAX_MEDIA_MB для прогона")
+    parser.add_argument("--image-size", default="4000x3000", help="Размер картинок ШxВ")
+    parser.add_argument("--image-formats", default="png,jpeg,webp", help="Форматы картинок")
+    parser.add_argument("--video-codecs", default="h264,vp9", help="Кодеки роликов")
+    parser.add_argument("--video-size", default="1920x1080", help="Размер роликов ШxВ")
+    parser.add_argument("--video-seconds", type=float, default=10, help="Длительность роликов")
+    parser.add_argument("--video-bitrate", default="40M", help="Битрейт исходных роликов")
+    parser.add_argument("--repeat", type=int, default=1, help="Прогонов каждого файла")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    config.MAX_MEDIA_MB = args.max_mb
+    config.COMPRESS_MEDIA = True
+    results = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps({"max_media_mb": args.max_mb, "results": results}, indent=2))
+        return
+    print(f"MAX_MEDIA_MB = {args.max_mb:g}")
+    print(f"{'файл':<24}{'вход МБ':>9}{'выход МБ':>10}{'влез':>6}{'время с':>9}{'CPU с':>8}{'попыток':>9}")
+    for result in results:
+        print(
+            f"{result['name']:<24}{result['input_mb']:>9.1f}{result['output_mb']:>10.1f}"
+            f"{'да' if result['fits'] else 'нет':>6}{result['wall_seconds']:>9.2f}"
+            f"{result['cpu_seconds']:>8.2f}{result['attempts']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
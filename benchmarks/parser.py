@@ -0,0 +1,170 @@
+"""Бенчмарк разбора и форматирования твитов на корпусе benchmarks/corpus.
+
+Запуск из корня репозитория:
+    python -m benchmarks.parser
+    python -m benchmarks.parser --json --save-baseline benchmarks/baseline-parser.json
+    python -m benchmarks.parser --baseline benchmarks/baseline-parser.json --max-regression 0.1
+    python -m benchmarks.parser --against HEAD~1
+
+Для каждой функции берётся лучшее из --repeat измерений по --rounds
+проходам корпуса; результат - микросекунды на страницу. С --baseline
+выводится изменение относительно сохранённого прогона, а код возврата 1
+означает замедление больше --max-regression.
+
+--against REF загружает parser.py и text_format.py из git-ревизии и
+меряет обе версии вперемешку в одном процессе: так шум машины почти не
+влияет на разницу, и видны изменения в единицы процентов.
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Optional
+
+from benchmarks.corpus import CORPUS_DIR, load_corpus
+from src.twitter.parser import parse_tweet_html
+from src.utils.text_format import clean_tweet_text, format_tweet_card
+
+
+def _time(call: Callable[[], object], rounds: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            call()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _load_revision(ref: str, path: str, name: str) -> ModuleType:
+    """Модуль из git-ревизии; логгер общий с текущей версией"""
+    source = subprocess.run(["git", "show", f"{ref}:{path}"], capture_output=True, check=True, text=True).stdout
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False, encoding="utf-8") as f:
+        f.write(source)
+    try:
+        spec = importlib.util.spec_from_file_location(name, f.name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        Path(f.name).unlink()
+    module.logger = logging.getLogger(path.replace("/", ".")[:-3])
+    return module
+
+
+def _calls(pages: list, parse: Callable, format_card: Callable, clean: Callable) -> dict:
+    tweets = [parse(html, url) for html, url in pages]
+
+    def parse_all():
+        for html, url in pages:
+            parse(html, url)
+
+    def format_all():
+        for tweet in tweets:
+            format_card(tweet, include_translation=True)
+
+    def clean_all():
+        for tweet in tweets:
+            clean(tweet.text)
+
+    return {"parse_tweet_html": parse_all, "format_tweet_card": format_all, "clean_tweet_text": clean_all}
+
+
+def run(corpus: Path, rounds: int, repeat: int, against: Optional[str] = None) -> dict:
+    entries = load_corpus(corpus)
+    pages = [(entry["html"], entry["url"]) for entry in entries]
+    current = _calls(pages, parse_tweet_html, format_tweet_card, clean_tweet_text)
+    previous = None
+    if against:
+        old_parser = _load_revision(against, "src/twitter/parser.py", "_baseline_parser")
+        old_format = _load_revision(against, "src/utils/text_format.py", "_baseline_text_format")
+        previous = _calls(pages, old_parser.parse_tweet_html, old_format.format_tweet_card,
+                          old_format.clean_tweet_text)
+
+    functions = {}
+    for name, call in current.items():
+        if previous is None:
+            seconds = _time(call, rounds, repeat)
+        else:
+            # Вперемешку, чтобы обе версии попали в одинаковые условия
+            seconds, before = float("inf"), float("inf")
+            for _ in range(repeat):
+                seconds = min(seconds, _time(call, rounds, 1))
+                before = min(before, _time(previous[name], rounds, 1))
+        functions[name] = {"us_per_page": seconds / (rounds * len(pages)) * 1e6}
+        if previous is not None:
+            functions[name]["against_us_per_page"] = before / (rounds * len(pages)) * 1e6
+            functions[name]["change"] = seconds / before - 1
+
+    return {
+        "pages": len(pages),
+        "kinds": sorted({kind for entry in entries for kind in entry["kinds"]}),
+        "log_level": logging.getLevelName(logging.getLogger().level),
+        "python": platform.python_version(),
+        "functions": functions,
+    }
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Функции, которые замедлились больше допустимого"""
+    regressions = []
+    for name, stats in result["functions"].items():
+        before = baseline.get("functions", {}).get(name)
+        if not before:
+            continue
+        change = stats["us_per_page"] / before["us_per_page"] - 1
+        stats["change"] = change
+        if change > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR, help="Каталог корпуса с index.json")
+    parser.add_argument("--rounds", type=int, default=20, help="Проходов корпуса в одном измерении")
+    parser.add_argument("--repeat", type=int, default=5, help="Измерений; берётся лучшее")
+    parser.add_argument("--log-level", default="INFO", help="Уровень логирования во время замеров")
+    parser.add_argument("--baseline", type=Path, help="Сравнить с сохранённым результатом")
+    parser.add_argument("--against", metavar="REF", help="Сравнить с версией из git-ревизии в том же процессе")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Допустимое замедление (доля)")
+    parser.add_argument("--save-baseline", type=Path, help="Сохранить результат как baseline")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    # Логи форматируются (или нет) как в проде, но никуда не пишутся
+    logging.basicConfig(level=args.log_level.upper(), handlers=[logging.NullHandler()])
+
+    result = run(args.corpus, args.rounds, args.repeat, args.against)
+    regressions = [
+        name for name, stats in result["functions"].items() if stats.get("change", 0) > args.max_regression
+    ]
+    if args.baseline:
+        regressions = compare(result, json.loads(args.baseline.read_text()), args.max_regression)
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(result, indent=2) + "\n")
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Страниц: {result['pages']} ({', '.join(result['kinds'])}), логи {result['log_level']}")
+        for name, stats in result["functions"].items():
+            line = f"{name:<20} {stats['us_per_page']:>10,.1f} мкс/страницу"
+            if "against_us_per_page" in stats:
+                line += f"  (было {stats['against_us_per_page']:,.1f})"
+            if "change" in stats:
+                line += f"  {stats['change'] * 100:+.1f}%"
+            print(line)
+    if regressions:
+        print(f"Замедление больше {args.max_regression * 100:.0f}%: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
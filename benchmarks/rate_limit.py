@@ -0,0 +1,61 @@
+"""Бенчмарк token bucket'ов rate limiter'а на миллионах разных пользователей.
+
+Запуск из корня репозитория:
+    python -m benchmarks.rate_limit --users 2000000 --rps 20000
+
+Часы виртуальные: запросы идут с частотой --rps, поэтому результат не
+зависит от скорости машины, кроме пропускной способности.
+"""
+import argparse
+import random
+import time
+from src.utils.token_bucket import TokenBuckets
+
+
+def run(users: int, rps: float, burst: int, interval: float, chats: int) -> dict:
+    clock = [0.0]
+    buckets = TokenBuckets(lambda: clock[0])
+    rate = 1.0 / interval
+    rng = random.Random(42)
+    allowed = 0
+    peak = 0
+
+    started = time.perf_counter()
+    for i in range(users):
+        clock[0] = i / rps
+        chat_id = rng.randrange(chats)
+        cost = 1 if rng.random() < 0.9 else rng.randint(2, 4)
+        if buckets.take([(f"rl:user:{i}", burst, rate, cost), (f"rl:chat:{chat_id}", burst * 2, rate, cost)]):
+            allowed += 1
+        if len(buckets) > peak:
+            peak = len(buckets)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": users,
+        "allowed": allowed,
+        "ops_per_sec": users / elapsed,
+        "peak_buckets": peak,
+        "final_buckets": len(buckets),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2_000_000, help="Число разных пользователей (по запросу на каждого)")
+    parser.add_argument("--rps", type=float, default=20_000, help="Частота запросов виртуальных часов")
+    parser.add_argument("--burst", type=int, default=3, help="Ёмкость bucket'а пользователя")
+    parser.add_argument("--interval", type=float, default=5.0, help="Секунд на пополнение одного токена")
+    parser.add_argument("--chats", type=int, default=100_000, help="Число разных чатов")
+    args = parser.parse_args()
+
+    result = run(args.users, args.rps, args.burst, args.interval, args.chats)
+    print(f"Запросов:            {result['requests']:,}")
+    print(f"Пропущено:           {result['allowed']:,}")
+    print(f"Операций в секунду:  {result['ops_per_sec']:,.0f}")
+    print(f"Пик bucket'ов:       {result['peak_buckets']:,}")
+    print(f"Bucket'ов в конце:   {result['final_buckets']:,}")
+
+
+if __name__ == "__main__":
+    main()
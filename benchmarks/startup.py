@@ -0,0 +1,124 @@
+"""Время старта бота по `python -X importtime`.
+
+Запуск из корня репозитория:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --module src.handlers.messages --top 30 --json
+    python -m benchmarks.startup --budget-ms 600
+
+Модуль импортируется в отдельном интерпретаторе --repeat раз; для каждого
+модуля берётся медиана. В отчёте - общее время импорта, самые дорогие
+модули (собственное и накопленное время) и сумма по пакетам верхнего
+уровня. Код возврата 1 - если при старте загрузился модуль из --forbid
+(тяжёлые модули должны импортироваться при первом использовании) или
+время импорта больше --budget-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Загружаются лениво: при старте их быть не должно
+DEFAULT_FORBIDDEN = "bs4,lxml,PIL,tenacity"
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    """(модуль, собственное мкс, накопленное мкс) из вывода -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # Строка-заголовок
+            continue
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module: str) -> list[tuple[str, int, int]]:
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "123456:STARTUP")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} завершился с ошибкой:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def run(module: str, repeat: int) -> dict:
+    samples: dict[str, list[tuple[int, int]]] = {}
+    totals = []
+    for _ in range(repeat):
+        rows = measure(module)
+        for name, self_us, cumulative_us in rows:
+            samples.setdefault(name, []).append((self_us, cumulative_us))
+        totals.append(sum(self_us for _, self_us, _ in rows))
+
+    modules = {
+        name: {
+            "self_ms": statistics.median(self_us for self_us, _ in values) / 1000,
+            "cumulative_ms": statistics.median(cumulative_us for _, cumulative_us in values) / 1000,
+        }
+        for name, values in samples.items()
+    }
+    packages: dict[str, float] = {}
+    for name, stats in modules.items():
+        top = name.split(".", 1)[0]
+        packages[top] = packages.get(top, 0.0) + stats["self_ms"]
+    return {
+        "module": module,
+        "repeat": repeat,
+        "python": sys.version.split()[0],
+        "total_ms": statistics.median(totals) / 1000,
+        "modules": modules,
+        "packages": dict(sorted(packages.items(), key=lambda item: -item[1])),
+    }
+
+
+def forbidden_imports(result: dict, forbidden: list[str]) -> list[str]:
+    """Запрещённые пакеты, которые загрузились при импорте"""
+    loaded = {name.split(".", 1)[0] for name in result["modules"]}
+    return [name for name in forbidden if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.bot", help="Что импортировать")
+    parser.add_argument("--repeat", type=int, default=5, help="Прогонов; берётся медиана")
+    parser.add_argument("--top", type=int, default=15, help="Сколько модулей и пакетов показать")
+    parser.add_argument("--forbid", default=DEFAULT_FORBIDDEN, help="Пакеты, которых не должно быть при старте")
+    parser.add_argument("--budget-ms", type=float, help="Допустимое время импорта")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    args = parser.parse_args()
+
+    result = run(args.module, args.repeat)
+    forbidden = forbidden_imports(result, [name for name in args.forbid.split(",") if name])
+
+    if args.json:
+        print(json.dumps({**result, "forbidden_loaded": forbidden}, indent=2))
+    else:
+        print(f"import {args.module}: {result['total_ms']:.0f} мс (медиана {args.repeat} прогонов)")
+        print(f"\n{'модуль':<48}{'своё мс':>10}{'всего мс':>10}")
+        ranked = sorted(result["modules"].items(), key=lambda item: -item[1]["cumulative_ms"])
+        for name, stats in ranked[:args.top]:
+            print(f"{name:<48}{stats['self_ms']:>10.1f}{stats['cumulative_ms']:>10.1f}")
+        print(f"\n{'пакет':<48}{'мс':>10}")
+        for name, ms in list(result["packages"].items())[:args.top]:
+            print(f"{name:<48}{ms:>10.1f}")
+
+    failures: list[str] = []
+    if forbidden:
+        failures.append(f"При старте загружены: {', '.join(forbidden)}")
+    if args.budget_ms is not None and result["total_ms"] > args.budget_ms:
+        failures.append(f"Импорт {result['total_ms']:.0f} мс больше бюджета {args.budget_ms:.0f} мс")
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,146 @@
 import asyncio
+import importlib
 import logging
+import signal
+import time
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
+from telegram.ext import (
+    Application,
+    CommandHandler,
+    MessageHandler,
+    CallbackQueryHandler,
+    InlineQueryHandler,
+    filters,
+    ContextTypes,
+)
 from src.config import config
+from src.handlers.admin import memsnap, perf, profile, traces
 from src.handlers.commands import start, status
 from src.handlers.callbacks import handle_callback_query
 from src.handlers.messages import handle_message
-from src.media.cleanup import cleanup_temp_files
-from src.utils.rate_limit import rate_limiter
+from src.handlers.inline import handle_inline_query
+from src.twitter.translate import translate_settings
+from src.media.cleanup import cleanup_temp_files, cleanup_tracked_files
+from src.media.compress import terminate_ffmpeg
+from src.storage.backends import persistent_backend, state_backend
+from src.utils.metrics import run_loop_lag_sampler, start_metrics_server
+from src.utils.log_format import setup_logging
+from src.utils.rate_limit import check_thread_cost, rate_limiter
+from src.utils.shutdown import inflight
+from src.utils.watchdog import loop_watchdog
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=getattr(logging, config.LOG_LEVEL)
-)
 logger = logging.getLogger(__name__)
 
+# Модули, которые импортируются при первом использовании; после старта догружаются в фоне
+HEAVY_MODULES = ("bs4", "lxml.etree", "tenacity", "PIL.Image")
+
 async def cleanup_job(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Периодическая очистка временных файлов и rate limiter"""
     logger.info("Запуск периодической очистки...")
-    cleanup_temp_files(max_age_seconds=3600)
-    rate_limiter.cleanup_old_entries(max_age=3600)
+    # Файлы регистрируются при создании, обходить весь /tmp не нужно
+    cleanup_tracked_files(max_age_seconds=3600)
+    await rate_limiter.cleanup_old_entries()
     logger.info("Периодическая очистка завершена")
 
+async def preload_heavy_modules() -> None:
+    """Импорт тяжёлых модулей в потоке: бот уже принимает сообщения, а первая карточка не ждёт bs4 и Pillow"""
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            await asyncio.to_thread(importlib.import_module, name)
+        except ImportError as e:
+            logger.warning("Не удалось заранее импортировать %s: %s", name, e)
+    logger.info("Тяжёлые модули загружены за %.0f мс", (time.perf_counter() - started) * 1000)
+
+async def drain_and_stop(application: Application) -> None:
+    """Плавная остановка: новые обновления не забираются, текущие карточки дорабатывают до дедлайна"""
+    logger.info("Остановка: ждём карточки в обработке до %g с", config.SHUTDOWN_TIMEOUT)
+    if application.updater and application.updater.running:
+        await application.updater.stop()
+    cancelled = await inflight.drain(config.SHUTDOWN_TIMEOUT, pending=application.update_queue.qsize)
+    if cancelled:
+        logger.warning("Не успели за %g с, отменено карточек: %s", config.SHUTDOWN_TIMEOUT, cancelled)
+    terminated = terminate_ffmpeg()
+    if terminated:
+        logger.warning("Завершено процессов ffmpeg: %s", terminated)
+    cleanup_tracked_files()
+    application.stop_running()
+
+def install_stop_signals(application: Application) -> None:
+    """SIGTERM/SIGINT запускают drain_and_stop; повторный сигнал не прерывает дренаж"""
+    loop = asyncio.get_running_loop()
+
+    def on_signal():
+        if "drain_task" not in application.bot_data:
+            application.bot_data["drain_task"] = asyncio.create_task(drain_and_stop(application))
+
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, on_signal)
+        except (NotImplementedError, RuntimeError):
+            # Windows: Ctrl+C останавливает бота без дренажа
+            logger.warning("Сигнал %s не поддерживается, плавная остановка недоступна", sig.name)
+
 async def post_init(application: Application) -> None:
     """Инициализация после запуска бота"""
     logger.info("Очистка временных файлов при старте...")
     cleanup_temp_files()
+    logger.info("Хранилище состояния: %s", type(state_backend).__name__)
+    # Соединение с хранилищем и миграция настроек - до первого сообщения
+    await translate_settings.initialize()
+    application.bot_data["preload_task"] = asyncio.create_task(preload_heavy_modules())
+    application.bot_data["loop_lag_task"] = asyncio.create_task(run_loop_lag_sampler())
+    if config.LOOP_WATCHDOG_SECONDS > 0:
+        loop_watchdog.start(config.LOOP_WATCHDOG_SECONDS)
+    install_stop_signals(application)
+    if config.METRICS_PORT:
+        application.bot_data["metrics_server"] = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
     logger.info("Бот запущен и готов к работе")
 
+async def post_shutdown(application: Application) -> None:
+    """Остановка фоновых задач и закрытие соединений с хранилищами"""
+    for name in ("loop_lag_task", "preload_task"):
+        task = application.bot_data.pop(name, None)
+        if task is not None:
+            task.cancel()
+    loop_watchdog.stop()
+    metrics_server = application.bot_data.pop("metrics_server", None)
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+    await state_backend.close()
+    if persistent_backend is not state_backend:
+        await persistent_backend.close()
+
 def main():
     """Запуск бота"""
-    application = Application.builder().token(config.BOT_TOKEN).post_init(post_init).build()
+    setup_logging(config.LOG_LEVEL, config.LOG_FORMAT)
+    check_thread_cost()
+    application = (
+        Application.builder()
+        .token(config.BOT_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     
     # Команды (только /start и /status)
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("status", status))
     
+    # Диагностика для администраторов
+    application.add_handler(CommandHandler("perf", perf))
+    application.add_handler(CommandHandler("traces", traces))
+    # block=False: пока идёт профиль, сообщения обрабатываются (их и профилируем)
+    application.add_handler(CommandHandler("profile", profile, block=False))
+    application.add_handler(CommandHandler("memsnap", memsnap))
+    
     # Обработчик callback запросов от inline кнопок
     application.add_handler(CallbackQueryHandler(handle_callback_query))
     
+    # Inline режим (@bot ссылка). block=False: устаревшие запросы отбрасываются, пока ждём новый
+    application.add_handler(InlineQueryHandler(handle_inline_query, block=False))
+    
     # Обработчик сообщений
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
     
@@ -50,12 +152,13 @@ def main():
     )
     
     # Запуск
+    # Сигналы остановки обрабатывает install_stop_signals: сначала дренаж, потом остановка
     if config.MODE == "polling":
         logger.info("Запуск в режиме polling")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None)
     else:
         logger.warning("Webhook режим пока не реализован, используется polling")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
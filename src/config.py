@@ -7,16 +7,27 @@ class Config:
     BOT_TOKEN: str
     MODE: str = "polling"
     TELEGRAM_USER_IDS: Optional[list[int]] = None
+    ADMIN_USER_IDS: list[int] = field(default_factory=list)
     REPLY_IN_GROUPS: bool = False
     REMOVE_MESSAGE_IN_GROUPS: bool = False
     COMPRESS_MEDIA: bool = True
     MAX_MEDIA_MB: int = 20
     FX_BASE_URL: str = "https://fxtwitter.com"
     INCLUDE_QUOTED_MEDIA: bool = False
+    QUOTED_FETCH_TIMEOUT: float = 3.0
     DEFAULT_TRANSLATE_LANG: str = "off"
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
     RATE_LIMIT_SECONDS: int = 5
     RATE_LIMIT_CHAT_SECONDS: int = 3
+    RATE_LIMIT_BURST: int = 3
+    RATE_LIMIT_CHAT_BURST: int = 5
+    MEDIA_QUOTA_WINDOW: int = 3600
+    MEDIA_QUOTA_USER_MB: float = 300.0
+    MEDIA_QUOTA_USER_ENCODE_SECONDS: float = 180.0
+    MEDIA_QUOTA_CHAT_MB: float = 1000.0
+    MEDIA_QUOTA_CHAT_ENCODE_SECONDS: float = 600.0
+    MEDIA_QUOTA_TEXT_ONLY_FACTOR: float = 2.0
     REPLY_TO_MESSAGE: bool = True
     CAPTION_ABOVE_MEDIA: bool = True
     DUMP_TWEET_HTML: bool = False
@@ -25,6 +36,44 @@ class Config:
     RETRY_WAIT_MAX: float = 4.0
     RETRY_WAIT_MULTIPLIER: float = 0.5
     RETRY_STATUS_CODES: list[int] = field(default_factory=lambda: [408, 429])
+    TWEET_CACHE_TTL: int = 300
+    TWEET_CACHE_SIZE: int = 1000
+    TWEET_CACHE_STALE_TTL: int = 3600
+    FILE_ID_CACHE_TTL: int = 86400
+    FILE_ID_CACHE_SIZE: int = 5000
+    INLINE_CACHE_TIME: int = 300
+    INLINE_DEBOUNCE_SECONDS: float = 0.4
+    PROGRESSIVE_DELIVERY: bool = False
+    NEGATIVE_CACHE_TTL: int = 60
+    NEGATIVE_CACHE_SIZE: int = 1000
+    REQUEST_DEADLINE_SECONDS: float = 60.0
+    RETRY_AFTER_MAX: float = 30.0
+    RETRY_BUDGET_RATIO: float = 0.2
+    RETRY_BUDGET_MIN_RETRIES: int = 5
+    FX_MIRRORS: list[str] = field(default_factory=list)
+    HEDGE_REQUESTS: bool = True
+    HEDGE_DELAY_MIN: float = 0.5
+    HEDGE_DELAY_MAX: float = 3.0
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_TIMEOUT: float = 30.0
+    BREAKER_HALF_OPEN_PROBES: int = 1
+    LIMITER_INITIAL: int = 8
+    LIMITER_MIN: int = 1
+    LIMITER_MAX: int = 64
+    LIMITER_LATENCY_FACTOR: float = 3.0
+    STORAGE_PATH: str = "data/pmtwitter.db"
+    STATE_BACKEND_URL: str = "memory://"
+    METRICS_PORT: int = 0
+    METRICS_HOST: str = "127.0.0.1"
+    TRACE_SLOW_SECONDS: float = 10.0
+    TRACE_BUFFER_SIZE: int = 50
+    SHARED_LOCK_TTL: float = 15.0
+    COMPRESS_CONCURRENCY: int = 2
+    SHUTDOWN_TIMEOUT: float = 20.0
+    LOOP_WATCHDOG_SECONDS: float = 0.0
+    THREAD_MAX_TWEETS: int = 25
+    THREAD_FETCH_CONCURRENCY: int = 4
+    THREAD_RATE_COST: int = 3
     
     @classmethod
     def from_env(cls):
@@ -40,6 +89,14 @@ class Config:
             except ValueError:
                 print("Предупреждение: неверный формат TELEGRAM_USER_IDS")
 
+        admin_ids = []
+        admin_ids_str = os.getenv("ADMIN_USER_IDS", "")
+        if admin_ids_str:
+            try:
+                admin_ids = [int(uid.strip()) for uid in admin_ids_str.split(",") if uid.strip()]
+            except ValueError:
+                print("Предупреждение: неверный формат ADMIN_USER_IDS")
+
         retry_status_codes_str = os.getenv("RETRY_STATUS_CODES", "408,429")
         retry_status_codes = []
         if retry_status_codes_str:
@@ -52,20 +109,40 @@ class Config:
                 except ValueError:
                     print("Предупреждение: неверный формат RETRY_STATUS_CODES")
         
+        fx_base_url = os.getenv("FX_BASE_URL", "https://fxtwitter.com").rstrip('/')
+        fx_mirrors = [
+            url.strip().rstrip('/')
+            for url in os.getenv("FX_MIRRORS", "").split(",")
+            if url.strip()
+        ]
+        if fx_base_url not in fx_mirrors:
+            fx_mirrors.insert(0, fx_base_url)
+        
         return cls(
             BOT_TOKEN=bot_token,
             MODE=os.getenv("MODE", "polling"),
             TELEGRAM_USER_IDS=user_ids,
+            ADMIN_USER_IDS=admin_ids,
             REPLY_IN_GROUPS=os.getenv("REPLY_IN_GROUPS", "0") == "1",
             REMOVE_MESSAGE_IN_GROUPS=os.getenv("REMOVE_MESSAGE_IN_GROUPS", "0") == "1",
             COMPRESS_MEDIA=os.getenv("COMPRESS_MEDIA", "1") == "1",
             MAX_MEDIA_MB=int(os.getenv("MAX_MEDIA_MB", "20")),
-            FX_BASE_URL=os.getenv("FX_BASE_URL", "https://fxtwitter.com").rstrip('/'),
+            FX_BASE_URL=fx_base_url,
             INCLUDE_QUOTED_MEDIA=os.getenv("INCLUDE_QUOTED_MEDIA", "0") == "1",
+            QUOTED_FETCH_TIMEOUT=float(os.getenv("QUOTED_FETCH_TIMEOUT", "3")),
             DEFAULT_TRANSLATE_LANG=os.getenv("DEFAULT_TRANSLATE_LANG", "off"),
             LOG_LEVEL=os.getenv("LOG_LEVEL", "INFO"),
+            LOG_FORMAT=os.getenv("LOG_FORMAT", "text").lower(),
             RATE_LIMIT_SECONDS=int(os.getenv("RATE_LIMIT_SECONDS", "5")),
             RATE_LIMIT_CHAT_SECONDS=int(os.getenv("RATE_LIMIT_CHAT_SECONDS", "3")),
+            RATE_LIMIT_BURST=int(os.getenv("RATE_LIMIT_BURST", "3")),
+            RATE_LIMIT_CHAT_BURST=int(os.getenv("RATE_LIMIT_CHAT_BURST", "5")),
+            MEDIA_QUOTA_WINDOW=int(os.getenv("MEDIA_QUOTA_WINDOW", "3600")),
+            MEDIA_QUOTA_USER_MB=float(os.getenv("MEDIA_QUOTA_USER_MB", "300")),
+            MEDIA_QUOTA_USER_ENCODE_SECONDS=float(os.getenv("MEDIA_QUOTA_USER_ENCODE_SECONDS", "180")),
+            MEDIA_QUOTA_CHAT_MB=float(os.getenv("MEDIA_QUOTA_CHAT_MB", "1000")),
+            MEDIA_QUOTA_CHAT_ENCODE_SECONDS=float(os.getenv("MEDIA_QUOTA_CHAT_ENCODE_SECONDS", "600")),
+            MEDIA_QUOTA_TEXT_ONLY_FACTOR=float(os.getenv("MEDIA_QUOTA_TEXT_ONLY_FACTOR", "2")),
             REPLY_TO_MESSAGE=os.getenv("REPLY_TO_MESSAGE", "1") == "1",
             CAPTION_ABOVE_MEDIA=os.getenv("CAPTION_ABOVE_MEDIA", "1") == "1",
             DUMP_TWEET_HTML=os.getenv("DUMP_TWEET_HTML", "0") == "1",
@@ -74,6 +151,44 @@ class Config:
             RETRY_WAIT_MAX=float(os.getenv("RETRY_WAIT_MAX", "4.0")),
             RETRY_WAIT_MULTIPLIER=float(os.getenv("RETRY_WAIT_MULTIPLIER", "0.5")),
             RETRY_STATUS_CODES=retry_status_codes,
+            TWEET_CACHE_TTL=int(os.getenv("TWEET_CACHE_TTL", "300")),
+            TWEET_CACHE_SIZE=int(os.getenv("TWEET_CACHE_SIZE", "1000")),
+            TWEET_CACHE_STALE_TTL=int(os.getenv("TWEET_CACHE_STALE_TTL", "3600")),
+            FILE_ID_CACHE_TTL=int(os.getenv("FILE_ID_CACHE_TTL", "86400")),
+            FILE_ID_CACHE_SIZE=int(os.getenv("FILE_ID_CACHE_SIZE", "5000")),
+            INLINE_CACHE_TIME=int(os.getenv("INLINE_CACHE_TIME", "300")),
+            INLINE_DEBOUNCE_SECONDS=float(os.getenv("INLINE_DEBOUNCE_SECONDS", "0.4")),
+            PROGRESSIVE_DELIVERY=os.getenv("PROGRESSIVE_DELIVERY", "0") == "1",
+            NEGATIVE_CACHE_TTL=int(os.getenv("NEGATIVE_CACHE_TTL", "60")),
+            NEGATIVE_CACHE_SIZE=int(os.getenv("NEGATIVE_CACHE_SIZE", "1000")),
+            REQUEST_DEADLINE_SECONDS=float(os.getenv("REQUEST_DEADLINE_SECONDS", "60")),
+            RETRY_AFTER_MAX=float(os.getenv("RETRY_AFTER_MAX", "30")),
+            RETRY_BUDGET_RATIO=float(os.getenv("RETRY_BUDGET_RATIO", "0.2")),
+            RETRY_BUDGET_MIN_RETRIES=int(os.getenv("RETRY_BUDGET_MIN_RETRIES", "5")),
+            FX_MIRRORS=fx_mirrors,
+            HEDGE_REQUESTS=os.getenv("HEDGE_REQUESTS", "1") == "1",
+            HEDGE_DELAY_MIN=float(os.getenv("HEDGE_DELAY_MIN", "0.5")),
+            HEDGE_DELAY_MAX=float(os.getenv("HEDGE_DELAY_MAX", "3.0")),
+            BREAKER_FAILURE_THRESHOLD=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+            BREAKER_RESET_TIMEOUT=float(os.getenv("BREAKER_RESET_TIMEOUT", "30")),
+            BREAKER_HALF_OPEN_PROBES=int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1")),
+            LIMITER_INITIAL=int(os.getenv("LIMITER_INITIAL", "8")),
+            LIMITER_MIN=int(os.getenv("LIMITER_MIN", "1")),
+            LIMITER_MAX=int(os.getenv("LIMITER_MAX", "64")),
+            LIMITER_LATENCY_FACTOR=float(os.getenv("LIMITER_LATENCY_FACTOR", "3.0")),
+            STORAGE_PATH=os.getenv("STORAGE_PATH", "data/pmtwitter.db"),
+            STATE_BACKEND_URL=os.getenv("STATE_BACKEND_URL", "memory://"),
+            METRICS_PORT=int(os.getenv("METRICS_PORT", "0")),
+            METRICS_HOST=os.getenv("METRICS_HOST", "127.0.0.1"),
+            TRACE_SLOW_SECONDS=float(os.getenv("TRACE_SLOW_SECONDS", "10")),
+            TRACE_BUFFER_SIZE=int(os.getenv("TRACE_BUFFER_SIZE", "50")),
+            SHARED_LOCK_TTL=float(os.getenv("SHARED_LOCK_TTL", "15")),
+            COMPRESS_CONCURRENCY=int(os.getenv("COMPRESS_CONCURRENCY", "2")),
+            SHUTDOWN_TIMEOUT=float(os.getenv("SHUTDOWN_TIMEOUT", "20")),
+            LOOP_WATCHDOG_SECONDS=float(os.getenv("LOOP_WATCHDOG_SECONDS", "0")),
+            THREAD_MAX_TWEETS=int(os.getenv("THREAD_MAX_TWEETS", "25")),
+            THREAD_FETCH_CONCURRENCY=int(os.getenv("THREAD_FETCH_CONCURRENCY", "4")),
+            THREAD_RATE_COST=int(os.getenv("THREAD_RATE_COST", "3")),
         )
 
 config = Config.from_env()
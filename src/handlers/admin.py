@@ -0,0 +1,224 @@
+"""Команды администраторов (ADMIN_USER_IDS): диагностика производительности"""
+import asyncio
+import html
+import logging
+from datetime import datetime
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.constants import ParseMode
+
+from src.config import config
+from src.handlers.menus import get_limiters_status_text, get_mirrors_status_text
+from src.utils.cache import CACHES
+from src.utils.metrics import (
+    CARD_RATE,
+    COMPRESS_QUEUED,
+    COMPRESS_RUNNING,
+    LOOP_BLOCKED_TOTAL,
+    LOOP_LAG_HISTOGRAM,
+    LOOP_LAG_SECONDS,
+    MEDIA_INFLIGHT_BYTES,
+    MESSAGE_RATE,
+    STAGE_SECONDS,
+)
+from src.utils.profiling import (
+    memory_snapshot_diff,
+    profile_cprofile,
+    profile_sampling,
+    profiling_busy,
+    stop_memory_tracing,
+)
+from src.utils.tracing import format_trace, slow_traces
+from src.utils.watchdog import loop_watchdog
+
+logger = logging.getLogger(__name__)
+
+# Ограничение длины сообщения Telegram с запасом на разметку
+MESSAGE_LIMIT = 3900
+
+# Длительность /profile по умолчанию и максимум (секунды)
+PROFILE_DEFAULT_SECONDS = 10
+PROFILE_MAX_SECONDS = 120
+
+# Порядок этапов в /perf; остальные выводятся после них
+STAGE_ORDER = ("extract", "fetch", "parse", "format", "media", "total")
+
+
+def is_admin(user_id: int) -> bool:
+    """Команды диагностики доступны только пользователям из ADMIN_USER_IDS"""
+    return user_id in config.ADMIN_USER_IDS
+
+
+async def traces(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /traces [N] - последние медленные запросы с деревом этапов"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
+        return
+
+    count = 3
+    if context.args:
+        try:
+            count = max(1, min(int(context.args[0]), len(slow_traces) or 1))
+        except ValueError:
+            pass
+
+    if not slow_traces:
+        await update.message.reply_text(
+            f"Медленных запросов (дольше {config.TRACE_SLOW_SECONDS:.0f}с) пока не было"
+        )
+        return
+
+    blocks = []
+    for trace in reversed(list(slow_traces)[-count:]):
+        started = datetime.fromtimestamp(trace["started_at"]).strftime("%H:%M:%S")
+        header = f"<b>{started}</b> · {trace['duration']:.1f}с · <code>{trace['trace_id']}</code>"
+        blocks.append((header, format_trace(trace)))
+
+    text = ""
+    for header, body in blocks:
+        block = f"{header}\n<pre>{html.escape(body)}</pre>"
+        if len(text) + len(block) > MESSAGE_LIMIT:
+            break
+        text += block + "\n"
+    if not text:
+        # Одна трасса длиннее сообщения: показываем её начало. Обрезается
+        # исходный текст, а не HTML, чтобы не разрезать сущность или тег
+        header, body = blocks[0]
+        room = MESSAGE_LIMIT - len(header) - len("\n<pre></pre>")
+        body = body[:room]
+        while len(html.escape(body)) > room:
+            # Каждая сущность (&amp; и т.п.) длиннее символа: укорачиваем на излишек
+            body = body[:len(body) - (len(html.escape(body)) - room)]
+        text = f"{header}\n<pre>{html.escape(body)}</pre>"
+
+    await update.message.reply_text(text, parse_mode=ParseMode.HTML)
+    logger.info("Команда /traces от администратора %s", user_id)
+
+
+def _ms(seconds) -> str:
+    return f"{seconds * 1000:.0f} мс" if seconds is not None else "—"
+
+
+def _rate(value) -> str:
+    return f"{value:.1f}" if value is not None else "—"
+
+
+def _blocking_lines() -> list[str]:
+    """Найденные блокировки event loop (только при LOOP_WATCHDOG_SECONDS)"""
+    if not loop_watchdog.running:
+        return []
+    lines = [f"• Блокировок дольше {_ms(loop_watchdog.threshold)}: {LOOP_BLOCKED_TOTAL.total():.0f}"]
+    if loop_watchdog.recent:
+        last = loop_watchdog.recent[-1]
+        lines.append(f"• Последняя: {_ms(last['seconds'])} в <code>{html.escape(last['location'])}</code>")
+    return lines
+
+
+def get_perf_text() -> str:
+    """Текущие показатели конвейера из реестра метрик"""
+    lines = [
+        "<b>Нагрузка:</b>",
+        f"• Сообщений в минуту: {_rate(MESSAGE_RATE.per_minute())}",
+        f"• Ссылок в минуту: {_rate(CARD_RATE.per_minute())}",
+        "",
+        "<b>Этапы (p50 / p95 с запуска):</b>",
+    ]
+    stages = [labels["stage"] for labels in STAGE_SECONDS.label_values()]
+    stages.sort(key=lambda stage: (STAGE_ORDER.index(stage) if stage in STAGE_ORDER else len(STAGE_ORDER), stage))
+    if not stages:
+        lines.append("• пока нет данных")
+    for stage in stages:
+        lines.append(
+            f"• {stage}: {_ms(STAGE_SECONDS.quantile(0.5, stage=stage))} / "
+            f"{_ms(STAGE_SECONDS.quantile(0.95, stage=stage))} "
+            f"({STAGE_SECONDS.count(stage=stage)})"
+        )
+
+    lines += ["", "<b>Кэши:</b>"]
+    for name, cache in CACHES.items():
+        lookups = cache.hits + cache.misses
+        hit_rate = f"{cache.hits / lookups * 100:.0f}%" if lookups else "—"
+        lines.append(f"• {name}: {len(cache)}/{cache.maxsize}, попаданий {hit_rate}")
+
+    lines += [
+        "",
+        "<b>Медиа:</b>",
+        f"• Скачано и не отправлено: {MEDIA_INFLIGHT_BYTES.value() / 1024 / 1024:.1f} МБ",
+        f"• Сжатие: выполняется {COMPRESS_RUNNING.value():.0f}, в очереди {COMPRESS_QUEUED.value():.0f}",
+        "",
+        "<b>Event loop:</b>",
+        f"• Задержка: сейчас {_ms(LOOP_LAG_SECONDS.value())}, "
+        f"p95 {_ms(LOOP_LAG_HISTOGRAM.quantile(0.95))}",
+        *_blocking_lines(),
+        "",
+        "<b>Источники:</b>",
+    ]
+    text = "\n".join(lines)
+    return text + "\n" + get_mirrors_status_text() + get_limiters_status_text()
+
+
+async def perf(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /perf - живая статистика конвейера"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
+        return
+
+    await update.message.reply_text(get_perf_text(), parse_mode=ParseMode.HTML)
+    logger.info("Команда /perf от администратора %s", user_id)
+
+
+async def _reply_report(update: Update, summary: str, data: bytes | None, filename: str):
+    """Сводка сообщением, полный результат - файлом"""
+    await update.message.reply_text(f"<pre>{html.escape(summary[:MESSAGE_LIMIT])}</pre>", parse_mode=ParseMode.HTML)
+    if data:
+        await update.message.reply_document(document=data, filename=filename)
+
+
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /profile [секунды] [cprofile] - профиль процесса без перезапуска"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
+        return
+
+    seconds = PROFILE_DEFAULT_SECONDS
+    mode = "sampling"
+    for arg in context.args or []:
+        if arg.lower() == "cprofile":
+            mode = "cprofile"
+        else:
+            try:
+                seconds = max(1, min(int(arg), PROFILE_MAX_SECONDS))
+            except ValueError:
+                pass
+
+    if profiling_busy():
+        await update.message.reply_text("Профилирование уже идёт, дождитесь результата")
+        return
+
+    logger.info("Команда /profile %s %s с от администратора %s", mode, seconds, user_id)
+    await update.message.reply_text(f"Профилирую {seconds} с ({mode})...")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    if mode == "cprofile":
+        summary, data = await profile_cprofile(seconds)
+        await _reply_report(update, summary, data, f"profile-{stamp}.prof")
+    else:
+        summary, data = await profile_sampling(seconds)
+        await _reply_report(update, summary, data, f"profile-{stamp}.collapsed.txt")
+
+
+async def memsnap(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /memsnap [stop] - рост памяти по строкам кода с прошлого снимка"""
+    user_id = update.effective_user.id
+    if not is_admin(user_id):
+        return
+
+    logger.info("Команда /memsnap от администратора %s", user_id)
+    if context.args and context.args[0].lower() == "stop":
+        stop_memory_tracing()
+        await update.message.reply_text("tracemalloc выключен")
+        return
+
+    # Снимок и сравнение занимают заметное время: не в event loop
+    summary, data = await asyncio.to_thread(memory_snapshot_diff)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    await _reply_report(update, summary, data, f"memsnap-{stamp}.txt")
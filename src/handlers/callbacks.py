@@ -3,6 +3,7 @@ import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
+from telegram.error import TelegramError
 
 from src.handlers.menus import (
     CALLBACK_MAIN_MENU,
@@ -11,6 +12,7 @@ from src.handlers.menus import (
     CALLBACK_TRANSLATE,
     CALLBACK_TRANSLATE_OFF,
     CALLBACK_TRANSLATE_LANG,
+    CALLBACK_REFRESH_STATS,
     get_main_menu_text,
     get_main_menu_keyboard,
     get_help_text,
@@ -20,7 +22,12 @@ from src.handlers.menus import (
     get_settings_text,
     get_settings_keyboard,
 )
+from src.config import config
+from src.handlers.messages import check_whitelist
+from src.twitter.service import refresh_tweet
 from src.twitter.translate import translate_settings, SUPPORTED_LANGUAGES
+from src.utils.rate_limit import rate_limiter
+from src.utils.text_format import format_stats_line, replace_stats_line
 
 logger = logging.getLogger(__name__)
 
@@ -28,12 +35,17 @@ logger = logging.getLogger(__name__)
 async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Главный обработчик всех callback запросов"""
     query = update.callback_query
-    await query.answer()  # Подтверждаем получение callback
-    
     user_id = update.effective_user.id
     callback_data = query.data
     
-    logger.info(f"Callback от юзера {user_id}: {callback_data}")
+    logger.info("Callback от юзера %s: %s", user_id, callback_data)
+    
+    # Обновление статистики отвечает на callback само (всплывающим текстом)
+    if callback_data.startswith(CALLBACK_REFRESH_STATS):
+        await handle_refresh_stats(query, user_id, callback_data[len(CALLBACK_REFRESH_STATS):])
+        return
+    
+    await query.answer()  # Подтверждаем получение callback
     
     # Главное меню
     if callback_data == CALLBACK_MAIN_MENU:
@@ -61,7 +73,7 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
         await handle_translate_set_language(query, user_id, lang_code)
     
     else:
-        logger.warning(f"Неизвестный callback: {callback_data}")
+        logger.warning("Неизвестный callback: %s", callback_data)
         await query.answer("⚠️ Неизвестная команда", show_alert=True)
 
 
@@ -89,7 +101,7 @@ async def show_help(query):
 
 async def show_settings(query, user_id: int):
     """Показать настройки/статус"""
-    current_lang = translate_settings.get_language(user_id)
+    current_lang = await translate_settings.get_language(user_id)
     
     await query.edit_message_text(
         text=get_settings_text(current_lang),
@@ -101,7 +113,7 @@ async def show_settings(query, user_id: int):
 
 async def show_translate_menu(query, user_id: int):
     """Показать меню выбора языка перевода"""
-    current_lang = translate_settings.get_language(user_id)
+    current_lang = await translate_settings.get_language(user_id)
     
     await query.edit_message_text(
         text=get_translate_menu_text(current_lang),
@@ -113,14 +125,14 @@ async def show_translate_menu(query, user_id: int):
 
 async def handle_translate_off(query, user_id: int):
     """Выключить перевод"""
-    current_lang = translate_settings.get_language(user_id)
+    current_lang = await translate_settings.get_language(user_id)
     
     if not current_lang:
         # Уже выключен
         await query.answer("ℹ️ Перевод уже выключен", show_alert=False)
         return
     
-    translate_settings.disable(user_id)
+    await translate_settings.disable(user_id)
     await query.answer("✅ Перевод выключен", show_alert=False)
     
     # Обновляем меню
@@ -138,7 +150,7 @@ async def handle_translate_set_language(query, user_id: int, lang_code: str):
         await query.answer("❌ Неизвестный язык", show_alert=True)
         return
     
-    current_lang = translate_settings.get_language(user_id)
+    current_lang = await translate_settings.get_language(user_id)
     
     # Если выбрали уже активный язык
     if current_lang == lang_code:
@@ -147,7 +159,7 @@ async def handle_translate_set_language(query, user_id: int, lang_code: str):
         return
     
     # Устанавливаем новый язык
-    translate_settings.set_language(user_id, lang_code)
+    await translate_settings.set_language(user_id, lang_code)
     lang_name = SUPPORTED_LANGUAGES[lang_code]
     await query.answer(f"✅ Установлен: {lang_name}", show_alert=False)
     
@@ -158,3 +170,63 @@ async def handle_translate_set_language(query, user_id: int, lang_code: str):
         reply_markup=get_translate_keyboard(lang_code),
         disable_web_page_preview=True
     )
+
+
+async def answer_late(query, text: str, show_alert: bool = False):
+    """Ответ на callback после долгой работы: через ~15 с Telegram отвечает «query is too old»"""
+    try:
+        await query.answer(text, show_alert=show_alert)
+    except TelegramError as e:
+        logger.debug("Не удалось ответить на callback: %s", e)
+
+
+async def handle_refresh_stats(query, user_id: int, payload: str):
+    """Обновить статистику в карточке твита без повторной отправки медиа"""
+    username, _, tweet_id = payload.partition("/")
+    if not username or not tweet_id.isdigit():
+        await query.answer("⚠️ Неизвестная команда", show_alert=True)
+        return
+    
+    # Каждое нажатие - запрос к источнику в обход кэша: те же whitelist и rate limit, что у ссылок
+    if not check_whitelist(user_id):
+        await query.answer("⛔ Нет доступа", show_alert=False)
+        return
+    chat_id = query.message.chat.id if query.message else user_id
+    if not await rate_limiter.is_allowed(user_id, chat_id):
+        await query.answer("⏳ Слишком часто, попробуйте чуть позже", show_alert=False)
+        return
+    
+    lang_code = await translate_settings.get_language(user_id)
+    tweet = await refresh_tweet(tweet_id, username, lang_code, f"https://x.com/{username}/status/{tweet_id}")
+    if not tweet:
+        await answer_late(query, "❌ Не удалось обновить статистику")
+        return
+    
+    # Inline-сообщения и кнопка под альбомом не содержат карточку: показываем статистику всплывающим текстом
+    message = query.message
+    text_html = getattr(message, "text_html", None) if getattr(message, "text", None) else None
+    caption_html = getattr(message, "caption_html", None) if getattr(message, "caption", None) else None
+    
+    try:
+        if text_html:
+            updated = replace_stats_line(text_html, tweet.stats)
+            if updated != text_html:
+                await query.edit_message_text(
+                    text=updated,
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=message.reply_markup,
+                    disable_web_page_preview=True
+                )
+        elif caption_html:
+            updated = replace_stats_line(caption_html, tweet.stats)
+            if updated != caption_html:
+                await query.edit_message_caption(
+                    caption=updated,
+                    parse_mode=ParseMode.HTML,
+                    reply_markup=message.reply_markup,
+                    show_caption_above_media=config.CAPTION_ABOVE_MEDIA
+                )
+    except TelegramError as e:
+        logger.warning("Не удалось обновить карточку %s: %s", tweet_id, e)
+    
+    await answer_late(query, f"🔄 {format_stats_line(tweet.stats)}")
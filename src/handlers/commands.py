@@ -23,13 +23,13 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=get_main_menu_keyboard(),
         disable_web_page_preview=True
     )
-    logger.info(f"Команда /start от пользователя {update.effective_user.id}")
+    logger.info("Команда /start от пользователя %s", update.effective_user.id)
 
 
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /status - показывает настройки и статус"""
     user_id = update.effective_user.id
-    current_lang = translate_settings.get_language(user_id)
+    current_lang = await translate_settings.get_language(user_id)
     
     await update.message.reply_text(
         text=get_settings_text(current_lang),
@@ -37,4 +37,4 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=get_settings_keyboard(),
         disable_web_page_preview=True
     )
-    logger.info(f"Команда /status от пользователя {user_id}")
+    logger.info("Команда /status от пользователя %s", user_id)
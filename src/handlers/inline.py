@@ -0,0 +1,151 @@
+"""Обработчик inline-запросов (@bot <ссылка на твит>)"""
+import asyncio
+import logging
+from typing import Optional
+from telegram import (
+    Update,
+    InlineQueryResultArticle,
+    InlineQueryResultCachedPhoto,
+    InlineQueryResultCachedVideo,
+    InlineQueryResultPhoto,
+    InlineQueryResultVideo,
+    InputTextMessageContent,
+    LinkPreviewOptions,
+)
+from telegram.ext import ContextTypes
+from telegram.constants import ParseMode
+from telegram.error import TelegramError
+
+from src.config import config
+from src.handlers.messages import check_whitelist, get_tweet_url_keyboard
+from src.twitter.models import Tweet
+from src.twitter.normalize import find_tweet_urls, normalize_url, extract_tweet_id, extract_username
+from src.twitter.service import get_tweet, get_cached_tweet
+from src.twitter.translate import translate_settings
+from src.utils.cache import file_id_cache, shared_file_id_cache
+from src.utils.deadline import request_deadline
+from src.utils.text_format import format_tweet_card
+
+logger = logging.getLogger(__name__)
+
+# Telegram ждёт ответ на inline-запрос около 10 секунд
+INLINE_ANSWER_DEADLINE = 8.0
+
+# Номер последнего запроса пользователя: устаревшие запросы при наборе текста отбрасываются
+_latest_query: dict[int, int] = {}
+
+
+def build_inline_results(tweet: Tweet, tweet_id: str, card_text: str) -> list:
+    """Собирает inline-результаты для карточки твита"""
+    keyboard = get_tweet_url_keyboard(tweet.url)
+    caption = card_text if len(card_text) <= 1024 else None
+    title = f"{tweet.display_name} (@{tweet.username})"
+    results = []
+
+    for idx, media_item in enumerate(tweet.media[:10]):
+        result_id = f"{tweet_id}:m{idx}"
+        file_id = file_id_cache.get(media_item.url)
+        common = dict(
+            caption=caption,
+            parse_mode=ParseMode.HTML if caption else None,
+            show_caption_above_media=config.CAPTION_ABOVE_MEDIA,
+            reply_markup=keyboard,
+        )
+
+        if media_item.type == "photo":
+            if file_id:
+                results.append(InlineQueryResultCachedPhoto(id=result_id, photo_file_id=file_id, **common))
+            else:
+                results.append(InlineQueryResultPhoto(
+                    id=result_id,
+                    photo_url=media_item.url,
+                    thumbnail_url=media_item.thumbnail_url or media_item.url,
+                    **common,
+                ))
+        else:
+            if file_id:
+                results.append(InlineQueryResultCachedVideo(
+                    id=result_id, video_file_id=file_id, title=title, **common
+                ))
+            elif media_item.thumbnail_url:
+                # Без превью Telegram не принимает видео по ссылке
+                results.append(InlineQueryResultVideo(
+                    id=result_id,
+                    video_url=media_item.url,
+                    mime_type="video/mp4",
+                    thumbnail_url=media_item.thumbnail_url,
+                    title=title,
+                    **common,
+                ))
+
+    # Текстовая карточка есть всегда
+    results.append(InlineQueryResultArticle(
+        id=f"{tweet_id}:a",
+        title=title,
+        description=tweet.text[:100] if tweet.text else None,
+        input_message_content=InputTextMessageContent(
+            card_text,
+            parse_mode=ParseMode.HTML,
+            link_preview_options=LinkPreviewOptions(is_disabled=True),
+        ),
+        reply_markup=keyboard,
+    ))
+    return results
+
+
+async def _wait_for_typing_to_settle(user_id: int) -> bool:
+    """Ждёт паузу в наборе; возвращает False, если пришёл более новый запрос"""
+    token = _latest_query.get(user_id, 0) + 1
+    _latest_query[user_id] = token
+    await asyncio.sleep(config.INLINE_DEBOUNCE_SECONDS)
+    if _latest_query.get(user_id) != token:
+        return False
+    del _latest_query[user_id]
+    return True
+
+
+async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Отвечает карточкой твита на inline-запрос со ссылкой"""
+    query = update.inline_query
+    user_id = query.from_user.id
+
+    if not check_whitelist(user_id):
+        return
+
+    tweet_urls = find_tweet_urls(query.query or "")
+    if not tweet_urls:
+        return
+
+    normalized_url = normalize_url(tweet_urls[0])
+    tweet_id = extract_tweet_id(normalized_url) if normalized_url else None
+    username = extract_username(normalized_url) if normalized_url else None
+    if not tweet_id or not username:
+        return
+
+    lang_code = await translate_settings.get_language(user_id)
+
+    # Из кэша отвечаем сразу, иначе ждём, пока пользователь допечатает запрос
+    tweet: Optional[Tweet] = await get_cached_tweet(tweet_id, lang_code)
+    if tweet is None:
+        if not await _wait_for_typing_to_settle(user_id):
+            return
+        with request_deadline(min(config.REQUEST_DEADLINE_SECONDS, INLINE_ANSWER_DEADLINE)):
+            tweet = await get_tweet(tweet_id, username, lang_code, normalized_url)
+
+    if tweet is None:
+        results = []
+    else:
+        card_text = format_tweet_card(tweet, include_translation=bool(tweet.translated_text))
+        await shared_file_id_cache.warm(item.url for item in tweet.media[:10])
+        results = build_inline_results(tweet, tweet_id, card_text)
+
+    try:
+        # Пустой ответ (твит не загрузился) не кэшируем: при повторе Telegram спросит снова
+        await query.answer(
+            results,
+            cache_time=config.INLINE_CACHE_TIME if results else 0,
+            is_personal=lang_code is not None,
+        )
+    except TelegramError as e:
+        # Запрос мог устареть, пока загружался твит
+        logger.warning("Не удалось ответить на inline-запрос: %s", e)
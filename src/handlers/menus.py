@@ -3,6 +3,9 @@ from typing import Optional
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from src.twitter.translate import SUPPORTED_LANGUAGES
 from src.config import config
+from src.twitter.mirrors import mirror_pool
+from src.utils.circuit_breaker import STATE_OPEN
+from src.utils.concurrency import limiters_snapshot
 
 
 # ==================== Эмодзи флагов для языков ====================
@@ -34,6 +37,7 @@ CALLBACK_SETTINGS = "settings"
 CALLBACK_TRANSLATE = "translate"
 CALLBACK_TRANSLATE_OFF = "translate:off"
 CALLBACK_TRANSLATE_LANG = "translate:"  # + язык код (ru, en, etc)
+CALLBACK_REFRESH_STATS = "refresh:"  # + username/tweet_id
 
 
 # ==================== Главное меню ====================
@@ -81,6 +85,9 @@ def get_help_text() -> str:
 • https://fxtwitter.com/username/status/123...
 • https://fixupx.com/username/status/123...
 
+<b>Треды:</b>
+Напишите «тред» (или thread, 🧵) перед ссылкой — бот соберёт цепочку ответов автора самому себе до этого твита: текст одним-двумя сообщениями, медиа альбомами.
+
 <b>Что показывает бот:</b>
 ✅ Автор, дата и время публикации
 ✅ Текст твита
@@ -195,14 +202,48 @@ def get_settings_text(current_lang: Optional[str] = None) -> str:
 • Сжатие медиа: {"✅ Включено" if config.COMPRESS_MEDIA else "❌ Выключено"}
 • Макс. размер медиа: {config.MAX_MEDIA_MB} МБ
 • Quoted медиа: {"✅ Показывать" if config.INCLUDE_QUOTED_MEDIA else "❌ Скрывать"}
+• Прогрессивная отправка: {"✅ Включена" if config.PROGRESSIVE_DELIVERY else "❌ Выключена"}
 
 <b>Источник данных:</b>
-• {config.FX_BASE_URL}
+{get_mirrors_status_text()}
+{get_limiters_status_text()}
 """
     
     return text
 
 
+def get_mirrors_status_text() -> str:
+    """Список зеркал в порядке выбора со статистикой задержек и ошибок"""
+    lines = []
+    for stats in mirror_pool.snapshot():
+        if stats["breaker"] == STATE_OPEN:
+            lines.append(f"• {stats['host']} — 🔴 недоступен (circuit breaker открыт)")
+            continue
+        if stats["requests"] == 0:
+            lines.append(f"• {stats['host']} — нет запросов")
+            continue
+        p95 = f"{stats['p95'] * 1000:.0f} мс" if stats["p95"] is not None else "—"
+        lines.append(
+            f"• {stats['host']} — p95 {p95}, ошибки {stats['error_rate'] * 100:.0f}%, "
+            f"выбран {stats['wins']} из {stats['requests']}, хеджей {stats['hedges']}"
+        )
+    return "\n".join(lines)
+
+
+def get_limiters_status_text() -> str:
+    """Текущие адаптивные лимиты одновременных запросов по хостам"""
+    snapshot = limiters_snapshot()
+    if not snapshot:
+        return ""
+    lines = ["\n<b>Одновременные запросы:</b>"]
+    for stats in snapshot:
+        lines.append(
+            f"• {stats['host']} — {stats['in_flight']}/{stats['limit']}, "
+            f"в очереди {stats['queued']}, ожидание ~{stats['queue_wait_avg'] * 1000:.0f} мс"
+        )
+    return "\n".join(lines)
+
+
 def get_settings_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура меню настроек"""
     keyboard = [
@@ -1,21 +1,57 @@
+import asyncio
+import dataclasses
 import logging
+import time
+from contextlib import contextmanager
+from typing import Callable
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 from telegram import Update, InputMediaPhoto, InputMediaVideo, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from telegram.constants import ParseMode
+from telegram.constants import ChatAction, ParseMode
 from telegram.error import TelegramError
 from src.config import config
+from src.handlers.menus import CALLBACK_REFRESH_STATS
 from src.twitter.normalize import find_tweet_urls, normalize_url, extract_tweet_id, extract_username
-from src.twitter.fetcher import fetch_tweet_html
-from src.twitter.parser import parse_tweet_html
+from src.twitter.fetcher import get_unavailable_reason
+from src.twitter.mirrors import mirror_pool
+from src.twitter.models import MediaItem
+from src.twitter.service import get_quoted_tweet, get_tweet, merge_quoted_tweet
+from src.twitter.thread import is_thread_request, unroll_thread
 from src.twitter.translate import translate_settings
-from src.utils.text_format import format_tweet_card, shorten_text_for_caption
+from src.utils.text_format import format_thread_messages, format_tweet_card, shorten_text_for_caption
 from src.utils.rate_limit import rate_limiter
-from src.media.download import download_media_file
+from src.utils.cache import file_id_cache, shared_file_id_cache
+from src.utils.deadline import request_deadline
+from src.utils.quota import QUOTA_FULL, QUOTA_TEXT_ONLY, MediaUsage, media_quota
+from src.utils.shutdown import inflight
+from src.utils.tracing import set_attributes, span, start_trace
+from src.utils.metrics import (
+    CARDS_TOTAL,
+    COMPRESS_QUEUED,
+    COMPRESS_RATIO,
+    COMPRESS_RUNNING,
+    COMPRESS_SECONDS,
+    MEDIA_DOWNLOAD_BYTES,
+    MEDIA_DOWNLOAD_SECONDS,
+    MEDIA_DOWNLOAD_SIZE,
+    MEDIA_INFLIGHT_BYTES,
+    MESSAGES_TOTAL,
+    STAGE_SECONDS,
+    TELEGRAM_ERRORS,
+    TELEGRAM_SECONDS,
+)
+from src.media.download import download_media_file, get_file_size_mb
 from src.media.compress import compress_image, compress_video
 from src.media.cleanup import delete_files
 
 logger = logging.getLogger(__name__)
 
+# Сколько медиа треда отправлять (альбомами по 10)
+THREAD_MEDIA_LIMIT = 30
+
+# Сжатие (Pillow, ffmpeg) идёт в потоках, не больше COMPRESS_CONCURRENCY одновременно
+_compress_slots = asyncio.Semaphore(max(1, config.COMPRESS_CONCURRENCY))
+
 def get_reply_to_message_id(update: Update) -> int | None:
     """Возвращает ID исходного сообщения для reply, если включено"""
     if config.REPLY_TO_MESSAGE and update.message:
@@ -23,9 +59,44 @@ def get_reply_to_message_id(update: Update) -> int | None:
     return None
 
 def get_tweet_url_keyboard(tweet_url: str) -> InlineKeyboardMarkup:
-    """Создает клавиатуру с кнопкой ссылки на оригинальный твит"""
-    keyboard = [[InlineKeyboardButton("🔗 Открыть оригинал", url=tweet_url)]]
-    return InlineKeyboardMarkup(keyboard)
+    """Создает клавиатуру с кнопкой ссылки на оригинальный твит и обновлением статистики"""
+    row = [InlineKeyboardButton("🔗 Открыть оригинал", url=tweet_url)]
+    tweet_id = extract_tweet_id(tweet_url)
+    username = extract_username(tweet_url)
+    if tweet_id and username:
+        row.append(InlineKeyboardButton("🔄", callback_data=f"{CALLBACK_REFRESH_STATS}{username}/{tweet_id}"))
+    return InlineKeyboardMarkup([row])
+
+async def run_compression(media_type: str, file_path: str) -> str:
+    """Сжимает файл в отдельном потоке, не блокируя event loop; ждёт свободный слот"""
+    compress = compress_image if media_type == "photo" else compress_video
+    COMPRESS_QUEUED.inc()
+    queued = True
+    try:
+        async with _compress_slots:
+            COMPRESS_QUEUED.dec()
+            queued = False
+            COMPRESS_RUNNING.inc()
+            try:
+                return await asyncio.to_thread(compress, file_path)
+            finally:
+                COMPRESS_RUNNING.dec()
+    finally:
+        if queued:
+            COMPRESS_QUEUED.dec()
+
+@contextmanager
+def track_telegram(method: str):
+    """Метрики вызова Bot API: длительность и ошибки"""
+    started = time.perf_counter()
+    try:
+        with span(method):
+            yield
+    except TelegramError:
+        TELEGRAM_ERRORS.inc(method=method)
+        raise
+    finally:
+        TELEGRAM_SECONDS.observe(time.perf_counter() - started, method=method)
 
 async def send_text_message(
     update: Update,
@@ -37,13 +108,14 @@ async def send_text_message(
     """Отправляет текст без reply, если настройка выключена"""
     chat_id = update.effective_chat.id
     reply_to_message_id = get_reply_to_message_id(update)
-    await context.bot.send_message(
-        chat_id=chat_id,
-        text=text,
-        message_thread_id=thread_id,
-        reply_to_message_id=reply_to_message_id,
-        **kwargs
-    )
+    with track_telegram("send_message"):
+        return await context.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            message_thread_id=thread_id,
+            reply_to_message_id=reply_to_message_id,
+            **kwargs
+        )
 
 def should_reply_in_chat(update: Update) -> bool:
     """Определяет, нужно ли отвечать в этом чате"""
@@ -67,34 +139,403 @@ def should_reply_in_chat(update: Update) -> bool:
     
     return False
 
+async def remember_file_id(media_url: str, message) -> None:
+    """Запоминает file_id отправленного медиа, чтобы не загружать его повторно"""
+    if message is None:
+        return
+    if message.photo:
+        await shared_file_id_cache.set(media_url, message.photo[-1].file_id)
+    elif message.video:
+        await shared_file_id_cache.set(media_url, message.video.file_id)
+
 def check_whitelist(user_id: int) -> bool:
     """Проверяет whitelist пользователей"""
     if config.TELEGRAM_USER_IDS is None:
         return True
     return user_id in config.TELEGRAM_USER_IDS
 
+class DeliveryTimer:
+    """Замеряет время до первого сообщения карточки и до её полной отправки"""
+    
+    def __init__(self, tweet_url: str):
+        self.tweet_url = tweet_url
+        self.started = time.monotonic()
+        self.first_byte: float | None = None
+    
+    def mark_first_byte(self):
+        if self.first_byte is None:
+            self.first_byte = time.monotonic() - self.started
+    
+    def mark_complete(self):
+        total = time.monotonic() - self.started
+        first_byte = self.first_byte if self.first_byte is not None else total
+        logger.info(
+            "Карточка %s: первый ответ %.2fс, полностью %.2fс", self.tweet_url, first_byte, total,
+            extra={"tweet_url": self.tweet_url, "first_byte_seconds": round(first_byte, 3),
+                   "total_seconds": round(total, 3)},
+        )
+
+async def keep_chat_action(bot, chat_id: int, action: str, thread_id: int = None):
+    """Повторяет chat action, пока задача не будет отменена (Telegram гасит его через 5 с)"""
+    try:
+        while True:
+            try:
+                await bot.send_chat_action(chat_id=chat_id, action=action, message_thread_id=thread_id)
+            except TelegramError as e:
+                logger.debug("Не удалось отправить chat action: %s", e)
+            await asyncio.sleep(4)
+    except asyncio.CancelledError:
+        pass
+
+def medium_photo_url(url: str) -> str:
+    """URL фото pbs.twimg.com в размере medium: name= заменяется или добавляется"""
+    parts = urlsplit(url)
+    if parts.hostname != "pbs.twimg.com":
+        return url
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != "name"]
+    query.append(("name", "medium"))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def reduce_media(media_items: list, level: str) -> list:
+    """Облегчает медиа сверх квоты: фото меньшего размера, видео - превью.
+    
+    Медиа, уже загруженные в Telegram (есть file_id), отдаются как есть: они бесплатны.
+    """
+    if level == QUOTA_FULL:
+        return media_items
+    
+    reduced = []
+    for item in media_items:
+        if file_id_cache.get(item.url):
+            reduced.append(item)
+        elif level == QUOTA_TEXT_ONLY:
+            continue
+        elif item.type == "photo":
+            reduced.append(MediaItem(type="photo", url=medium_photo_url(item.url)))
+        elif item.thumbnail_url:
+            reduced.append(MediaItem(type="photo", url=item.thumbnail_url))
+    return reduced
+
+async def prepare_media(media_items: list, temp_files: list[str], usage: MediaUsage | None = None) -> tuple[list, set]:
+    """Скачивает и сжимает медиа; уже загруженные в Telegram берёт по file_id.
+    
+    Возвращает список (тип, путь к файлу или file_id, URL оригинала) и множество URL из кэша file_id.
+    В usage накапливаются скачанные байты и время сжатия для квот.
+    """
+    media_files = []
+    cached_urls = set()
+    for media_item in media_items[:10]:  # Ограничение 10 медиа
+        file_id = file_id_cache.get(media_item.url)
+        if file_id:
+            media_files.append((media_item.type, file_id, media_item.url))
+            cached_urls.add(media_item.url)
+            continue
+        
+        with MEDIA_DOWNLOAD_SECONDS.time(type=media_item.type), span("download", type=media_item.type) as download_span:
+            file_path = await download_media_file(media_item.url, media_item.type)
+        if file_path:
+            downloaded_bytes = int(get_file_size_mb(file_path) * 1024 * 1024)
+            MEDIA_DOWNLOAD_BYTES.inc(downloaded_bytes, type=media_item.type)
+            MEDIA_DOWNLOAD_SIZE.observe(downloaded_bytes, type=media_item.type)
+            if download_span:
+                download_span.set(bytes=downloaded_bytes)
+            
+            # Сжимаем если нужно
+            encode_started = time.monotonic()
+            with span("compress", type=media_item.type):
+                compressed_path = await run_compression(media_item.type, file_path)
+            encode_seconds = time.monotonic() - encode_started
+            if compressed_path != file_path:
+                COMPRESS_SECONDS.observe(encode_seconds, type=media_item.type)
+                if downloaded_bytes:
+                    compressed_bytes = get_file_size_mb(compressed_path) * 1024 * 1024
+                    COMPRESS_RATIO.observe(compressed_bytes / downloaded_bytes, type=media_item.type)
+            if usage is not None:
+                usage.bytes += downloaded_bytes
+                usage.encode_seconds += encode_seconds
+                MEDIA_INFLIGHT_BYTES.inc(downloaded_bytes)
+            
+            media_files.append((media_item.type, compressed_path, media_item.url))
+            temp_files.append(file_path)
+            if compressed_path != file_path:
+                temp_files.append(compressed_path)
+    
+    return media_files, cached_urls
+
+async def send_media(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    media_files: list,
+    cached_urls: set,
+    caption: str | None,
+    thread_id: int = None,
+    reply_to_message_id: int | None = None,
+    reply_markup: InlineKeyboardMarkup | None = None
+) -> list:
+    """Отправляет одно медиа или альбом и запоминает их file_id.
+    
+    reply_markup применяется только к одиночному медиа: media_group его не поддерживает.
+    """
+    opened_files = []
+    
+    def open_media(source: str, media_url: str):
+        if media_url in cached_urls:
+            return source
+        f = open(source, 'rb')
+        opened_files.append(f)
+        return f
+    
+    try:
+        if len(media_files) == 1:
+            # Одно медиа
+            media_type, source, media_url = media_files[0]
+            send_kwargs = dict(
+                chat_id=chat_id,
+                caption=caption,
+                parse_mode=ParseMode.HTML if caption else None,
+                message_thread_id=thread_id,
+                reply_to_message_id=reply_to_message_id,
+                show_caption_above_media=config.CAPTION_ABOVE_MEDIA,
+                reply_markup=reply_markup
+            )
+            if media_type == "photo":
+                with track_telegram("send_photo"):
+                    sent = await context.bot.send_photo(photo=open_media(source, media_url), **send_kwargs)
+            else:
+                with track_telegram("send_video"):
+                    sent = await context.bot.send_video(video=open_media(source, media_url), **send_kwargs)
+            await remember_file_id(media_url, sent)
+            return [sent]
+        
+        # Несколько медиа - альбом
+        media_group = []
+        for idx, (media_type, source, media_url) in enumerate(media_files):
+            media_class = InputMediaPhoto if media_type == "photo" else InputMediaVideo
+            media_group.append(media_class(
+                media=open_media(source, media_url),
+                caption=caption if idx == 0 else None,
+                parse_mode=ParseMode.HTML if (idx == 0 and caption) else None,
+                show_caption_above_media=config.CAPTION_ABOVE_MEDIA
+            ))
+        
+        with track_telegram("send_media_group"):
+            sent_messages = await context.bot.send_media_group(
+                chat_id=chat_id,
+                media=media_group,
+                message_thread_id=thread_id,
+                reply_to_message_id=reply_to_message_id
+            )
+        for (_, _, media_url), sent in zip(media_files, sent_messages):
+            await remember_file_id(media_url, sent)
+        return list(sent_messages)
+    finally:
+        # Закрываем все открытые файлы
+        for f in opened_files:
+            f.close()
+
+def should_deliver_progressively(tweet) -> bool:
+    """Прогрессивная отправка нужна, если придётся скачивать видео"""
+    if not config.PROGRESSIVE_DELIVERY:
+        return False
+    return any(
+        item.type == "video" and not file_id_cache.get(item.url)
+        for item in tweet.media[:10]
+    )
+
+async def send_tweet_card_progressive(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    tweet,
+    card_text: str,
+    timer: DeliveryTimer,
+    thread_id: int = None
+):
+    """Сразу отправляет текст карточки, а медиа присылает ответом на неё, когда они готовы"""
+    chat_id = update.effective_chat.id
+    card_message = await send_text_message(
+        update,
+        context,
+        card_text,
+        thread_id=thread_id,
+        parse_mode=ParseMode.HTML,
+        disable_web_page_preview=True,
+        reply_markup=get_tweet_url_keyboard(tweet.url)
+    )
+    timer.mark_first_byte()
+    
+    temp_files = []
+    usage = MediaUsage()
+    action_task = asyncio.create_task(
+        keep_chat_action(context.bot, chat_id, ChatAction.UPLOAD_VIDEO, thread_id)
+    )
+    try:
+        with STAGE_SECONDS.time(stage="media"):
+            media_files, cached_urls = await prepare_media(tweet.media, temp_files, usage)
+        media_quota.charge(update.effective_user.id, chat_id, usage)
+        action_task.cancel()
+        
+        if not media_files:
+            await card_message.edit_text(
+                card_text + "\n\n⚠️ Не удалось загрузить медиа",
+                parse_mode=ParseMode.HTML,
+                disable_web_page_preview=True,
+                reply_markup=get_tweet_url_keyboard(tweet.url)
+            )
+            return
+        
+        # Текст уже отправлен: медиа идут без подписи ответом на карточку
+        await send_media(
+            context,
+            chat_id,
+            media_files,
+            cached_urls,
+            caption=None,
+            thread_id=thread_id,
+            reply_to_message_id=card_message.message_id
+        )
+    except TelegramError as e:
+        logger.error("Ошибка Telegram при отправке медиа: %s", e)
+        await send_text_message(
+            update,
+            context,
+            f"❌ Ошибка при отправке медиа: {e}",
+            thread_id=thread_id
+        )
+    finally:
+        action_task.cancel()
+        delete_files(temp_files)
+        MEDIA_INFLIGHT_BYTES.dec(usage.bytes)
+
+def start_quoted_load(tweet, tweet_id: str, username: str, lang_code: str | None) -> asyncio.Task | None:
+    """Запускает загрузку цитируемого твита, если в карточке есть цитата"""
+    if tweet.quoted_tweet is None or tweet.quoted_tweet.date is not None:
+        return None
+    task = asyncio.create_task(get_quoted_tweet(tweet_id, username, lang_code))
+    # Результат может не понадобиться (таймаут, ошибка отправки): забираем исключение
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+async def wait_quoted_tweet(tweet, quoted_task: asyncio.Task | None):
+    """Дополняет цитату датой и медиа, если она загрузилась за QUOTED_FETCH_TIMEOUT"""
+    if quoted_task is None:
+        return tweet
+    try:
+        # shield: по таймауту загрузка продолжается и попадёт в кэш
+        quoted = await asyncio.wait_for(asyncio.shield(quoted_task), config.QUOTED_FETCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.info("Цитата не загрузилась за %g с, карточка без её даты и медиа", config.QUOTED_FETCH_TIMEOUT)
+        return tweet
+    except Exception as e:
+        logger.warning("Не удалось загрузить цитируемый твит: %s", e)
+        return tweet
+    return merge_quoted_tweet(tweet, quoted)
+
+def with_quoted_media(tweet, quota_level: str):
+    """Добавляет медиа цитаты в конец альбома (INCLUDE_QUOTED_MEDIA), не больше 10 всего"""
+    if not config.INCLUDE_QUOTED_MEDIA or tweet.quoted_tweet is None:
+        return tweet
+    own_urls = {item.url for item in tweet.media}
+    quoted_media = [item for item in reduce_media(tweet.quoted_tweet.media, quota_level) if item.url not in own_urls]
+    room = 10 - len(tweet.media)
+    if not quoted_media or room <= 0:
+        return tweet
+    return dataclasses.replace(tweet, media=tweet.media + quoted_media[:room])
+
+async def edit_card_with_quote(card_message, tweet, quoted_task: asyncio.Task, render_card: Callable):
+    """Дописывает в отправленную текстовую карточку дату цитаты, когда та загрузится"""
+    quoted_tweet = await wait_quoted_tweet(tweet, quoted_task)
+    if quoted_tweet is tweet:
+        return
+    try:
+        await card_message.edit_text(
+            render_card(quoted_tweet),
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True,
+            reply_markup=get_tweet_url_keyboard(tweet.url)
+        )
+    except TelegramError as e:
+        logger.debug("Не удалось дописать цитату в карточку: %s", e)
+
+async def prepare_card_media(tweet, quoted_task: asyncio.Task | None, quota_level: str,
+                             temp_files: list[str], usage: MediaUsage) -> tuple:
+    """Готовит медиа твита, пока догружается цитата; медиа цитаты готовятся параллельно с ними.
+    
+    Возвращает твит с дополненной цитатой и общий список медиа для альбома.
+    """
+    own_count = len(tweet.media)
+    own_task = asyncio.create_task(prepare_media(tweet.media, temp_files, usage))
+    try:
+        tweet = with_quoted_media(await wait_quoted_tweet(tweet, quoted_task), quota_level)
+        if len(tweet.media) > own_count:
+            await shared_file_id_cache.warm(item.url for item in tweet.media[own_count:])
+        quoted_files, quoted_cached = await prepare_media(tweet.media[own_count:], temp_files, usage)
+        media_files, cached_urls = await own_task
+    finally:
+        # Дожидаемся отмены: иначе задача допишет temp_files уже после их удаления
+        own_task.cancel()
+        await asyncio.gather(own_task, return_exceptions=True)
+    return tweet, media_files + quoted_files, cached_urls | quoted_cached
+
 async def send_tweet_card(
     update: Update, 
     context: ContextTypes.DEFAULT_TYPE,
     tweet,
     thread_id: int = None,
-    user_comment: str = None
+    user_comment: str = None,
+    quoted_task: asyncio.Task | None = None
 ):
-    """Отправляет карточку твита"""
+    """Отправляет карточку твита; quoted_task - загрузка цитируемого твита (start_quoted_load)"""
+    timer = DeliveryTimer(tweet.url)
     
     # Всегда показываем оригинальный текст
     # Информацию о переводе добавим в конец карточки если есть
     include_translation = bool(tweet.translated_text)
+    quota_note = ""
+    
+    def render_card(tweet) -> str:
+        with STAGE_SECONDS.time(stage="format"):
+            card_text = format_tweet_card(tweet, include_translation=include_translation, user_comment=user_comment)
+        return card_text + quota_note
     
-    # Форматируем карточку
-    card_text = format_tweet_card(tweet, include_translation=include_translation, user_comment=user_comment)
+    # file_id, сохранённые другими репликами, читаются дальше из локального кэша
+    await shared_file_id_cache.warm(item.url for item in tweet.media[:10])
+    
+    # Сверх квоты на медиа - облегчённые варианты или только текст
+    quota_level = media_quota.level(update.effective_user.id, update.effective_chat.id)
+    if tweet.media and quota_level != QUOTA_FULL:
+        media = reduce_media(tweet.media, quota_level)
+        logger.info("Квота медиа: %s, медиа %s -> %s", quota_level, len(tweet.media), len(media))
+        if not media:
+            quota_note = "\n\nℹ️ Лимит медиа исчерпан, вложения доступны по ссылке"
+        tweet = dataclasses.replace(tweet, media=media)
+    
+    if tweet.media and should_deliver_progressively(tweet):
+        # Текст уходит первым, поэтому цитату ждём до него
+        tweet = with_quoted_media(await wait_quoted_tweet(tweet, quoted_task), quota_level)
+        await send_tweet_card_progressive(update, context, tweet, render_card(tweet), timer, thread_id)
+        timer.mark_complete()
+        return
     
     temp_files = []
+    usage = MediaUsage()
+    card_text = ""
     
     try:
+        # Медиа (свои или цитаты) готовятся, пока догружается цитата
+        if tweet.media or (quoted_task is not None and config.INCLUDE_QUOTED_MEDIA):
+            with STAGE_SECONDS.time(stage="media"):
+                tweet, media_files, cached_urls = await prepare_card_media(
+                    tweet, quoted_task, quota_level, temp_files, usage
+                )
+            quoted_task = None
+        elif quoted_task is not None and quoted_task.done():
+            tweet = await wait_quoted_tweet(tweet, quoted_task)
+            quoted_task = None
+        card_text = render_card(tweet)
+        
         # Если нет медиа - просто отправляем текст
         if not tweet.media:
-            await send_text_message(
+            card_message = await send_text_message(
                 update,
                 context,
                 card_text,
@@ -103,23 +544,13 @@ async def send_tweet_card(
                 disable_web_page_preview=True,
                 reply_markup=get_tweet_url_keyboard(tweet.url)
             )
+            timer.mark_first_byte()
+            if quoted_task is not None:
+                # Текстовая карточка не ждёт цитату: дата дописывается правкой в фоне
+                inflight.spawn(edit_card_with_quote(card_message, tweet, quoted_task, render_card))
             return
         
-        # Скачиваем медиа
-        media_files = []
-        for media_item in tweet.media[:10]:  # Ограничение 10 медиа
-            file_path = await download_media_file(media_item.url, media_item.type)
-            if file_path:
-                # Сжимаем если нужно
-                if media_item.type == "photo":
-                    compressed_path = compress_image(file_path)
-                else:
-                    compressed_path = compress_video(file_path)
-                
-                media_files.append((media_item.type, compressed_path))
-                temp_files.append(file_path)
-                if compressed_path != file_path:
-                    temp_files.append(compressed_path)
+        media_quota.charge(update.effective_user.id, update.effective_chat.id, usage)
         
         if not media_files:
             # Медиа не удалось скачать
@@ -131,6 +562,7 @@ async def send_tweet_card(
                 parse_mode=ParseMode.HTML,
                 disable_web_page_preview=True
             )
+            timer.mark_first_byte()
             return
         
         # Проверяем длину caption
@@ -146,86 +578,33 @@ async def send_tweet_card(
                 parse_mode=ParseMode.HTML,
                 disable_web_page_preview=True
             )
+            timer.mark_first_byte()
             caption = None
         
         # Отправляем медиа
-        if len(media_files) == 1:
-            # Одно медиа
-            media_type, file_path = media_files[0]
-            reply_to_message_id = get_reply_to_message_id(update)
-            
-            with open(file_path, 'rb') as f:
-                if media_type == "photo":
-                    await context.bot.send_photo(
-                        chat_id=update.effective_chat.id,
-                        photo=f,
-                        caption=caption,
-                        parse_mode=ParseMode.HTML if caption else None,
-                        message_thread_id=thread_id,
-                        reply_to_message_id=reply_to_message_id,
-                        show_caption_above_media=config.CAPTION_ABOVE_MEDIA,
-                        reply_markup=get_tweet_url_keyboard(tweet.url)
-                    )
-                else:
-                    await context.bot.send_video(
-                        chat_id=update.effective_chat.id,
-                        video=f,
-                        caption=caption,
-                        parse_mode=ParseMode.HTML if caption else None,
-                        message_thread_id=thread_id,
-                        reply_to_message_id=reply_to_message_id,
-                        show_caption_above_media=config.CAPTION_ABOVE_MEDIA,
-                        reply_markup=get_tweet_url_keyboard(tweet.url)
-                    )
-        else:
-            # Несколько медиа - альбом
-            media_group = []
-            opened_files = []
-            reply_to_message_id = get_reply_to_message_id(update)
-            
-            try:
-                for idx, (media_type, file_path) in enumerate(media_files):
-                    f = open(file_path, 'rb')
-                    opened_files.append(f)
-                    
-                    if media_type == "photo":
-                        media_obj = InputMediaPhoto(
-                            media=f,
-                            caption=caption if idx == 0 else None,
-                            parse_mode=ParseMode.HTML if (idx == 0 and caption) else None,
-                            show_caption_above_media=config.CAPTION_ABOVE_MEDIA
-                        )
-                    else:
-                        media_obj = InputMediaVideo(
-                            media=f,
-                            caption=caption if idx == 0 else None,
-                            parse_mode=ParseMode.HTML if (idx == 0 and caption) else None,
-                            show_caption_above_media=config.CAPTION_ABOVE_MEDIA
-                        )
-                    
-                    media_group.append(media_obj)
-                
-                await context.bot.send_media_group(
-                    chat_id=update.effective_chat.id,
-                    media=media_group,
-                    message_thread_id=thread_id,
-                    reply_to_message_id=reply_to_message_id
-                )
-                
-                # Отправляем кнопку с ссылкой после альбома (media_group не поддерживает reply_markup)
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text="👆",
-                    message_thread_id=thread_id,
-                    reply_markup=get_tweet_url_keyboard(tweet.url)
-                )
-            finally:
-                # Закрываем все открытые файлы
-                for f in opened_files:
-                    f.close()
+        await send_media(
+            context,
+            update.effective_chat.id,
+            media_files,
+            cached_urls,
+            caption,
+            thread_id=thread_id,
+            reply_to_message_id=get_reply_to_message_id(update),
+            reply_markup=get_tweet_url_keyboard(tweet.url) if len(media_files) == 1 else None
+        )
+        timer.mark_first_byte()
+        
+        if len(media_files) > 1:
+            # Отправляем кнопку с ссылкой после альбома (media_group не поддерживает reply_markup)
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text="👆",
+                message_thread_id=thread_id,
+                reply_markup=get_tweet_url_keyboard(tweet.url)
+            )
     
     except TelegramError as e:
-        logger.error(f"Ошибка Telegram при отправке: {e}")
+        logger.error("Ошибка Telegram при отправке: %s", e)
         await send_text_message(
             update,
             context,
@@ -237,57 +616,113 @@ async def send_tweet_card(
     finally:
         # Удаляем временные файлы
         delete_files(temp_files)
+        MEDIA_INFLIGHT_BYTES.dec(usage.bytes)
+        timer.mark_complete()
+
+async def send_thread(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    tweets: list,
+    thread_id: int = None
+):
+    """Отправляет тред: тексты постов слитно в минимуме сообщений, затем медиа альбомами"""
+    chat_id = update.effective_chat.id
+    with STAGE_SECONDS.time(stage="format"):
+        texts = format_thread_messages(tweets)
+    
+    media = [item for tweet in tweets for item in tweet.media][:THREAD_MEDIA_LIMIT]
+    await shared_file_id_cache.warm(item.url for item in media)
+    quota_level = media_quota.level(update.effective_user.id, chat_id)
+    if media and quota_level != QUOTA_FULL:
+        reduced = reduce_media(media, quota_level)
+        logger.info("Квота медиа: %s, медиа треда %s -> %s", quota_level, len(media), len(reduced))
+        if not reduced:
+            texts[-1] += "\n\nℹ️ Лимит медиа исчерпан, вложения доступны по ссылке"
+        media = reduced
+    
+    for idx, text in enumerate(texts):
+        is_last = idx == len(texts) - 1
+        await send_text_message(
+            update,
+            context,
+            text,
+            thread_id=thread_id,
+            parse_mode=ParseMode.HTML,
+            disable_web_page_preview=True,
+            reply_markup=get_tweet_url_keyboard(tweets[-1].url) if is_last else None
+        )
+    
+    temp_files = []
+    usage = MediaUsage()
+    try:
+        for start in range(0, len(media), 10):
+            with STAGE_SECONDS.time(stage="media"):
+                media_files, cached_urls = await prepare_media(media[start:start + 10], temp_files, usage)
+            if media_files:
+                await send_media(context, chat_id, media_files, cached_urls, caption=None, thread_id=thread_id)
+            # Файлы альбома больше не нужны: не держим на диске весь тред
+            delete_files(temp_files)
+            temp_files.clear()
+    except TelegramError as e:
+        logger.error("Ошибка Telegram при отправке медиа треда: %s", e)
+        await send_text_message(update, context, f"❌ Ошибка при отправке медиа: {e}", thread_id=thread_id)
+    finally:
+        media_quota.charge(update.effective_user.id, chat_id, usage)
+        delete_files(temp_files)
+        MEDIA_INFLIGHT_BYTES.dec(usage.bytes)
 
 async def process_tweet_url(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
     original_url: str,
     thread_id: int = None,
-    user_comment: str = None
+    user_comment: str = None,
+    unroll: bool = False
 ):
-    """Обрабатывает одну ссылку на твит"""
+    """Обрабатывает одну ссылку на твит; unroll - развернуть тред автора до этого твита"""
     normalized_url = normalize_url(original_url)
     
     if not normalized_url:
-        logger.warning(f"Не удалось нормализовать URL: {original_url}")
+        logger.warning("Не удалось нормализовать URL: %s", original_url)
         return False
     
     tweet_id = extract_tweet_id(normalized_url)
     username = extract_username(normalized_url)
     
     if not tweet_id or not username:
-        logger.warning(f"Не удалось извлечь данные из URL: {normalized_url}")
+        logger.warning("Не удалось извлечь данные из URL: %s", normalized_url)
         return False
     
     # Проверяем настройку перевода
     user_id = update.effective_user.id
-    lang_code = translate_settings.get_language(user_id)
+    lang_code = await translate_settings.get_language(user_id)
     
     # Получаем данные твита
-    logger.info(f"Обработка твита: {tweet_id} (язык: {lang_code or 'нет'})")
-    
-    # Получаем HTML твита
-    html = await fetch_tweet_html(tweet_id, username, lang_code)
+    logger.info("Обработка твита: %s (язык: %s)", tweet_id, lang_code or 'нет')
     
-    if not html:
-        await send_text_message(
-            update,
-            context,
-            f"❌ Твит недоступен (возможно приватный, удалён или 18+): {original_url}",
-            thread_id=thread_id
-        )
-        return False
+    # Получаем твит (из кэша или загружаем и парсим HTML)
+    thread_tweets = []
+    with STAGE_SECONDS.time(stage="fetch"), span("get_tweet", tweet_id=tweet_id, lang=lang_code or "-"):
+        if unroll:
+            thread_tweets = await unroll_thread(tweet_id, username, lang_code)
+            tweet = thread_tweets[-1] if thread_tweets else None
+        else:
+            tweet = await get_tweet(tweet_id, username, lang_code, normalized_url)
     
-    # Парсим твит
-    tweet = parse_tweet_html(html, normalized_url)
+    # Цитируемый твит (дата, медиа) догружается параллельно с медиа карточки
+    quoted_task = start_quoted_load(tweet, tweet_id, username, lang_code) if tweet and not unroll else None
     
     if not tweet:
-        await send_text_message(
-            update,
-            context,
-            f"❌ Не удалось распарсить твит: {original_url}",
-            thread_id=thread_id
-        )
+        reason = get_unavailable_reason(tweet_id)
+        if reason == "not_found":
+            error_text = f"❌ Твит не найден (возможно удалён): {original_url}"
+        elif reason == "forbidden":
+            error_text = f"❌ Твит недоступен (приватный или 18+): {original_url}"
+        elif mirror_pool.is_down():
+            error_text = "⚠️ Источник твитов временно недоступен, попробуйте через минуту"
+        else:
+            error_text = f"❌ Твит недоступен (возможно приватный, удалён или 18+): {original_url}"
+        await send_text_message(update, context, error_text, thread_id=thread_id)
         return False
     
     # Если перевод не получен, но запрошен
@@ -296,10 +731,24 @@ async def process_tweet_url(
     
     # Отправляем карточку
     try:
-        await send_tweet_card(update, context, tweet, thread_id, user_comment)
+        if len(thread_tweets) > 1:
+            with span("send_thread", tweets=len(thread_tweets)):
+                await send_thread(update, context, thread_tweets, thread_id)
+            return True
+        with span("send_card", media=len(tweet.media)):
+            await send_tweet_card(update, context, tweet, thread_id, user_comment, quoted_task)
+        if unroll:
+            # API знает только родителя твита: с первого твита тред не развернуть
+            await send_text_message(
+                update,
+                context,
+                "ℹ️ Выше твита в треде ничего нет. Чтобы развернуть тред целиком, "
+                "пришлите ссылку на его последний твит",
+                thread_id=thread_id
+            )
         return True
     except Exception as e:
-        logger.error(f"Ошибка при отправке твита: {e}")
+        logger.error("Ошибка при отправке твита: %s", e)
         await send_text_message(
             update,
             context,
@@ -310,7 +759,12 @@ async def process_tweet_url(
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик текстовых сообщений"""
-    
+    # Во время остановки карточка либо успевает целиком, либо отменяется вместе с файлами
+    with start_trace("message", chat_id=update.effective_chat.id):
+        if not await inflight.run(_handle_message(update, context)) and not inflight.accepting:
+            logger.info("Сообщение не обработано: бот останавливается")
+
+async def _handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Проверка нужно ли отвечать
     if not should_reply_in_chat(update):
         return
@@ -318,27 +772,18 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Whitelist
     user_id = update.effective_user.id
     if not check_whitelist(user_id):
-        logger.warning(f"Пользователь {user_id} не в whitelist")
-        return
-    
-    # Rate limiting
-    chat_id = update.effective_chat.id
-    if not rate_limiter.is_allowed(user_id, chat_id):
-        logger.info(f"Rate limit для пользователя {user_id}")
+        logger.warning("Пользователь %s не в whitelist", user_id)
         return
     
     # Ищем ссылки на твиты
     message_text = update.message.text or ""
-    tweet_urls = find_tweet_urls(message_text)
+    with STAGE_SECONDS.time(stage="extract"):
+        tweet_urls = find_tweet_urls(message_text)
     
     if not tweet_urls:
         return
-    
-    # Определяем thread_id для топиков
-    thread_id = None
-    if update.message.is_topic_message:
-        thread_id = update.message.message_thread_id
-        logger.info(f"Ответ в топик: {thread_id}")
+    MESSAGES_TOTAL.inc()
+    set_attributes(user_id=user_id, links=len(tweet_urls))
     
     # Извлекаем комментарий если есть текст перед первой ссылкой
     user_comment = None
@@ -349,7 +794,26 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         bot_username = update.get_bot().username
         user_comment = user_comment.replace(f"@{bot_username}", "").strip()
         if user_comment:
-            logger.info(f"Найден комментарий пользователя: {user_comment[:50]}")
+            logger.info("Найден комментарий пользователя: %.50s", user_comment)
+    
+    # Ключевое слово вместо комментария включает разворачивание треда
+    unroll = is_thread_request(user_comment)
+    if unroll:
+        user_comment = None
+    
+    # Rate limiting: каждая ссылка стоит один токен, тред - THREAD_RATE_COST
+    # (до 2×THREAD_MAX_TWEETS запросов к источнику и десятки медиа)
+    chat_id = update.effective_chat.id
+    cost = len(tweet_urls) * (config.THREAD_RATE_COST if unroll else 1)
+    if not await rate_limiter.is_allowed(user_id, chat_id, cost=cost):
+        logger.info("Rate limit для пользователя %s", user_id)
+        return
+    
+    # Определяем thread_id для топиков
+    thread_id = None
+    if update.message.is_topic_message:
+        thread_id = update.message.message_thread_id
+        logger.info("Ответ в топик: %s", thread_id)
     
     # Обрабатываем все найденные ссылки
     processed_count = 0
@@ -357,18 +821,26 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Комментарий только для первого твита
         comment = user_comment if idx == 0 else None
         
-        success = await process_tweet_url(
-            update,
-            context,
-            original_url,
-            thread_id,
-            comment
-        )
+        # Общий дедлайн на все запросы к источникам для этой карточки
+        with (
+            request_deadline(config.REQUEST_DEADLINE_SECONDS),
+            STAGE_SECONDS.time(stage="total"),
+            span("card", url=original_url),
+        ):
+            success = await process_tweet_url(
+                update,
+                context,
+                original_url,
+                thread_id,
+                comment,
+                unroll
+            )
         
+        CARDS_TOTAL.inc(result="ok" if success else "failed")
         if success:
             processed_count += 1
     
-    logger.info(f"Обработано {processed_count} из {len(tweet_urls)} ссылок")
+    logger.info("Обработано %s из %s ссылок", processed_count, len(tweet_urls))
     
     # Удаляем исходное сообщение в группах если включена опция
     chat = update.effective_chat
@@ -381,6 +853,6 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 chat_id=chat.id,
                 message_id=update.message.message_id
             )
-            logger.info(f"Удалено сообщение {update.message.message_id} в группе {chat.id}")
+            logger.info("Удалено сообщение %s в группе %s", update.message.message_id, chat.id)
         except TelegramError as e:
-            logger.warning(f"Не удалось удалить сообщение: {e}")
+            logger.warning("Не удалось удалить сообщение: %s", e)
@@ -1,12 +1,40 @@
 import os
 import time
 import logging
+import threading
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Временные файлы бота, которые ещё не удалены: путь -> время создания (time.time)
+_tracked_files: dict[str, float] = {}
+# Файлы регистрируются и из потоков сжатия
+_tracked_lock = threading.Lock()
+
+def track_file(file_path: str) -> str:
+    """Регистрирует временный файл: он будет удалён при остановке или очистке"""
+    with _tracked_lock:
+        _tracked_files[file_path] = time.time()
+    return file_path
+
+def tracked_files() -> list[str]:
+    """Зарегистрированные и ещё не удалённые файлы"""
+    with _tracked_lock:
+        return list(_tracked_files)
+
+def cleanup_tracked_files(max_age_seconds: float = 0) -> int:
+    """Удаляет зарегистрированные файлы старше max_age_seconds; без обхода всего /tmp"""
+    threshold = time.time() - max_age_seconds
+    with _tracked_lock:
+        stale = [path for path, created in _tracked_files.items() if created <= threshold]
+    for path in stale:
+        delete_file(path)
+    if stale:
+        logger.info("Удалено %s временных файлов", len(stale))
+    return len(stale)
+
 def cleanup_temp_files(temp_dir: str = "/tmp", max_age_seconds: int = 3600):
-    """Удаляет старые временные файлы бота"""
+    """Удаляет старые временные файлы бота, обходя весь каталог (остатки прошлого запуска)"""
     
     prefixes = ["tweet_media_", "compressed_"]
     temp_path = Path(temp_dir)
@@ -35,22 +63,24 @@ def cleanup_temp_files(temp_dir: str = "/tmp", max_age_seconds: int = 3600):
                     deleted_count += 1
                     
             except Exception as e:
-                logger.warning(f"Не удалось удалить {file_path}: {e}")
+                logger.warning("Не удалось удалить %s: %s", file_path, e)
         
         if deleted_count > 0:
-            logger.info(f"Удалено {deleted_count} старых временных файлов")
+            logger.info("Удалено %s старых временных файлов", deleted_count)
             
     except Exception as e:
-        logger.error(f"Ошибка при очистке временных файлов: {e}")
+        logger.error("Ошибка при очистке временных файлов: %s", e)
 
 def delete_file(file_path: str):
     """Удаляет один файл"""
+    with _tracked_lock:
+        _tracked_files.pop(file_path, None)
     try:
         if os.path.exists(file_path):
             os.unlink(file_path)
-            logger.debug(f"Удалён файл: {file_path}")
+            logger.debug("Удалён файл: %s", file_path)
     except Exception as e:
-        logger.warning(f"Не удалось удалить файл {file_path}: {e}")
+        logger.warning("Не удалось удалить файл %s: %s", file_path, e)
 
 def delete_files(file_paths: list[str]):
     """Удаляет список файлов"""
@@ -2,12 +2,40 @@ import os
 import tempfile
 import logging
 import subprocess
-from PIL import Image
 from src.config import config
+from src.media.cleanup import delete_file, track_file
 from src.media.download import get_file_size_mb
+from src.utils.metrics import COMPRESS_ATTEMPTS
 
 logger = logging.getLogger(__name__)
 
+# Запущенные ffmpeg: при остановке бота их завершает terminate_ffmpeg
+_ffmpeg_processes: set[subprocess.Popen] = set()
+
+def _run_ffmpeg(cmd: list[str], timeout: float) -> int:
+    """Запускает ffmpeg и ждёт его; процесс виден terminate_ffmpeg"""
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _ffmpeg_processes.add(process)
+    try:
+        process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise
+    finally:
+        _ffmpeg_processes.discard(process)
+    return process.returncode
+
+def terminate_ffmpeg() -> int:
+    """Завершает все запущенные ffmpeg (SIGTERM); возвращает их число"""
+    processes = list(_ffmpeg_processes)
+    for process in processes:
+        try:
+            process.terminate()
+        except OSError:
+            pass
+    return len(processes)
+
 def compress_image(input_path: str, max_size_mb: float = None) -> str:
     """Сжимает изображение"""
     if max_size_mb is None:
@@ -21,6 +49,10 @@ def compress_image(input_path: str, max_size_mb: float = None) -> str:
     if current_size <= max_size_mb:
         return input_path
     
+    # Pillow нужен только когда файл действительно приходится сжимать
+    from PIL import Image
+
+    output_path = None
     try:
         img = Image.open(input_path)
         
@@ -35,21 +67,26 @@ def compress_image(input_path: str, max_size_mb: float = None) -> str:
         # Создаём новый временный файл
         fd, output_path = tempfile.mkstemp(suffix=".jpg", dir="/tmp", prefix="compressed_")
         os.close(fd)
+        track_file(output_path)
         
         # Начинаем с качества 85
         quality = 85
         img.save(output_path, "JPEG", quality=quality, optimize=True)
+        COMPRESS_ATTEMPTS.inc(type="photo")
         
         # Уменьшаем качество пока не достигнем нужного размера
         while get_file_size_mb(output_path) > max_size_mb and quality > 30:
             quality -= 5
             img.save(output_path, "JPEG", quality=quality, optimize=True)
+            COMPRESS_ATTEMPTS.inc(type="photo")
         
-        logger.info(f"Изображение сжато: {current_size:.2f}MB -> {get_file_size_mb(output_path):.2f}MB")
+        logger.info("Изображение сжато: %.2fMB -> %.2fMB", current_size, get_file_size_mb(output_path))
         return output_path
         
     except Exception as e:
-        logger.error(f"Ошибка сжатия изображения: {e}")
+        logger.error("Ошибка сжатия изображения: %s", e)
+        if output_path:
+            delete_file(output_path)
         return input_path
 
 def compress_video(input_path: str, max_size_mb: float = None) -> str:
@@ -72,9 +109,11 @@ def compress_video(input_path: str, max_size_mb: float = None) -> str:
         logger.warning("ffmpeg не найден, сжатие видео недоступно")
         return input_path
     
+    output_path = None
     try:
         fd, output_path = tempfile.mkstemp(suffix=".mp4", dir="/tmp", prefix="compressed_")
         os.close(fd)
+        track_file(output_path)
         
         # Простое сжатие через ffmpeg
         cmd = [
@@ -89,16 +128,20 @@ def compress_video(input_path: str, max_size_mb: float = None) -> str:
             output_path
         ]
         
-        result = subprocess.run(cmd, capture_output=True, timeout=120)
+        returncode = _run_ffmpeg(cmd, timeout=120)
+        COMPRESS_ATTEMPTS.inc(type="video")
         
-        if result.returncode == 0 and os.path.exists(output_path):
+        if returncode == 0 and os.path.exists(output_path):
             new_size = get_file_size_mb(output_path)
-            logger.info(f"Видео сжато: {current_size:.2f}MB -> {new_size:.2f}MB")
+            logger.info("Видео сжато: %.2fMB -> %.2fMB", current_size, new_size)
             return output_path
         else:
-            logger.error("Ошибка сжатия видео через ffmpeg")
+            logger.error("Ошибка сжатия видео через ffmpeg (код %s)", returncode)
+            delete_file(output_path)
             return input_path
             
     except Exception as e:
-        logger.error(f"Ошибка сжатия видео: {e}")
+        logger.error("Ошибка сжатия видео: %s", e)
+        if output_path:
+            delete_file(output_path)
         return input_path
\ No newline at end of file
@@ -1,12 +1,21 @@
+import asyncio
 import os
 import tempfile
 import logging
 from pathlib import Path
 from typing import Optional
+from src.media.cleanup import track_file
 from src.twitter.fetcher import download_media
 
 logger = logging.getLogger(__name__)
 
+def _write_temp_file(content: bytes, ext: str) -> str:
+    fd, temp_path = tempfile.mkstemp(suffix=ext, dir="/tmp", prefix="tweet_media_")
+    track_file(temp_path)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    return temp_path
+
 async def download_media_file(url: str, media_type: str = "photo") -> Optional[str]:
     """Скачивает медиа файл во временную директорию"""
     
@@ -28,19 +37,15 @@ async def download_media_file(url: str, media_type: str = "photo") -> Optional[s
         else:
             ext = ".jpg"
     
-    # Создаём временный файл
+    # Создаём временный файл; запись видео на десятки МБ - в потоке, не в event loop
     try:
-        fd, temp_path = tempfile.mkstemp(suffix=ext, dir="/tmp", prefix="tweet_media_")
-        os.close(fd)
-        
-        with open(temp_path, 'wb') as f:
-            f.write(content)
+        temp_path = await asyncio.to_thread(_write_temp_file, content, ext)
         
-        logger.info(f"Медиа скачано: {temp_path} ({len(content)} байт)")
+        logger.info("Медиа скачано: %s (%s байт)", temp_path, len(content))
         return temp_path
         
     except Exception as e:
-        logger.error(f"Ошибка сохранения медиа: {e}")
+        logger.error("Ошибка сохранения медиа: %s", e)
         return None
 
 def get_file_size_mb(file_path: str) -> float:
@@ -0,0 +1,428 @@
+"""Общее состояние для нескольких экземпляров бота: память, SQLite или Redis"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Optional, Sequence
+from urllib.parse import unquote, urlparse
+from src.config import config
+from src.utils.token_bucket import BucketRequest, TokenBuckets
+
+logger = logging.getLogger(__name__)
+
+# Идентификатор процесса: владелец распределённых блокировок
+INSTANCE_ID = uuid.uuid4().hex
+
+
+class StateBackend(ABC):
+    """Асинхронное ключ-значение с TTL.
+
+    shared - состояние видно другим процессам (реплики делят нагрузку);
+    persistent - переживает перезапуск.
+    """
+
+    shared = False
+    persistent = False
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    async def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Атомарно записывает значение, только если ключа нет; True - записано"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def delete_if_equals(self, key: str, value: bytes) -> bool:
+        """Атомарно удаляет ключ, только если в нём value (снятие своей блокировки); True - удалён"""
+
+    @abstractmethod
+    async def take_tokens(self, requests: Sequence[BucketRequest]) -> bool:
+        """Атомарно списывает токены со всех bucket'ов (ключ, ёмкость, пополнение/с, стоимость)
+        или ни с одного; False - в каком-то bucket'е не хватило токенов"""
+
+    async def purge_expired(self):
+        """Удаляет истёкшие записи там, где они не удаляются сами"""
+
+    async def close(self):
+        pass
+
+
+class MemoryBackend(StateBackend):
+    """Состояние в памяти процесса (один экземпляр бота)"""
+
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, Optional[float]]] = {}
+        self._buckets = TokenBuckets()
+
+    def _alive(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._alive(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+
+    async def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        if self._alive(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def delete_if_equals(self, key: str, value: bytes) -> bool:
+        if self._alive(key) != value:
+            return False
+        del self._data[key]
+        return True
+
+    async def take_tokens(self, requests: Sequence[BucketRequest]) -> bool:
+        return self._buckets.take(requests)
+
+    async def purge_expired(self):
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+
+
+class SQLiteBackend(StateBackend):
+    """Файл SQLite (WAL): переживает перезапуск, общий для процессов на одном томе.
+
+    Запросы выполняются в потоке, чтобы не блокировать event loop.
+    """
+
+    shared = True
+    persistent = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        if path == ":memory:":
+            # База в памяти не видна другим процессам и не переживает перезапуск
+            self.shared = self.persistent = False
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # В режиме WAL NORMAL не делает fsync на каждый коммит, но не теряет целостность
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _run(self, fn, *args):
+        with self._lock:
+            return fn(self._connection(), *args)
+
+    @staticmethod
+    def _get(conn: sqlite3.Connection, key: str) -> Optional[bytes]:
+        row = conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    @staticmethod
+    def _set(conn: sqlite3.Connection, key: str, value: bytes, ttl: Optional[float]):
+        expires_at = time.time() + ttl if ttl is not None else None
+        conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at))
+
+    @staticmethod
+    def _set_if_absent(conn: sqlite3.Connection, key: str, value: bytes, ttl: Optional[float]) -> bool:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl if ttl is not None else None),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _take_tokens(conn: sqlite3.Connection, requests: Sequence[BucketRequest]) -> bool:
+        # Часы должны быть общими для процессов, поэтому time.time(), а не monotonic
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            remaining = []
+            for key, capacity, rate, cost in requests:
+                row = conn.execute(
+                    "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, now)
+                ).fetchone()
+                tokens = capacity
+                if row is not None:
+                    saved_tokens, updated_at = map(float, row[0].split(b":"))
+                    tokens = min(capacity, saved_tokens + (now - updated_at) * rate)
+                if tokens < cost:
+                    conn.execute("ROLLBACK")
+                    return False
+                remaining.append(tokens - cost)
+
+            for (key, capacity, rate, _), tokens in zip(requests, remaining):
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, f"{tokens}:{now}".encode(), now + (capacity - tokens) / rate),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._run, self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await asyncio.to_thread(self._run, self._set, key, value, ttl)
+
+    async def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return await asyncio.to_thread(self._run, self._set_if_absent, key, value, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._run, lambda conn: conn.execute("DELETE FROM kv WHERE key = ?", (key,)))
+
+    async def delete_if_equals(self, key: str, value: bytes) -> bool:
+        cursor = await asyncio.to_thread(
+            self._run,
+            lambda conn: conn.execute(
+                "DELETE FROM kv WHERE key = ? AND value = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, value, time.time()),
+            ),
+        )
+        return cursor.rowcount == 1
+
+    async def take_tokens(self, requests: Sequence[BucketRequest]) -> bool:
+        return await asyncio.to_thread(self._run, self._take_tokens, requests)
+
+    async def purge_expired(self):
+        await asyncio.to_thread(
+            self._run, lambda conn: conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+        )
+
+    async def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class RedisError(Exception):
+    """Ошибка, которую вернул Redis"""
+
+
+def _encode_command(args: tuple) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, (int, float)):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b"\r\n")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Неизвестный ответ Redis: {line!r}")
+
+
+# Token bucket'ы атомарно на стороне Redis: KEYS - ключи, ARGV - now и тройки
+# (ёмкость, пополнение/с, стоимость); состояние хранится как "токены:время"
+_TAKE_TOKENS_SCRIPT = """
+local now = tonumber(ARGV[1])
+local remaining = {}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local cost = tonumber(ARGV[i * 3 + 1])
+    local tokens = capacity
+    local saved = redis.call('GET', KEYS[i])
+    if saved then
+        local sep = string.find(saved, ':', 1, true)
+        local updated_at = tonumber(string.sub(saved, sep + 1))
+        tokens = math.min(capacity, tonumber(string.sub(saved, 1, sep - 1)) + (now - updated_at) * rate)
+    end
+    if tokens < cost then
+        return 0
+    end
+    remaining[i] = tokens - cost
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local rate = tonumber(ARGV[i * 3])
+    local ttl = math.ceil((capacity - remaining[i]) / rate * 1000) + 1
+    redis.call('SET', KEYS[i], remaining[i] .. ':' .. ARGV[1], 'PX', ttl)
+end
+return 1
+"""
+
+
+# Удаление ключа, только если в нём ожидаемое значение (владелец блокировки)
+_DELETE_IF_EQUALS_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisBackend(StateBackend):
+    """Redis (или совместимый сервер) по протоколу RESP без сторонних зависимостей.
+
+    Одно соединение, команды выполняются по очереди; при обрыве соединение
+    открывается заново при следующей команде.
+    """
+
+    shared = True
+    persistent = True
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+            await self._send(auth)
+        if self.db:
+            await self._send(("SELECT", self.db))
+
+    async def _send(self, args: tuple) -> Any:
+        self._writer.write(_encode_command(args))
+        await self._writer.drain()
+        return await _read_reply(self._reader)
+
+    async def _disconnect(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self._reader = self._writer = None
+
+    async def execute(self, *args) -> Any:
+        async with self._lock:
+            try:
+                if self._writer is None or self._writer.is_closing():
+                    await self._connect()
+                return await self._send(args)
+            except RedisError:
+                raise
+            except BaseException:
+                # Ответ мог остаться непрочитанным: соединение больше не годится
+                await self._disconnect()
+                raise
+
+    @staticmethod
+    def _ttl_args(ttl: Optional[float]) -> tuple:
+        return ("PX", max(1, int(ttl * 1000))) if ttl is not None else ()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self.execute("SET", key, value, *self._ttl_args(ttl))
+
+    async def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return await self.execute("SET", key, value, "NX", *self._ttl_args(ttl)) is not None
+
+    async def delete(self, key: str):
+        await self.execute("DEL", key)
+
+    async def delete_if_equals(self, key: str, value: bytes) -> bool:
+        return await self.execute("EVAL", _DELETE_IF_EQUALS_SCRIPT, 1, key, value) == 1
+
+    async def take_tokens(self, requests: Sequence[BucketRequest]) -> bool:
+        keys = [key for key, _, _, _ in requests]
+        args = [repr(time.time())]
+        for _, capacity, rate, cost in requests:
+            args += [repr(float(capacity)), repr(float(rate)), repr(float(cost))]
+        return await self.execute("EVAL", _TAKE_TOKENS_SCRIPT, len(keys), *keys, *args) == 1
+
+    async def close(self):
+        async with self._lock:
+            await self._disconnect()
+
+
+def create_backend(url: str) -> StateBackend:
+    """memory://, sqlite:///путь/к/файлу.db или redis://[:пароль@]хост:порт/бд"""
+    scheme = urlparse(url).scheme
+    if scheme in ("", "memory"):
+        return MemoryBackend()
+    if scheme == "sqlite":
+        # Как в SQLAlchemy: sqlite:///rel/path.db, sqlite:////abs/path.db
+        if not url.startswith("sqlite:///"):
+            raise ValueError("Путь SQLite задаётся как sqlite:///путь/к/файлу.db")
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if scheme == "redis":
+        return RedisBackend(url)
+    raise ValueError(f"Неизвестное хранилище состояния: {scheme}")
+
+
+# Общее состояние: rate limit, кэши, блокировки
+state_backend = create_backend(config.STATE_BACKEND_URL)
+
+# Постоянное хранилище настроек: общее, если оно постоянное, иначе локальный SQLite
+persistent_backend = state_backend if state_backend.persistent else SQLiteBackend(config.STORAGE_PATH)
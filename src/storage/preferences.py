@@ -0,0 +1,101 @@
+"""Настройки пользователей и чатов поверх постоянного хранилища состояния"""
+import json
+import logging
+from pathlib import Path
+from typing import Any
+from src.storage.backends import INSTANCE_ID, StateBackend, persistent_backend
+from src.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Области настроек: владелец - пользователь или чат
+SCOPE_USER = "user"
+SCOPE_CHAT = "chat"
+
+# Локальный кэш чтения: другие реплики увидят изменение не позже чем через столько секунд
+LOCAL_CACHE_TTL = 30
+LOCAL_CACHE_SIZE = 10000
+
+# Отличает «нет значения» от сохранённого None
+_MISSING = object()
+
+
+class PreferencesStore:
+    """Ключ-значение настроек по (scope, owner_id, key).
+
+    Каждая запись - одна атомарная операция с одним ключом хранилища;
+    чтения идут через кэш в памяти.
+    """
+
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
+        self._cache = TTLCache(maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL)
+
+    @staticmethod
+    def _key(scope: str, owner_id, key: str) -> str:
+        return f"pref:{scope}:{owner_id}:{key}"
+
+    async def get(self, scope: str, owner_id, key: str, default: Any = None) -> Any:
+        storage_key = self._key(scope, owner_id, key)
+        value = self._cache.get(storage_key, _MISSING)
+        if value is _MISSING:
+            raw = await self.backend.get(storage_key)
+            value = json.loads(raw) if raw is not None else None
+            self._cache.set(storage_key, value)
+        return default if value is None else value
+
+    async def set(self, scope: str, owner_id, key: str, value: Any):
+        storage_key = self._key(scope, owner_id, key)
+        await self.backend.set(storage_key, json.dumps(value, ensure_ascii=False).encode())
+        self._cache.set(storage_key, value)
+
+    async def delete(self, scope: str, owner_id, key: str):
+        storage_key = self._key(scope, owner_id, key)
+        await self.backend.delete(storage_key)
+        self._cache.set(storage_key, None)
+
+    async def _migrated(self, name: str) -> bool:
+        return await self.backend.get(f"migration:{name}") is not None
+
+    async def _mark_migrated(self, name: str):
+        # Отметка ставится только после успешного копирования: сбой посередине
+        # повторит миграцию, а копирование через set_if_absent идемпотентно
+        await self.backend.set(f"migration:{name}", INSTANCE_ID.encode())
+        self._cache.clear()
+
+    async def migrate_json(self, name: str, json_path: str, scope: str, key: str) -> int:
+        """Однократно переносит {owner_id: value} из JSON-файла.
+
+        Уже сохранённые значения не перезаписываются. Возвращает число
+        перенесённых записей; файл переименовывается в *.migrated.
+        """
+        if await self._migrated(name):
+            return 0
+
+        source = Path(json_path)
+        if not source.exists():
+            await self._mark_migrated(name)
+            return 0
+        try:
+            with open(source, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning("Не удалось прочитать %s для миграции: %s", source, e)
+            return 0
+
+        for owner_id, value in data.items():
+            await self.backend.set_if_absent(
+                self._key(scope, owner_id, key), json.dumps(value, ensure_ascii=False).encode()
+            )
+        await self._mark_migrated(name)
+
+        logger.info("Перенесено %s записей из %s", len(data), source)
+        try:
+            source.rename(source.with_name(source.name + ".migrated"))
+        except OSError as e:
+            logger.warning("Не удалось переименовать %s: %s", source, e)
+        return len(data)
+
+
+# Глобальный экземпляр
+preferences = PreferencesStore(persistent_backend)
@@ -1,41 +1,122 @@
+import asyncio
 import httpx
 import logging
-from typing import Optional
-from tenacity import (
-    before_sleep_log,
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_exponential,
-)
+import time
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import urlparse
 from src.config import config
+from src.twitter.mirrors import mirror_pool
+from src.utils.cache import negative_cache
+from src.utils.circuit_breaker import CircuitOpenError, get_breaker
+from src.utils.concurrency import get_limiter
+from src.utils.deadline import time_left
+from src.utils.metrics import UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+from src.utils.tracing import span
+from src.utils.retry import exponential_wait, get_retry_budget, parse_retry_after
+
+if TYPE_CHECKING:
+    from tenacity import RetryCallState
 
 logger = logging.getLogger(__name__)
 
 RETRY_STATUS_CODES = set(config.RETRY_STATUS_CODES)
 
+# Ответы, которые запоминаются в негативном кэше
+NEGATIVE_STATUS_CLASSES = {404: "not_found", 401: "forbidden", 403: "forbidden"}
+
 
 def _is_retry_status(status_code: int) -> bool:
     return status_code in RETRY_STATUS_CODES or 500 <= status_code < 600
 
 
-@retry(
-    reraise=True,
-    stop=stop_after_attempt(config.RETRY_MAX_ATTEMPTS),
-    wait=wait_exponential(
-        multiplier=config.RETRY_WAIT_MULTIPLIER,
-        min=config.RETRY_WAIT_MIN,
-        max=config.RETRY_WAIT_MAX,
-    ),
-    retry=retry_if_exception_type((
-        httpx.TimeoutException,
-        httpx.RequestError,
-        httpx.HTTPStatusError,
-    )),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-)
-async def _get_with_retry(client: httpx.AsyncClient, url: str, headers: dict) -> httpx.Response:
-    response = await client.get(url, headers=headers)
+def _retry_delay(retry_state: "RetryCallState") -> float:
+    """Задержка перед повтором: Retry-After из ответа или экспоненциальная"""
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response is not None:
+        retry_after = parse_retry_after(exc.response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after
+    return exponential_wait(retry_state.attempt_number)
+
+
+def _should_stop(retry_state: "RetryCallState") -> bool:
+    """Прекращает повторы по числу попыток, дедлайну карточки или бюджету повторов"""
+    if retry_state.attempt_number >= config.RETRY_MAX_ATTEMPTS:
+        return True
+
+    delay = _retry_delay(retry_state)
+    if delay > config.RETRY_AFTER_MAX:
+        logger.warning("Источник просит подождать %.0fс, повтор отменён", delay)
+        return True
+
+    remaining = time_left()
+    if remaining is not None and delay >= remaining:
+        logger.warning("Дедлайн запроса не позволяет повторить попытку")
+        return True
+
+    host = retry_state.kwargs.get("host", "")
+    if not get_retry_budget(host).try_acquire_retry():
+        logger.warning("Бюджет повторов для %s исчерпан", host)
+        return True
+
+    return False
+
+
+async def _get_once(client: httpx.AsyncClient, url: str, headers: dict, host: str) -> httpx.Response:
+    """Одна попытка запроса с таймаутом, урезанным до дедлайна карточки"""
+    remaining = time_left()
+    if remaining is not None and remaining <= 0:
+        raise httpx.TimeoutException("Дедлайн запроса истёк")
+
+    # Адаптивный лимит одновременных запросов к хосту; ожидание в очереди входит в дедлайн
+    limiter = get_limiter(host)
+    try:
+        await limiter.acquire(timeout=remaining)
+    except asyncio.TimeoutError:
+        raise httpx.TimeoutException(f"Дедлайн истёк в очереди к {host}")
+
+    # Таймаут запроса - от того, что осталось после очереди
+    request_kwargs = {}
+    remaining = time_left()
+    if remaining is not None:
+        if remaining <= 0:
+            limiter.release()
+            raise httpx.TimeoutException(f"Дедлайн истёк в очереди к {host}")
+        if client.timeout.read is None or remaining < client.timeout.read:
+            request_kwargs["timeout"] = httpx.Timeout(remaining, connect=min(remaining, 10.0))
+
+    started = time.monotonic()
+    latency = None
+    overloaded = False
+    status = "error"
+    try:
+        with span("http", host=host) as http_span:
+            # Лимитеру нужна задержка до заголовков: время скачивания тела
+            # (видео, картинки) зависит от размера файла, а не от нагрузки хоста
+            request = client.build_request("GET", url, headers=headers, **request_kwargs)
+            response = await client.send(request, stream=True)
+            headers_latency = time.monotonic() - started
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
+            if http_span:
+                http_span.set(status=response.status_code)
+        latency = headers_latency
+        overloaded = response.status_code == 429 or response.status_code >= 500
+        status = response.status_code
+    except httpx.TimeoutException:
+        overloaded = True
+        status = "timeout"
+        raise
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        limiter.release(latency, overloaded)
+        UPSTREAM_REQUESTS.inc(host=host, status=status)
+        UPSTREAM_SECONDS.observe(time.monotonic() - started, host=host)
+
     if _is_retry_status(response.status_code):
         raise httpx.HTTPStatusError(
             f"Retryable HTTP {response.status_code}",
@@ -44,13 +125,68 @@ async def _get_with_retry(client: httpx.AsyncClient, url: str, headers: dict) ->
         )
     return response
 
+
+async def _get_with_retry(client: httpx.AsyncClient, url: str, headers: dict) -> httpx.Response:
+    host = urlparse(url).netloc
+    breaker = get_breaker(host)
+    if not breaker.allow_request():
+        raise CircuitOpenError(host)
+    get_retry_budget(host).record_request()
+
+    # tenacity импортируется при первом запросе, а не при старте бота
+    from tenacity import AsyncRetrying, before_sleep_log, retry_if_exception_type
+
+    retrying = AsyncRetrying(
+        reraise=True,
+        stop=_should_stop,
+        wait=_retry_delay,
+        retry=retry_if_exception_type((
+            httpx.TimeoutException,
+            httpx.RequestError,
+            httpx.HTTPStatusError,
+        )),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+    )
+    try:
+        response = await retrying(_get_once, client, url, headers, host=host)
+    except asyncio.CancelledError:
+        # Проигравший хедж-запрос: результат о хосте неизвестен
+        breaker.release()
+        raise
+    except Exception:
+        # Истёкший дедлайн карточки - не вина хоста
+        remaining = time_left()
+        if remaining is None or remaining > 0:
+            breaker.record_failure()
+        else:
+            breaker.release()
+        raise
+    breaker.record_success()
+    return response
+
+
+def get_unavailable_reason(tweet_id: str) -> Optional[str]:
+    """Возвращает класс ошибки, если твит недавно оказался недоступен"""
+    return negative_cache.get(tweet_id)
+
+
+def _remember_unavailable(tweet_id: str, status_code: int):
+    status_class = NEGATIVE_STATUS_CLASSES.get(status_code)
+    if status_class:
+        negative_cache.set(tweet_id, status_class)
+
 async def fetch_tweet_data(tweet_id: str, username: str, lang_code: Optional[str] = None) -> Optional[dict]:
     """Получает данные твита через FxTwitter API"""
     
-    # FxTwitter предоставляет API endpoint
-    api_url = f"{config.FX_BASE_URL}/api/status/{tweet_id}"
+    # FxTwitter предоставляет API endpoint (на каждом зеркале свой хост)
+    api_url = f"/api/status/{tweet_id}"
+    
+    status_class = get_unavailable_reason(tweet_id)
+    if status_class:
+        logger.info("Твит %s в негативном кэше (%s), запрос пропущен", tweet_id, status_class)
+        return None
     
-    logger.info(f"Запрос API твита: {api_url}")
+    logger.info("Запрос API твита: %s", api_url)
     
     timeout = httpx.Timeout(30.0, connect=10.0)
     
@@ -64,77 +200,91 @@ async def fetch_tweet_data(tweet_id: str, username: str, lang_code: Optional[str
             if lang_code:
                 headers['Accept-Language'] = lang_code
             
-            response = await _get_with_retry(client, api_url, headers)
+            response = await mirror_pool.request(
+                lambda base_url: _get_with_retry(client, f"{base_url}{api_url}", headers)
+            )
             
             if response.status_code == 200:
                 try:
                     data = response.json()
-                    logger.debug(f"Получены данные: {list(data.keys()) if isinstance(data, dict) else type(data)}")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Получены данные: %s", list(data) if isinstance(data, dict) else type(data))
                     return data
                 except Exception as e:
-                    logger.error(f"Ошибка парсинга JSON: {e}")
+                    logger.error("Ошибка парсинга JSON: %s", e)
                     return None
             elif response.status_code == 404:
-                logger.warning(f"Твит не найден: {api_url}")
+                logger.warning("Твит не найден: %s", api_url)
+                _remember_unavailable(tweet_id, response.status_code)
                 return None
             elif response.status_code in [403, 401]:
-                logger.warning(f"Твит недоступен: {api_url}")
+                logger.warning("Твит недоступен: %s", api_url)
+                _remember_unavailable(tweet_id, response.status_code)
                 return None
             else:
-                logger.error(f"Ошибка HTTP {response.status_code}: {api_url}")
+                logger.error("Ошибка HTTP %s: %s", response.status_code, api_url)
                 return None
                 
         except httpx.TimeoutException:
-            logger.error(f"Таймаут при запросе: {api_url}")
+            logger.error("Таймаут при запросе: %s", api_url)
             return None
         except httpx.HTTPStatusError as e:
             status = e.response.status_code if e.response else "unknown"
-            logger.error(f"Ошибка HTTP {status}: {api_url}")
+            logger.error("Ошибка HTTP %s: %s", status, api_url)
             return None
         except Exception as e:
-            logger.error(f"Ошибка при получении твита: {e}")
+            logger.error("Ошибка при получении твита: %s", e)
             return None
 
 async def fetch_tweet_html(tweet_id: str, username: str, lang_code: Optional[str] = None) -> Optional[str]:
     """Получает HTML страницы твита через FxTwitter/FixupX (fallback)"""
     
-    base_url = f"{config.FX_BASE_URL}/{username}/status/{tweet_id}"
+    # Путь одинаковый для всех зеркал, хост выбирает mirror_pool
+    url = f"/{username}/status/{tweet_id}"
     if lang_code:
-        url = f"{base_url}/{lang_code}"
-    else:
-        url = base_url
+        url = f"{url}/{lang_code}"
     
-    logger.info(f"Запрос HTML твита: {url}")
+    status_class = get_unavailable_reason(tweet_id)
+    if status_class:
+        logger.info("Твит %s в негативном кэше (%s), запрос пропущен", tweet_id, status_class)
+        return None
+    
+    logger.info("Запрос HTML твита: %s", url)
     
     timeout = httpx.Timeout(30.0, connect=10.0)
     
     async with httpx.AsyncClient(timeout=timeout, follow_redirects=False) as client:
         try:
-            response = await _get_with_retry(client, url, {
+            headers = {
                 'User-Agent': 'TelegramBot/1.0 (compatible; +https://t.me/your_bot)'
-            })
+            }
+            response = await mirror_pool.request(
+                lambda base_url: _get_with_retry(client, f"{base_url}{url}", headers)
+            )
             
             if response.status_code == 200:
                 return response.text
             elif response.status_code == 404:
-                logger.warning(f"Твит не найден: {url}")
+                logger.warning("Твит не найден: %s", url)
+                _remember_unavailable(tweet_id, response.status_code)
                 return None
             elif response.status_code in [403, 401]:
-                logger.warning(f"Твит недоступен (приватный/18+): {url}")
+                logger.warning("Твит недоступен (приватный/18+): %s", url)
+                _remember_unavailable(tweet_id, response.status_code)
                 return None
             else:
-                logger.error(f"Ошибка HTTP {response.status_code}: {url}")
+                logger.error("Ошибка HTTP %s: %s", response.status_code, url)
                 return None
                 
         except httpx.TimeoutException:
-            logger.error(f"Таймаут при запросе: {url}")
+            logger.error("Таймаут при запросе: %s", url)
             return None
         except httpx.HTTPStatusError as e:
             status = e.response.status_code if e.response else "unknown"
-            logger.error(f"Ошибка HTTP {status}: {url}")
+            logger.error("Ошибка HTTP %s: %s", status, url)
             return None
         except Exception as e:
-            logger.error(f"Ошибка при получении твита: {e}")
+            logger.error("Ошибка при получении твита: %s", e)
             return None
 
 async def download_media(url: str) -> Optional[bytes]:
@@ -150,13 +300,13 @@ async def download_media(url: str) -> Optional[bytes]:
             if response.status_code == 200:
                 return response.content
             else:
-                logger.error(f"Ошибка загрузки медиа {response.status_code}: {url}")
+                logger.error("Ошибка загрузки медиа %s: %s", response.status_code, url)
                 return None
                 
         except httpx.HTTPStatusError as e:
             status = e.response.status_code if e.response else "unknown"
-            logger.error(f"Ошибка загрузки медиа {status}: {url}")
+            logger.error("Ошибка загрузки медиа %s: %s", status, url)
             return None
         except Exception as e:
-            logger.error(f"Ошибка при загрузке медиа: {e}")
+            logger.error("Ошибка при загрузке медиа: %s", e)
             return None
\ No newline at end of file
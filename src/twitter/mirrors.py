@@ -0,0 +1,190 @@
+"""Пул совместимых фронтендов (fxtwitter, fixupx, ...) с оценкой здоровья и хеджированием"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+from urllib.parse import urlparse
+import httpx
+from src.config import config
+from src.utils.circuit_breaker import STATE_OPEN, CircuitOpenError, get_breaker
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Сглаживание EWMA для задержки и доли ошибок
+EWMA_ALPHA = 0.2
+
+
+class MirrorStats:
+    """Задержка и ошибки одного фронтенда"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.host = urlparse(base_url).netloc or base_url
+        self.latencies: deque[float] = deque(maxlen=200)
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedges = 0
+
+    def _add_latency(self, latency: float):
+        self.latencies.append(latency)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += EWMA_ALPHA * (latency - self.latency_ewma)
+
+    def record(self, latency: float, ok: bool):
+        self.requests += 1
+        if ok:
+            self._add_latency(latency)
+        else:
+            self.errors += 1
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+
+    def record_cancelled(self, elapsed: float):
+        """Проигравший хедж: ответа не было elapsed секунд - это нижняя оценка задержки"""
+        self.requests += 1
+        self._add_latency(elapsed)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def score(self, prior: float = 0.0) -> float:
+        """Чем меньше, тем лучше; без замеров задержка считается равной prior"""
+        latency = self.latency_ewma if self.latency_ewma is not None else prior
+        return latency * (1 + 4 * self.error_rate) + 10 * self.error_rate
+
+
+class MirrorPool:
+    """Отправляет запрос на самое здоровое зеркало и хеджирует его следующим"""
+
+    def __init__(self, base_urls: list[str]):
+        self.mirrors = [MirrorStats(url) for url in base_urls]
+
+    def ranked(self) -> list[MirrorStats]:
+        # Зеркала без замеров получают среднюю задержку остальных, а не лучшую.
+        # Зеркала с открытым breaker'ом - в конец; sorted стабилен, при равных
+        # оценках сохраняется порядок из конфигурации
+        known = [m.latency_ewma for m in self.mirrors if m.latency_ewma is not None]
+        prior = sum(known) / len(known) if known else 0.0
+        return sorted(self.mirrors, key=lambda m: (get_breaker(m.host).state == STATE_OPEN, m.score(prior)))
+
+    def is_down(self) -> bool:
+        """Все зеркала недоступны (breaker'ы открыты)"""
+        return all(get_breaker(m.host).state == STATE_OPEN for m in self.mirrors)
+
+    def hedge_delay(self, mirror: MirrorStats) -> float:
+        """Через сколько секунд без ответа запускать запрос к следующему зеркалу"""
+        p95 = mirror.percentile(0.95)
+        if p95 is None:
+            return config.HEDGE_DELAY_MAX
+        return max(config.HEDGE_DELAY_MIN, min(p95, config.HEDGE_DELAY_MAX))
+
+    async def _timed(self, mirror: MirrorStats, fetch: Callable[[str], Awaitable[httpx.Response]]):
+        started = time.monotonic()
+        try:
+            response = await fetch(mirror.base_url)
+        except asyncio.CancelledError:
+            # Иначе медленное зеркало никогда не получит замер и останется первым
+            mirror.record_cancelled(time.monotonic() - started)
+            raise
+        except CircuitOpenError:
+            raise
+        except Exception:
+            mirror.record(time.monotonic() - started, ok=False)
+            raise
+        mirror.record(time.monotonic() - started, ok=True)
+        return response
+
+    async def request(self, fetch: Callable[[str], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Выполняет fetch(base_url) на лучшем зеркале.
+
+        Если ответа нет дольше p95 этого зеркала, параллельно запускается запрос
+        к следующему; побеждает первый успешный ответ, проигравший отменяется.
+        При ошибке сразу пробуется следующее зеркало.
+        """
+        candidates = self.ranked()
+        pending: dict[asyncio.Task, MirrorStats] = {}
+        next_idx = 0
+        last_error: Optional[BaseException] = None
+
+        def launch(hedge: bool = False):
+            nonlocal next_idx
+            mirror = candidates[next_idx]
+            next_idx += 1
+            if hedge:
+                mirror.hedges += 1
+                logger.info("Хеджированный запрос к %s", mirror.host)
+            task = asyncio.create_task(self._timed(mirror, fetch))
+            pending[task] = mirror
+
+        launch()
+        try:
+            while pending:
+                can_hedge = config.HEDGE_REQUESTS and len(pending) < 2 and next_idx < len(candidates)
+                timeout = self.hedge_delay(candidates[next_idx - 1]) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    launch(hedge=True)
+                    continue
+
+                for task in done:
+                    mirror = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        mirror.wins += 1
+                        return task.result()
+                    logger.warning("Зеркало %s не ответило: %r", mirror.host, error)
+                    last_error = error
+
+                if not pending and next_idx < len(candidates):
+                    launch()
+
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> list[dict]:
+        """Статистика зеркал для /status"""
+        result = []
+        for mirror in self.ranked():
+            result.append({
+                "host": mirror.host,
+                "requests": mirror.requests,
+                "errors": mirror.errors,
+                "error_rate": mirror.error_rate,
+                "p50": mirror.percentile(0.5),
+                "p95": mirror.percentile(0.95),
+                "wins": mirror.wins,
+                "hedges": mirror.hedges,
+                "breaker": get_breaker(mirror.host).state,
+            })
+        return result
+
+
+mirror_pool = MirrorPool(config.FX_MIRRORS)
+
+
+def _collect_metrics():
+    mirrors = mirror_pool.mirrors
+    yield "pmtwitter_mirror_error_rate", "gauge", "Сглаженная доля ошибок зеркала", [
+        ({"host": m.host}, m.error_rate) for m in mirrors
+    ]
+    yield "pmtwitter_mirror_wins_total", "counter", "Запросы, на которые зеркало ответило первым", [
+        ({"host": m.host}, m.wins) for m in mirrors
+    ]
+    yield "pmtwitter_mirror_hedges_total", "counter", "Хеджированные запросы к зеркалу", [
+        ({"host": m.host}, m.hedges) for m in mirrors
+    ]
+
+
+registry.register_collector(_collect_metrics)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
 from typing import Optional
 
@@ -37,6 +37,15 @@ class QuotedTweet:
     text: str
     date: Optional[datetime] = None
     media: list[MediaItem] = field(default_factory=list)
+    tweet_id: Optional[str] = None
+
+@dataclass
+class TweetLinks:
+    """Связи твита из JSON API: на что он отвечает и что цитирует"""
+    replying_to: Optional[str] = None  # username автора родителя
+    replying_to_status: Optional[str] = None
+    quote_id: Optional[str] = None
+    quote_username: Optional[str] = None
 
 @dataclass
 class Tweet:
@@ -50,4 +59,59 @@ class Tweet:
     stats: TweetStats = field(default_factory=TweetStats)
     poll: Optional[Poll] = None
     translated_text: Optional[str] = None
-    source_language: Optional[str] = None
\ No newline at end of file
+    source_language: Optional[str] = None
+
+def _media_from_dicts(items: list) -> list[MediaItem]:
+    return [MediaItem(type=item["type"], url=item["url"], thumbnail_url=item.get("thumbnail_url")) for item in items]
+
+def _date_from_str(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def tweet_to_dict(tweet: Tweet) -> dict:
+    """Твит в виде, пригодном для JSON (даты - ISO-строки)"""
+    data = asdict(tweet)
+    data["date"] = tweet.date.isoformat()
+    if tweet.quoted_tweet is not None:
+        data["quoted_tweet"]["date"] = tweet.quoted_tweet.date.isoformat() if tweet.quoted_tweet.date else None
+    return data
+
+def tweet_from_dict(data: dict) -> Tweet:
+    """Обратное к tweet_to_dict; лишние поля игнорируются, нехватка обязательных - KeyError"""
+    quoted = data.get("quoted_tweet")
+    poll = data.get("poll")
+    stats = data.get("stats") or {}
+    return Tweet(
+        display_name=data["display_name"],
+        username=data["username"],
+        url=data["url"],
+        text=data["text"],
+        date=datetime.fromisoformat(data["date"]),
+        media=_media_from_dicts(data.get("media") or []),
+        quoted_tweet=QuotedTweet(
+            display_name=quoted["display_name"],
+            username=quoted["username"],
+            url=quoted["url"],
+            text=quoted["text"],
+            date=_date_from_str(quoted.get("date")),
+            media=_media_from_dicts(quoted.get("media") or []),
+            tweet_id=quoted.get("tweet_id"),
+        ) if quoted else None,
+        stats=TweetStats(
+            replies=stats.get("replies"),
+            reposts=stats.get("reposts"),
+            likes=stats.get("likes"),
+            views=stats.get("views"),
+        ),
+        poll=Poll(
+            question=poll["question"],
+            options=[
+                PollOption(text=option["text"], votes=option.get("votes", 0), percent=option.get("percent", 0.0))
+                for option in poll["options"]
+            ],
+            total_votes=poll.get("total_votes", 0),
+            is_ended=poll.get("is_ended", False),
+            time_left=poll.get("time_left"),
+        ) if poll else None,
+        translated_text=data.get("translated_text"),
+        source_language=data.get("source_language"),
+    )
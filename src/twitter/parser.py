@@ -3,11 +3,13 @@ import re
 import logging
 import os
 from datetime import datetime
-from typing import Optional
-from bs4 import BeautifulSoup
+from typing import TYPE_CHECKING, Optional
 from src.twitter.models import Tweet, TweetStats, MediaItem, QuotedTweet, Poll, PollOption
 from src.config import config
 
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
 logger = logging.getLogger(__name__)
 
 TRANSLATION_HEADER_PATTERNS = (
@@ -88,7 +90,7 @@ def parse_date(date_str: Optional[str]) -> Optional[datetime]:
     
     return None
 
-def extract_json_ld(soup: BeautifulSoup) -> Optional[dict]:
+def extract_json_ld(soup: "BeautifulSoup") -> Optional[dict]:
     """Извлекает JSON-LD данные из HTML"""
     script = soup.find('script', type='application/ld+json')
     if script and script.string:
@@ -98,14 +100,14 @@ def extract_json_ld(soup: BeautifulSoup) -> Optional[dict]:
             pass
     return None
 
-def extract_og_meta(soup: BeautifulSoup, property_name: str) -> Optional[str]:
+def extract_og_meta(soup: "BeautifulSoup", property_name: str) -> Optional[str]:
     """Извлекает Open Graph meta теги"""
     tag = soup.find('meta', property=property_name)
     if tag and tag.get('content'):
         return tag['content']
     return None
 
-def parse_poll_from_html(soup: BeautifulSoup) -> Optional[Poll]:
+def parse_poll_from_html(soup: "BeautifulSoup") -> Optional[Poll]:
     """Парсит опрос из HTML"""
     # Ищем элементы опроса
     poll_question = soup.find('div', class_=re.compile('poll-question|poll-title'))
@@ -249,19 +251,22 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
         try:
             with open(dump_path, "w", encoding="utf-8") as f:
                 f.write(html)
-            logger.info(f"HTML dump saved: {dump_path} (len={len(html)})")
+            logger.info("HTML dump saved: %s (len=%s)", dump_path, len(html))
         except Exception as e:
-            logger.warning(f"Не удалось сохранить HTML дамп: {e}")
+            logger.warning("Не удалось сохранить HTML дамп: %s", e)
+
+    # bs4 и lxml - самые тяжёлые импорты парсера, загружаются при первой странице
+    from bs4 import BeautifulSoup
 
     soup = BeautifulSoup(html, 'lxml')
     
     # Debug: проверяем что пришло
     title = soup.find('title')
-    logger.debug(f"HTML Title: {title.string if title else 'None'}")
+    logger.debug("HTML Title: %s", title.string if title else None)
     
     # Извлекаем базовые данные из Open Graph
     author_title = extract_og_meta(soup, 'og:title') or ""
-    logger.debug(f"og:title: {author_title}")
+    logger.debug("og:title: %s", author_title)
     
     # Парсим имя и username АВТОРА РЕТВИТА (из og:title)
     retweet_display_name = author_title
@@ -278,13 +283,13 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
         if username_match:
             retweet_username = username_match.group(1)
     
-    logger.debug(f"Retweet author: name={retweet_display_name}, username={retweet_username}")
+    logger.debug("Retweet author: name=%s, username=%s", retweet_display_name, retweet_username)
     
     # Текст твита из description
     text = extract_og_meta(soup, 'og:description') or extract_og_meta(soup, 'twitter:description') or ""
     # Иногда в og:description первым идёт служебная строка "📑 ...", убираем её.
     text, source_language_from_text = strip_leading_translation_header(text)
-    logger.debug(f"Text length: {len(text)}")
+    logger.debug("Text length: %s", len(text))
     
     # Проверяем если это ретвит/цитата (содержит "Quoting")
     quoted = None
@@ -302,7 +307,7 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
             quote_marker = marker
     
     if quote_marker is not None:
-        logger.debug(f"Detected quoting tweet")
+        logger.debug("Detected quoting tweet")
         # Парсим quoted tweet из текста
         # Формат: "текст ретвита" Quoting Display Name (@username) \n "quoted text"
         quoting_pos = quote_pos
@@ -321,12 +326,12 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
             quoted_content = []
             quoted_display = None
             
-            logger.debug(f"Quoting text has {len(lines)} lines")
+            logger.debug("Quoting text has %s lines", len(lines))
             
             if lines:
                 # Первая строка содержит имя и username ОРИГИНАЛЬНОГО АВТОРА
                 first_line = lines[0].strip()
-                logger.debug(f"First line of quoted: {first_line[:100]}")
+                logger.debug("First line of quoted: %.100s", first_line)
                 
                 # Ищем username в скобках - это автор ОРИГИНАЛЬНОГО твита
                 username_match = re.search(r'\(@([a-zA-Z0-9_]+)\)', first_line)
@@ -337,10 +342,10 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
                     # Display name - всё до (@username)
                     quoted_display = re.sub(r'\s*\(@[a-zA-Z0-9_]+\)\s*', '', first_line).strip()
                     quoted_display = re.sub(r'\s*を引用\s*$', '', quoted_display).strip()
-                    logger.debug(f"Extracted original author: display={quoted_display}, username={original_author_username}")
+                    logger.debug("Extracted original author: display=%s, username=%s", quoted_display, original_author_username)
                 else:
                     quoted_display = first_line
-                    logger.debug(f"No username found in first line")
+                    logger.debug("No username found in first line")
                 
                 # Остальные строки это quoted текст
                 for line in lines[1:]:
@@ -348,7 +353,7 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
                     if line and not line.startswith('http'):  # Пропускаем пустые и ссылки
                         quoted_content.append(line)
                 
-                logger.debug(f"Quoted content has {len(quoted_content)} lines")
+                logger.debug("Quoted content has %s lines", len(quoted_content))
             
             if quoted_author and quoted_content:
                 quoted_text = " ".join(quoted_content)
@@ -358,7 +363,7 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
                     url=f"https://x.com/{quoted_author}",  # Ссылка на профиль автора оригинального твита
                     text=quoted_text
                 )
-                logger.debug(f"Parsed quoted tweet: author={quoted_author}, text={quoted_text[:50]}")
+                logger.debug("Parsed quoted tweet: author=%s, text=%.50s", quoted_author, quoted_text)
     
     # Убираем prefix автора из текста если есть
     if retweet_display_name and text.startswith(retweet_display_name):
@@ -379,7 +384,7 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
     # Видео
     video_url = extract_og_meta(soup, 'og:video') or extract_og_meta(soup, 'twitter:player:stream')
     if video_url and not video_url.startswith('blob:'):
-        logger.debug(f"Found video: {video_url}")
+        logger.debug("Found video: %s", video_url)
         media.append(MediaItem(type='video', url=video_url))
         has_video = True
     
@@ -388,16 +393,16 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
     if image_url:
         # Пропускаем если это фото профиля
         if 'profile_images' in image_url:
-            logger.debug(f"Skipping profile image: {image_url}")
+            logger.debug("Skipping profile image: %s", image_url)
             image_url = None
         # Если есть видео и это превью - сохраняем URL и пропускаем
         elif has_video and is_video_thumbnail(image_url):
-            logger.debug(f"Skipping video thumbnail: {image_url}")
+            logger.debug("Skipping video thumbnail: %s", image_url)
             video_thumb_urls.add(image_url)
             image_url = None
         # Проверяем если это мозаика fxtwitter
         elif 'mosaic.fxtwitter.com' in image_url:
-            logger.debug(f"Found mosaic image: {image_url}")
+            logger.debug("Found mosaic image: %s", image_url)
             # Парсим мозаику и создаем отдельные ссылки
             parts = image_url.split('/')
             photo_ids = parts[5:]  # Все ID после tweet_id
@@ -406,11 +411,11 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
                 if photo_id:
                     twitter_photo_url = f"https://pbs.twimg.com/media/{photo_id}?format=jpg&name=orig"
                     media.append(MediaItem(type='photo', url=twitter_photo_url))
-                    logger.debug(f"Added photo from mosaic: {photo_id}")
+                    logger.debug("Added photo from mosaic: %s", photo_id)
             image_url = None
         elif image_url:
             # Обычное одиночное фото
-            logger.debug(f"Found image: {image_url}")
+            logger.debug("Found image: %s", image_url)
             media.append(MediaItem(type='photo', url=image_url))
             image_url = None
         
@@ -421,7 +426,7 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
                 if img_url and img_url not in [m.url for m in media]:
                     # Проверяем что это не превью и не профиль
                     if not is_video_thumbnail(img_url) and 'profile_images' not in img_url:
-                        logger.debug(f"Found additional image: {img_url}")
+                        logger.debug("Found additional image: %s", img_url)
                         media.append(MediaItem(type='photo', url=img_url))
     
     # Если есть видео, проверяем дополнительные изображения и исключаем превью
@@ -431,30 +436,34 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
             if img_url:
                 if is_video_thumbnail(img_url):
                     video_thumb_urls.add(img_url)
-                    logger.debug(f"Found and skipping video thumbnail {i}: {img_url}")
+                    logger.debug("Found and skipping video thumbnail %s: %s", i, img_url)
+    
+    logger.debug("Total media items: %s, video thumbnails skipped: %s", len(media), len(video_thumb_urls))
     
-    logger.debug(f"Total media items: {len(media)}, video thumbnails skipped: {len(video_thumb_urls)}")
+    # Превью видео нужно для inline-результатов
+    if has_video and video_thumb_urls:
+        media[0].thumbnail_url = sorted(video_thumb_urls)[0]
     
     # Статистика - ищем в мета тегах или структурированных данных
     stats = TweetStats()
     
     # Сначала пытаемся найти в owoembed ссылке
     oembed_link = soup.find('link', rel='alternate', type='application/json+oembed')
-    logger.debug(f"oembed_link found: {oembed_link is not None}")
+    logger.debug("oembed_link found: %s", oembed_link is not None)
     
     if oembed_link:
         oembed_url = oembed_link.get('href')
-        logger.debug(f"oembed_url: {oembed_url[:100] if oembed_url else 'None'}")
+        logger.debug("oembed_url: %.100s", oembed_url)
         
         if oembed_url:
             from urllib.parse import urlparse, parse_qs, unquote
             parsed_url = urlparse(oembed_url)
             params = parse_qs(parsed_url.query)
-            logger.debug(f"params keys: {list(params.keys())}")
+            logger.debug("params keys: %s", params.keys())
             
             if 'text' in params:
                 stats_text = unquote(params['text'][0])
-                logger.debug(f"Found stats text: {stats_text}")
+                logger.debug("Found stats text: %s", stats_text)
                 
                 # Парсим текст вида: "💬 239   🔁 23.0K   ❤️ 144.8K   👁️ 1.49M"
                 
@@ -462,25 +471,25 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
                 replies_match = re.search(r'💬\s+([\d.KMB]+)', stats_text)
                 if replies_match:
                     stats.replies = parse_number(replies_match.group(1))
-                    logger.debug(f"Parsed replies: {stats.replies}")
+                    logger.debug("Parsed replies: %s", stats.replies)
                 
                 # Reposts (🔁)
                 reposts_match = re.search(r'🔁\s+([\d.KMB]+)', stats_text)
                 if reposts_match:
                     stats.reposts = parse_number(reposts_match.group(1))
-                    logger.debug(f"Parsed reposts: {stats.reposts}")
+                    logger.debug("Parsed reposts: %s", stats.reposts)
                 
                 # Likes (❤️)
                 likes_match = re.search(r'❤️?\s+([\d.KMB]+)', stats_text)
                 if likes_match:
                     stats.likes = parse_number(likes_match.group(1))
-                    logger.debug(f"Parsed likes: {stats.likes}")
+                    logger.debug("Parsed likes: %s", stats.likes)
                 
                 # Views (👁️)
                 views_match = re.search(r'👁️?\s+([\d.KMB]+)', stats_text)
                 if views_match:
                     stats.views = parse_number(views_match.group(1))
-                    logger.debug(f"Parsed views: {stats.views}")
+                    logger.debug("Parsed views: %s", stats.views)
     
     # Пытаемся найти JSON-LD если owoembed не сработал
     if stats.replies is None:
@@ -500,7 +509,7 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
                         elif 'Like' in stat_type:
                             stats.likes = parse_number(str(value))
     
-    logger.debug(f"Stats: replies={stats.replies}, reposts={stats.reposts}, likes={stats.likes}, views={stats.views}")
+    logger.debug("Stats: replies=%s, reposts=%s, likes=%s, views=%s", stats.replies, stats.reposts, stats.likes, stats.views)
     
     # Views из мета тега (если есть)
     views_meta = soup.find('meta', attrs={'name': 'twitter:views'})
@@ -510,7 +519,7 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
     # Опрос
     poll = parse_poll_from_html(soup)
     if poll:
-        logger.debug(f"Found poll with {len(poll.options)} options")
+        logger.debug("Found poll with %s options", len(poll.options))
     
     # Перевод
     translated_text = None
@@ -526,10 +535,10 @@ def parse_tweet_html(html: str, original_url: str) -> Optional[Tweet]:
         lang_elem = soup.find(class_=re.compile('source-lang|original-lang'))
         if lang_elem:
             source_language = lang_elem.get_text(strip=True)
-            logger.debug(f"Source language detected: {source_language}")
+            logger.debug("Source language detected: %s", source_language)
         elif extracted_source_language:
             source_language = extracted_source_language
-            logger.debug(f"Source language detected from translation header: {source_language}")
+            logger.debug("Source language detected from translation header: %s", source_language)
         else:
             logger.debug("Source language element not found")
     else:
@@ -0,0 +1,193 @@
+"""Получение твитов с кэшированием и объединением одинаковых запросов"""
+import asyncio
+import dataclasses
+import logging
+import time
+from typing import Optional
+from src.config import config
+from src.storage.backends import INSTANCE_ID, state_backend
+from src.twitter.fetcher import fetch_tweet_data, fetch_tweet_html
+from src.twitter.models import Tweet, TweetLinks
+from src.twitter.parser import parse_tweet_html
+from src.utils.cache import shared_tweet_cache, tweet_links_cache
+from src.utils.deadline import time_left
+from src.utils.metrics import STAGE_SECONDS, registry
+from src.utils.tracing import set_attributes, span
+
+logger = logging.getLogger(__name__)
+
+# Загрузки, которые уже выполняются: повторные запросы ждут тот же результат
+_inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+# Как часто проверять общий кэш, пока твит загружает другая реплика
+SHARED_POLL_INTERVAL = 0.2
+
+
+def _collect_metrics():
+    yield "pmtwitter_tweet_loads_inflight", "gauge", "Загрузки твитов, которые сейчас выполняются", [({}, len(_inflight))]
+
+
+registry.register_collector(_collect_metrics)
+
+
+def _lock_key(key: tuple[str, str]) -> str:
+    return "lock:tweet:" + ":".join(key)
+
+
+async def _acquire_shared_lock(key: tuple[str, str]) -> bool:
+    """Single-flight между репликами; при недоступном хранилище грузим сами"""
+    try:
+        return await state_backend.set_if_absent(_lock_key(key), INSTANCE_ID.encode(), ttl=config.SHARED_LOCK_TTL)
+    except Exception as e:
+        logger.warning("Не удалось взять блокировку загрузки твита: %r", e)
+        return True
+
+
+async def _wait_for_other_replica(key: tuple[str, str]) -> Optional[Tweet]:
+    """Ждёт, пока другая реплика загрузит твит и положит его в общий кэш"""
+    started = time.monotonic()
+    while time.monotonic() - started < config.SHARED_LOCK_TTL:
+        remaining = time_left()
+        if remaining is not None and remaining <= SHARED_POLL_INTERVAL:
+            break
+        await asyncio.sleep(SHARED_POLL_INTERVAL)
+        tweet, is_stale = await shared_tweet_cache.get_with_staleness(key)
+        if tweet is not None and not is_stale:
+            return tweet
+        try:
+            if await state_backend.get(_lock_key(key)) is None:
+                break
+        except Exception:
+            break
+    return None
+
+
+async def _load_tweet(key: tuple[str, str], tweet_id: str, username: str,
+                      lang_code: Optional[str], url: str) -> Optional[Tweet]:
+    owns_lock = False
+    if state_backend.shared:
+        owns_lock = await _acquire_shared_lock(key)
+        if not owns_lock:
+            tweet = await _wait_for_other_replica(key)
+            if tweet is not None:
+                logger.debug("Твит %s загружен другой репликой", tweet_id)
+                return tweet
+
+    try:
+        with span("fetch_html"):
+            html = await fetch_tweet_html(tweet_id, username, lang_code)
+        if not html:
+            return None
+        with STAGE_SECONDS.time(stage="parse"), span("parse", html_bytes=len(html)):
+            tweet = parse_tweet_html(html, url)
+        if tweet is not None:
+            await shared_tweet_cache.set(key, tweet)
+        return tweet
+    finally:
+        if owns_lock:
+            # Блокировка могла истечь (SHARED_LOCK_TTL) и достаться другой реплике: снимаем только свою
+            try:
+                await state_backend.delete_if_equals(_lock_key(key), INSTANCE_ID.encode())
+            except Exception as e:
+                logger.debug("Не удалось снять блокировку загрузки твита: %r", e)
+
+
+def _start_load(key: tuple[str, str], tweet_id: str, username: str,
+                lang_code: Optional[str], url: str) -> asyncio.Task:
+    """Запускает загрузку твита или возвращает уже идущую"""
+    task = _inflight.get(key)
+    if task is not None:
+        return task
+
+    task = asyncio.create_task(_load_tweet(key, tweet_id, username, lang_code, url))
+    _inflight[key] = task
+
+    def on_done(finished: asyncio.Task):
+        if _inflight.get(key) is finished:
+            del _inflight[key]
+        # Фоновые обновления никто не ждёт: забираем исключение, чтобы не было предупреждений
+        if not finished.cancelled() and finished.exception():
+            logger.warning("Ошибка загрузки твита %s: %s", tweet_id, finished.exception())
+
+    task.add_done_callback(on_done)
+    return task
+
+
+async def get_tweet(tweet_id: str, username: str, lang_code: Optional[str], url: str) -> Optional[Tweet]:
+    """Возвращает распарсенный твит из кэша или загружает его.
+
+    Устаревшая запись отдаётся сразу, а свежие данные загружаются в фоне.
+    """
+    key = (tweet_id, lang_code or "")
+
+    tweet, is_stale = await shared_tweet_cache.get_with_staleness(key)
+    set_attributes(cache="stale" if is_stale else ("hit" if tweet is not None else "miss"))
+    if tweet is not None:
+        if is_stale:
+            logger.debug("Твит %s устарел в кэше, обновляем в фоне", tweet_id)
+            _start_load(key, tweet_id, username, lang_code, url)
+        else:
+            logger.debug("Твит %s взят из кэша", tweet_id)
+        return tweet
+
+    # shield: отмена одного ожидающего не отменяет общую загрузку
+    return await asyncio.shield(_start_load(key, tweet_id, username, lang_code, url))
+
+
+async def refresh_tweet(tweet_id: str, username: str, lang_code: Optional[str], url: str) -> Optional[Tweet]:
+    """Загружает свежую версию твита в обход кэша"""
+    key = (tweet_id, lang_code or "")
+    return await asyncio.shield(_start_load(key, tweet_id, username, lang_code, url))
+
+
+async def get_cached_tweet(tweet_id: str, lang_code: Optional[str]) -> Optional[Tweet]:
+    """Возвращает твит только если он уже есть в кэше"""
+    return await shared_tweet_cache.get((tweet_id, lang_code or ""))
+
+
+async def get_tweet_links(tweet_id: str, username: str) -> Optional[TweetLinks]:
+    """Родитель ответа и цитируемый твит из JSON API; HTML-страница их id не содержит.
+
+    Связи не меняются и кэшируются; неудачный запрос не кэшируется.
+    """
+    links = tweet_links_cache.get(tweet_id)
+    if links is not None:
+        return links
+
+    with span("fetch_links"):
+        data = await fetch_tweet_data(tweet_id, username)
+    if not data or not isinstance(data.get("tweet"), dict):
+        return None
+    status = data["tweet"]
+    quote = status.get("quote") if isinstance(status.get("quote"), dict) else {}
+    links = TweetLinks(
+        replying_to=status.get("replying_to") or None,
+        replying_to_status=str(status["replying_to_status"]) if status.get("replying_to_status") else None,
+        quote_id=str(quote["id"]) if quote.get("id") else None,
+        quote_username=(quote.get("author") or {}).get("screen_name") or None,
+    )
+    tweet_links_cache.set(tweet_id, links)
+    return links
+
+
+async def get_quoted_tweet(tweet_id: str, username: str, lang_code: Optional[str]) -> Optional[Tweet]:
+    """Полная версия твита, который цитирует tweet_id: через тот же кэш и single-flight"""
+    links = await get_tweet_links(tweet_id, username)
+    if links is None or not links.quote_id or not links.quote_username:
+        return None
+    url = f"https://x.com/{links.quote_username}/status/{links.quote_id}"
+    return await get_tweet(links.quote_id, links.quote_username, lang_code, url)
+
+
+def merge_quoted_tweet(tweet: Tweet, quoted: Optional[Tweet]) -> Tweet:
+    """Дополняет цитату из HTML датой, медиа и ссылкой из полной версии цитируемого твита"""
+    if quoted is None or tweet.quoted_tweet is None:
+        return tweet
+    quoted_tweet = dataclasses.replace(
+        tweet.quoted_tweet,
+        tweet_id=quoted.url.rstrip("/").rsplit("/", 1)[-1],
+        url=quoted.url,
+        date=quoted.date,
+        media=list(quoted.media),
+    )
+    return dataclasses.replace(tweet, quoted_tweet=quoted_tweet)
@@ -0,0 +1,65 @@
+"""Разворачивание треда: цепочка ответов автора самому себе"""
+import asyncio
+import logging
+from typing import Optional
+from src.config import config
+from src.twitter.models import Tweet
+from src.twitter.service import get_tweet, get_tweet_links
+
+logger = logging.getLogger(__name__)
+
+# Комментарий перед ссылкой, включающий режим треда
+THREAD_KEYWORDS = {"thread", "unroll", "тред", "🧵"}
+
+
+def is_thread_request(comment: Optional[str]) -> bool:
+    return bool(comment) and comment.strip().lower() in THREAD_KEYWORDS
+
+
+async def get_reply_parent(tweet_id: str, username: str) -> Optional[str]:
+    """id твита, на который автор ответил сам себе, или None, если это начало треда.
+
+    Ответы другим людям тред обрывают.
+    """
+    links = await get_tweet_links(tweet_id, username)
+    if links is None or (links.replying_to or "").lower() != username.lower():
+        return None
+    return links.replying_to_status
+
+
+async def unroll_thread(tweet_id: str, username: str, lang_code: Optional[str]) -> list[Tweet]:
+    """Твиты треда от первого до tweet_id (не больше THREAD_MAX_TWEETS).
+
+    API статуса знает только родителя твита, поэтому цепочка идёт вверх по
+    одному запросу за шаг; каждый найденный твит сразу начинает загружаться
+    через get_tweet (кэш и single-flight), не больше THREAD_FETCH_CONCURRENCY
+    одновременно. Недоступные твиты пропускаются.
+    """
+    slots = asyncio.Semaphore(max(1, config.THREAD_FETCH_CONCURRENCY))
+
+    async def load(post_id: str) -> Optional[Tweet]:
+        async with slots:
+            return await get_tweet(post_id, username, lang_code, f"https://x.com/{username}/status/{post_id}")
+
+    ids = [tweet_id]
+    tasks = [asyncio.create_task(load(tweet_id))]
+    try:
+        while len(ids) < config.THREAD_MAX_TWEETS:
+            parent = await get_reply_parent(ids[-1], username)
+            if parent is None or parent in ids:
+                break
+            ids.append(parent)
+            tasks.append(asyncio.create_task(load(parent)))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    tweets = []
+    for post_id, result in zip(reversed(ids), reversed(results)):
+        if isinstance(result, BaseException):
+            logger.warning("Твит %s из треда не загружен: %s", post_id, result)
+        elif result is not None:
+            tweets.append(result)
+    logger.info("Тред %s: %s из %s твитов", tweet_id, len(tweets), len(ids))
+    return tweets
@@ -1,7 +1,5 @@
-import json
-import os
-from pathlib import Path
 from typing import Optional
+from src.storage.preferences import SCOPE_USER, PreferencesStore, preferences
 
 # Поддерживаемые языки
 SUPPORTED_LANGUAGES = {
@@ -25,46 +23,48 @@ SUPPORTED_LANGUAGES = {
 # Обратный маппинг (название -> код)
 LANGUAGE_NAME_TO_CODE = {v.lower(): k for k, v in SUPPORTED_LANGUAGES.items()}
 
+# Старый JSON-файл настроек: переносится в хранилище при первом обращении
+LEGACY_SETTINGS_PATH = "/tmp/translate_settings.json"
+# Ключ настройки языка перевода в хранилище
+PREF_TRANSLATE_LANG = "translate_lang"
+
+
 class TranslateSettings:
-    def __init__(self, storage_path: str = "/tmp/translate_settings.json"):
-        self.storage_path = Path(storage_path)
-        self.settings = self._load()
+    def __init__(self, store: PreferencesStore, legacy_path: str = LEGACY_SETTINGS_PATH):
+        self.store = store
+        self.legacy_path = legacy_path
+        self._migrated = False
     
-    def _load(self) -> dict:
-        """Загружает настройки из файла"""
-        if self.storage_path.exists():
-            try:
-                with open(self.storage_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except Exception:
-                return {}
-        return {}
+    async def _ensure_migrated(self):
+        """Однократно переносит настройки из старого JSON-файла.
+        
+        Флаг ставится после успешного переноса: при ошибке следующее обращение повторит его.
+        """
+        if not self._migrated:
+            await self.store.migrate_json("translate_settings_json", self.legacy_path, SCOPE_USER, PREF_TRANSLATE_LANG)
+            self._migrated = True
     
-    def _save(self):
-        """Сохраняет настройки в файл"""
-        try:
-            self.storage_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.storage_path, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Ошибка сохранения настроек перевода: {e}")
+    async def initialize(self):
+        """Открывает хранилище и переносит старые настройки при старте, а не на первом сообщении"""
+        await self._ensure_migrated()
     
-    def get_language(self, user_id: int) -> Optional[str]:
+    async def get_language(self, user_id: int) -> Optional[str]:
         """Получает язык перевода для пользователя (2-буквенный код или None)"""
-        lang = self.settings.get(str(user_id))
+        await self._ensure_migrated()
+        lang = await self.store.get(SCOPE_USER, user_id, PREF_TRANSLATE_LANG)
         if lang and lang != "off":
             return lang
         return None
     
-    def set_language(self, user_id: int, language: str):
+    async def set_language(self, user_id: int, language: str):
         """Устанавливает язык перевода для пользователя"""
-        self.settings[str(user_id)] = language
-        self._save()
+        await self._ensure_migrated()
+        await self.store.set(SCOPE_USER, user_id, PREF_TRANSLATE_LANG, language)
     
-    def disable(self, user_id: int):
+    async def disable(self, user_id: int):
         """Отключает перевод для пользователя"""
-        self.settings[str(user_id)] = "off"
-        self._save()
+        await self._ensure_migrated()
+        await self.store.set(SCOPE_USER, user_id, PREF_TRANSLATE_LANG, "off")
 
 def parse_language_input(input_text: str) -> Optional[str]:
     """Преобразует ввод пользователя в 2-буквенный код языка"""
@@ -97,4 +97,4 @@ def get_supported_languages_text() -> str:
     return "\n".join(lines)
 
 # Глобальный экземпляр
-translate_settings = TranslateSettings()
\ No newline at end of file
+translate_settings = TranslateSettings(preferences)
\ No newline at end of file
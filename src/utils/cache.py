@@ -0,0 +1,213 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional
+from src.config import config
+from src.storage.backends import StateBackend, state_backend
+from src.twitter.models import tweet_from_dict, tweet_to_dict
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """LRU-кэш в памяти с ограничением размера и временем жизни записей"""
+
+    def __init__(self, maxsize: int, ttl: float, stale_ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Сколько устаревшая запись ещё может отдаваться через get_with_staleness
+        self.stale_ttl = stale_ttl
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение или default, если записи нет или она устарела"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            if expires_at + self.stale_ttl <= now:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def get_with_staleness(self, key: Hashable, default: Any = None) -> tuple[Any, bool]:
+        """Возвращает (значение, устарело ли оно).
+
+        Устаревшая запись отдаётся ещё stale_ttl секунд, чтобы её можно было
+        показать сразу и обновить в фоне.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default, False
+
+        value, expires_at = entry
+        now = time.monotonic()
+        if expires_at + self.stale_ttl <= now:
+            del self._data[key]
+            self.misses += 1
+            return default, False
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value, expires_at <= now
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Сохраняет значение, вытесняя самые старые записи при переполнении"""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Удаляет запись и возвращает её значение"""
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TieredCache:
+    """Локальный TTLCache (L1) поверх общего хранилища (L2).
+
+    L2 используется, только если хранилище общее для реплик: запись, сделанная
+    одной репликой, видна остальным. Ошибки L2 не ломают работу - считаются промахом.
+    Значения хранятся в JSON через encode/decode (не pickle: запись в общее
+    хранилище не должна давать выполнения кода в репликах); запись, которую
+    не удалось разобрать, тоже считается промахом.
+    """
+
+    def __init__(self, local: TTLCache, prefix: str, backend: StateBackend,
+                 encode: Callable[[Any], Any] = lambda value: value,
+                 decode: Callable[[Any], Any] = lambda data: data):
+        self.local = local
+        self.prefix = prefix
+        self.backend = backend
+        self.encode = encode
+        self.decode = decode
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    def _key(self, key: Hashable) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return f"{self.prefix}:" + ":".join(str(part) for part in parts)
+
+    async def _load(self, key: Hashable) -> tuple[Any, bool]:
+        """Читает запись из L2 и кладёт её в L1 с оставшимся временем жизни"""
+        try:
+            raw = await self.backend.get(self._key(key))
+        except Exception as e:
+            logger.warning("Общий кэш %s недоступен: %r", self.prefix, e)
+            return None, False
+        if raw is None:
+            return None, False
+        try:
+            entry = json.loads(raw)
+            value, written_at = self.decode(entry["value"]), float(entry["written_at"])
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Повреждённая запись в общем кэше %s: %r", self.prefix, e)
+            return None, False
+        remaining = self.local.ttl - (time.time() - written_at)
+        self.local.set(key, value, ttl=remaining)
+        return value, remaining <= 0
+
+    async def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.local.get(key)
+        if value is None and self.shared:
+            value, is_stale = await self._load(key)
+            if is_stale:
+                value = None
+        return default if value is None else value
+
+    async def get_with_staleness(self, key: Hashable, default: Any = None) -> tuple[Any, bool]:
+        value, is_stale = self.local.get_with_staleness(key)
+        if value is None and self.shared:
+            value, is_stale = await self._load(key)
+        return (default, False) if value is None else (value, is_stale)
+
+    async def warm(self, keys: Iterable[Hashable]):
+        """Подтягивает записи из L2 в L1, чтобы дальше читать их синхронно"""
+        if self.shared:
+            for key in keys:
+                if self.local.get(key) is None:
+                    await self._load(key)
+
+    async def set(self, key: Hashable, value: Any):
+        self.local.set(key, value)
+        if not self.shared:
+            return
+        try:
+            await self.backend.set(
+                self._key(key),
+                json.dumps({"value": self.encode(value), "written_at": time.time()}).encode(),
+                ttl=self.local.ttl + self.local.stale_ttl,
+            )
+        except Exception as e:
+            logger.warning("Не удалось записать в общий кэш %s: %r", self.prefix, e)
+
+
+# Распарсенные твиты: (tweet_id, lang_code) -> Tweet
+tweet_cache = TTLCache(
+    maxsize=config.TWEET_CACHE_SIZE,
+    ttl=config.TWEET_CACHE_TTL,
+    stale_ttl=config.TWEET_CACHE_STALE_TTL,
+)
+
+# Telegram file_id уже загруженных медиа: URL медиа -> file_id
+file_id_cache = TTLCache(maxsize=config.FILE_ID_CACHE_SIZE, ttl=config.FILE_ID_CACHE_TTL)
+
+# Общие для реплик версии кэшей твитов и file_id
+shared_tweet_cache = TieredCache(tweet_cache, "tweet", state_backend, encode=tweet_to_dict, decode=tweet_from_dict)
+shared_file_id_cache = TieredCache(file_id_cache, "file_id", state_backend)
+
+# Недоступные твиты: tweet_id -> класс ошибки ("not_found" / "forbidden")
+negative_cache = TTLCache(maxsize=config.NEGATIVE_CACHE_SIZE, ttl=config.NEGATIVE_CACHE_TTL)
+
+# Связи твитов из JSON API (родитель ответа, цитата): tweet_id -> TweetLinks.
+# Связи не меняются, поэтому живут столько же, сколько устаревшие твиты
+tweet_links_cache = TTLCache(maxsize=config.TWEET_CACHE_SIZE, ttl=config.TWEET_CACHE_STALE_TTL)
+
+CACHES = {
+    "tweet": tweet_cache,
+    "file_id": file_id_cache,
+    "negative": negative_cache,
+    "tweet_links": tweet_links_cache,
+}
+
+
+def _collect_metrics():
+    yield "pmtwitter_cache_entries", "gauge", "Записей в кэше", [
+        ({"cache": name}, len(cache)) for name, cache in CACHES.items()
+    ]
+    yield "pmtwitter_cache_hits_total", "counter", "Попадания в кэш", [
+        ({"cache": name}, cache.hits) for name, cache in CACHES.items()
+    ]
+    yield "pmtwitter_cache_misses_total", "counter", "Промахи кэша", [
+        ({"cache": name}, cache.misses) for name, cache in CACHES.items()
+    ]
+
+
+registry.register_collector(_collect_metrics)
@@ -0,0 +1,137 @@
+"""Circuit breaker для внешних хостов: быстрый отказ во время аварий"""
+import logging
+import time
+from src.config import config
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Запрос не отправлен: хост считается недоступным"""
+
+    def __init__(self, host: str):
+        super().__init__(f"Circuit breaker открыт для {host}")
+        self.host = host
+
+
+class CircuitBreaker:
+    """Считает подряд идущие ошибки хоста.
+
+    closed -> open после failure_threshold ошибок подряд;
+    open -> half_open через reset_timeout секунд;
+    half_open пропускает не больше half_open_probes пробных запросов:
+    успех закрывает breaker, ошибка снова открывает.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, reset_timeout: float, half_open_probes: int = 1):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == STATE_OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = STATE_HALF_OPEN
+            self.probes_in_flight = 0
+            logger.info("Circuit breaker %s: half-open, пробуем запрос", self.host)
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN and self.probes_in_flight < self.half_open_probes:
+            self.probes_in_flight += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self._state != STATE_CLOSED:
+            logger.info("Circuit breaker %s: закрыт", self.host)
+        self._state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.probes_in_flight = 0
+
+    def release(self):
+        """Запрос завершился без результата (отменён): освобождаем слот пробы"""
+        if self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == STATE_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        if self._state != STATE_OPEN:
+            self.times_opened += 1
+            logger.warning(
+                "Circuit breaker %s: открыт на %.0fс после %s ошибок",
+                self.host, self.reset_timeout, self.consecutive_failures,
+            )
+        self._state = STATE_OPEN
+        self.opened_at = time.monotonic()
+        self.probes_in_flight = 0
+
+
+# Breaker на каждый внешний хост
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    breaker = _breakers.get(host)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            host,
+            failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=config.BREAKER_RESET_TIMEOUT,
+            half_open_probes=config.BREAKER_HALF_OPEN_PROBES,
+        )
+        _breakers[host] = breaker
+    return breaker
+
+
+def breakers_snapshot() -> list[dict]:
+    """Состояние всех breaker'ов для статуса и метрик"""
+    return [
+        {
+            "host": breaker.host,
+            "state": breaker.state,
+            "consecutive_failures": breaker.consecutive_failures,
+            "times_opened": breaker.times_opened,
+            "rejected": breaker.rejected,
+        }
+        for breaker in _breakers.values()
+    ]
+
+
+_STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+def _collect_metrics():
+    snapshot = breakers_snapshot()
+    yield "pmtwitter_breaker_state", "gauge", "Состояние breaker'а: 0 closed, 1 half-open, 2 open", [
+        ({"host": b["host"]}, _STATE_VALUES[b["state"]]) for b in snapshot
+    ]
+    yield "pmtwitter_breaker_opened_total", "counter", "Сколько раз breaker размыкался", [
+        ({"host": b["host"]}, b["times_opened"]) for b in snapshot
+    ]
+    yield "pmtwitter_breaker_rejected_total", "counter", "Запросы, отклонённые breaker'ом", [
+        ({"host": b["host"]}, b["rejected"]) for b in snapshot
+    ]
+
+
+registry.register_collector(_collect_metrics)
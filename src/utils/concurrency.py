@@ -0,0 +1,169 @@
+"""Адаптивное ограничение одновременных запросов к внешним хостам (AIMD)"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+from src.config import config
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Не уменьшать лимит чаще, чем раз в столько секунд: пачка одновременных 429 - одна перегрузка
+DECREASE_COOLDOWN = 1.0
+# Сглаживание EWMA задержки и ожидания в очереди
+EWMA_ALPHA = 0.1
+
+
+class AdaptiveLimiter:
+    """Лимит одновременных запросов к хосту.
+
+    Успешный ответ увеличивает лимит на 1/limit (примерно +1 за «окно»),
+    429/5xx, таймаут или всплеск задержки уменьшают его вдвое.
+    """
+
+    def __init__(self, host: str, initial: int, min_limit: int, max_limit: int, latency_factor: float):
+        self.host = host
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_factor = latency_factor
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self.latency_ewma: Optional[float] = None
+        self.queue_wait_ewma = 0.0
+        self.max_queue_wait = 0.0
+        self.decreases = 0
+        self._last_decrease = 0.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < max(self.min_limit, int(self.limit))
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """Ждёт свободный слот; возвращает время ожидания в очереди.
+
+        Бросает asyncio.TimeoutError, если слот не освободился за timeout секунд.
+        """
+        started = time.monotonic()
+        if not self._waiters and self._has_capacity():
+            self.in_flight += 1
+            self._record_wait(0.0)
+            return 0.0
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # Слот уже выдан, но ожидающий ушёл: возвращаем его
+                self.in_flight -= 1
+                self._wake_waiters()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+        waited = time.monotonic() - started
+        self._record_wait(waited)
+        return waited
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False):
+        """Освобождает слот и подстраивает лимит.
+
+        latency=None - исход неизвестен (отмена, ошибка клиента): лимит не меняется.
+        """
+        self.in_flight -= 1
+        if overloaded:
+            self._decrease("перегрузка")
+        elif latency is not None:
+            if (
+                self.latency_factor > 0
+                and self.latency_ewma is not None
+                and latency > self.latency_ewma * self.latency_factor
+            ):
+                self._decrease(f"задержка {latency:.2f}с")
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if self.latency_ewma is None:
+                self.latency_ewma = latency
+            else:
+                self.latency_ewma += EWMA_ALPHA * (latency - self.latency_ewma)
+        self._wake_waiters()
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit / 2)
+        self.decreases += 1
+        logger.info("Лимит запросов к %s снижен до %s (%s)", self.host, int(self.limit), reason)
+
+    def _wake_waiters(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _record_wait(self, waited: float):
+        self.queue_wait_ewma += EWMA_ALPHA * (waited - self.queue_wait_ewma)
+        self.max_queue_wait = max(self.max_queue_wait, waited)
+
+
+# Лимитер на каждый внешний хост
+_limiters: dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(host: str) -> AdaptiveLimiter:
+    limiter = _limiters.get(host)
+    if limiter is None:
+        limiter = AdaptiveLimiter(
+            host,
+            initial=config.LIMITER_INITIAL,
+            min_limit=config.LIMITER_MIN,
+            max_limit=config.LIMITER_MAX,
+            latency_factor=config.LIMITER_LATENCY_FACTOR,
+        )
+        _limiters[host] = limiter
+    return limiter
+
+
+def limiters_snapshot() -> list[dict]:
+    """Текущие лимиты и очереди для статуса и метрик"""
+    return [
+        {
+            "host": limiter.host,
+            "limit": int(limiter.limit),
+            "in_flight": limiter.in_flight,
+            "queued": limiter.queued,
+            "queue_wait_avg": limiter.queue_wait_ewma,
+            "queue_wait_max": limiter.max_queue_wait,
+            "decreases": limiter.decreases,
+        }
+        for limiter in _limiters.values()
+    ]
+
+
+def _collect_metrics():
+    snapshot = limiters_snapshot()
+    for field, metric_type, help_text in (
+        ("limit", "gauge", "Текущий адаптивный лимит одновременных запросов"),
+        ("in_flight", "gauge", "Запросы к хосту в работе"),
+        ("queued", "gauge", "Запросы к хосту в очереди"),
+        ("queue_wait_avg", "gauge", "Среднее ожидание в очереди (секунды)"),
+        ("decreases", "counter", "Снижения лимита"),
+    ):
+        name = f"pmtwitter_limiter_{field}" + ("_total" if metric_type == "counter" else "")
+        yield name, metric_type, help_text, [({"host": stats["host"]}, stats[field]) for stats in snapshot]
+
+
+registry.register_collector(_collect_metrics)
@@ -0,0 +1,30 @@
+"""Общий дедлайн на все запросы к источникам в рамках одной карточки"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Момент (time.monotonic), после которого запросы к источникам не выполняются
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    """Ограничивает время всех запросов внутри блока (вложенный дедлайн не может быть позже внешнего)"""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_left() -> Optional[float]:
+    """Сколько секунд осталось до дедлайна (None, если дедлайна нет)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
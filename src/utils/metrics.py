@@ -0,0 +1,384 @@
+"""Метрики в формате Prometheus: счётчики, гистограммы и HTTP-эндпоинт /metrics"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм задержек (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Границы для размеров (байты): от 16 КБ до 64 МБ
+SIZE_BUCKETS = tuple(16384 * 4 ** i for i in range(7))
+# Границы для долей (степень сжатия и т.п.)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+# Семейство метрик для вывода: (имя, тип, описание, [(метки, значение)])
+MetricFamily = tuple[str, str, str, list[tuple[dict, float]]]
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._children: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> dict:
+        return dict(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик"""
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._children[key] = self._children.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._children.get(self._key(labels), 0)
+
+    def total(self) -> float:
+        return sum(self._children.values())
+
+    def collect(self) -> Iterable[MetricFamily]:
+        samples = [(self._labels(key), value) for key, value in self._children.items()]
+        yield self.name + "_total", self.type, self.help, samples
+
+
+class Gauge(_Metric):
+    """Значение, которое может расти и убывать"""
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self._children[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._children[key] = self._children.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._children.get(self._key(labels), 0)
+
+    def collect(self) -> Iterable[MetricFamily]:
+        samples = [(self._labels(key), value) for key, value in self._children.items()]
+        yield self.name, self.type, self.help, samples
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Распределение значений по фиксированным границам (O(log n) на наблюдение)"""
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = _HistogramChild(len(self.buckets))
+        child.counts[bisect_left(self.buckets, value)] += 1
+        child.sum += value
+        child.count += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет длительность блока"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _merged(self, labels: Optional[dict]) -> Optional[_HistogramChild]:
+        if labels is not None:
+            return self._children.get(self._key(labels))
+        merged = _HistogramChild(len(self.buckets))
+        for child in self._children.values():
+            merged.counts = [a + b for a, b in zip(merged.counts, child.counts)]
+            merged.sum += child.sum
+            merged.count += child.count
+        return merged
+
+    def count(self, **labels) -> int:
+        child = self._merged(labels or None)
+        return child.count if child else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        child = self._merged(labels or None)
+        if child is None or child.count == 0:
+            return None
+        rank = q * child.count
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets, child.counts):
+            if cumulative + count >= rank and count:
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            if upper != float("inf"):
+                lower = upper
+        return lower
+
+    def label_values(self) -> list[dict]:
+        return [self._labels(key) for key in self._children]
+
+    def collect(self) -> Iterable[MetricFamily]:
+        buckets, sums, counts = [], [], []
+        for key, child in self._children.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for upper, count in zip(self.buckets, child.counts):
+                cumulative += count
+                buckets.append(({**labels, "le": _format_value(upper)}, cumulative))
+            sums.append((labels, child.sum))
+            counts.append((labels, child.count))
+        yield self.name, self.type, self.help, []
+        yield self.name + "_bucket", "", "", buckets
+        yield self.name + "_sum", "", "", sums
+        yield self.name + "_count", "", "", counts
+
+
+class Registry:
+    """Метрики процесса и функции, собирающие значения в момент запроса"""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        """collector() возвращает семейства метрик; вызывается только при чтении метрик"""
+        self._collectors.append(collector)
+
+    def collect(self) -> Iterable[MetricFamily]:
+        for metric in self._metrics.values():
+            yield from metric.collect()
+        for collector in self._collectors:
+            try:
+                yield from collector()
+            except Exception as e:
+                logger.warning("Ошибка сбора метрик %s: %r", collector.__name__, e)
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4"""
+        lines = []
+        for name, metric_type, help_text, samples in self.collect():
+            if metric_type:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# ==================== Метрики конвейера ====================
+
+STAGE_SECONDS = registry.histogram(
+    "pmtwitter_stage_seconds", "Длительность этапов обработки ссылки", ("stage",)
+)
+MESSAGES_TOTAL = registry.counter(
+    "pmtwitter_messages", "Сообщения со ссылками на твиты"
+)
+CARDS_TOTAL = registry.counter(
+    "pmtwitter_cards", "Обработанные ссылки по результату", ("result",)
+)
+UPSTREAM_REQUESTS = registry.counter(
+    "pmtwitter_upstream_requests", "Запросы к внешним хостам по статусу", ("host", "status")
+)
+UPSTREAM_SECONDS = registry.histogram(
+    "pmtwitter_upstream_request_seconds", "Длительность запросов к внешним хостам", ("host",)
+)
+MEDIA_DOWNLOAD_BYTES = registry.counter(
+    "pmtwitter_media_download_bytes", "Скачанные байты медиа", ("type",)
+)
+MEDIA_DOWNLOAD_SIZE = registry.histogram(
+    "pmtwitter_media_download_size_bytes", "Размер скачанных медиа", ("type",), SIZE_BUCKETS
+)
+MEDIA_DOWNLOAD_SECONDS = registry.histogram(
+    "pmtwitter_media_download_seconds", "Длительность скачивания медиа", ("type",)
+)
+MEDIA_INFLIGHT_BYTES = registry.gauge(
+    "pmtwitter_media_inflight_bytes", "Байты медиа, которые сейчас скачаны и ещё не отправлены"
+)
+COMPRESS_SECONDS = registry.histogram(
+    "pmtwitter_compress_seconds", "Длительность сжатия медиа", ("type",)
+)
+COMPRESS_ATTEMPTS = registry.counter(
+    "pmtwitter_compress_attempts", "Попытки кодирования при сжатии медиа", ("type",)
+)
+COMPRESS_QUEUED = registry.gauge(
+    "pmtwitter_compress_queued", "Файлы, ожидающие свободного слота сжатия"
+)
+COMPRESS_RUNNING = registry.gauge(
+    "pmtwitter_compress_running", "Файлы, которые сжимаются прямо сейчас"
+)
+COMPRESS_RATIO = registry.histogram(
+    "pmtwitter_compress_ratio", "Отношение размера после сжатия к исходному", ("type",), RATIO_BUCKETS
+)
+TELEGRAM_SECONDS = registry.histogram(
+    "pmtwitter_telegram_send_seconds", "Длительность вызовов Telegram Bot API", ("method",)
+)
+TELEGRAM_ERRORS = registry.counter(
+    "pmtwitter_telegram_errors", "Ошибки вызовов Telegram Bot API", ("method",)
+)
+LOOP_LAG_SECONDS = registry.gauge(
+    "pmtwitter_event_loop_lag_seconds", "Последняя измеренная задержка event loop"
+)
+LOOP_LAG_HISTOGRAM = registry.histogram(
+    "pmtwitter_event_loop_lag", "Распределение задержки event loop (секунды)"
+)
+LOOP_BLOCKED_TOTAL = registry.counter(
+    "pmtwitter_event_loop_blocked", "Блокировки event loop дольше LOOP_WATCHDOG_SECONDS по месту в коде",
+    ("location",)
+)
+LOOP_BLOCKED_SECONDS = registry.histogram(
+    "pmtwitter_event_loop_blocked_seconds", "Длительность найденных блокировок event loop"
+)
+
+
+class RateWindow:
+    """Скорость роста счётчика по его снимкам за последние window секунд.
+
+    Снимки делает фоновый сэмплер не чаще раза в step секунд, поэтому
+    обработка запросов за скорость ничего не платит.
+    """
+
+    def __init__(self, read: Callable[[], float], window: float = 60.0, step: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.read = read
+        self.window = window
+        self.step = step
+        self.clock = clock
+        self._samples: deque[tuple[float, float]] = deque()
+
+    def sample(self):
+        now = self.clock()
+        if self._samples and now - self._samples[-1][0] < self.step:
+            return
+        self._samples.append((now, self.read()))
+        # Самый старый снимок оставляем на границе окна
+        while len(self._samples) > 2 and self._samples[1][0] <= now - self.window:
+            self._samples.popleft()
+
+    def per_minute(self) -> Optional[float]:
+        """Прирост в минуту с самого старого снимка до текущего значения"""
+        if not self._samples:
+            return None
+        started, value = self._samples[0]
+        elapsed = self.clock() - started
+        if elapsed <= 0:
+            return None
+        return (self.read() - value) * 60 / elapsed
+
+
+MESSAGE_RATE = RateWindow(MESSAGES_TOTAL.total)
+CARD_RATE = RateWindow(CARDS_TOTAL.total)
+
+
+async def run_loop_lag_sampler(interval: float = 0.5):
+    """Измеряет, насколько позже запланированного просыпается event loop.
+
+    Заодно снимает значения счётчиков для скоростей в /perf.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG_SECONDS.set(lag)
+        LOOP_LAG_HISTOGRAM.observe(lag)
+        MESSAGE_RATE.sample()
+        CARD_RATE.sample()
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # Заголовки не нужны, но их надо дочитать
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+        if len(parts) >= 2 and parts[0] == "GET" and path == "/metrics":
+            status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", registry.render().encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int) -> asyncio.AbstractServer:
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+    return server
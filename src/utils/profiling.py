@@ -0,0 +1,210 @@
+"""Профилирование по запросу: сэмплер стеков всех потоков, cProfile и снимки tracemalloc"""
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+from src.utils.watchdog import PROJECT_ROOT
+
+# Как часто сэмплер снимает стеки (секунды)
+SAMPLE_INTERVAL = 0.005
+# Сколько кадров хранит tracemalloc на выделение; больше - точнее, но дороже
+TRACEMALLOC_FRAMES = 1
+
+# Функции, в которых поток ждёт, а не работает: такие снимки не считаются нагрузкой
+IDLE_FUNCTIONS = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("socket.py", "accept"),
+}
+
+# Одновременно выполняется только один профиль
+_profile_lock = asyncio.Lock()
+# Предыдущий снимок памяти для /memsnap
+_memory_baseline: Optional[tracemalloc.Snapshot] = None
+
+
+def _short_path(filename: str) -> str:
+    # Свой код - относительно корня проекта, библиотеки - пакет/модуль
+    if filename.startswith(PROJECT_ROOT + os.sep):
+        return os.path.relpath(filename, PROJECT_ROOT)
+    return os.sep.join(filename.split(os.sep)[-2:])
+
+
+def _label(code) -> str:
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_names() -> dict[int, str]:
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+
+def _sample_threads(stacks: Counter, names: dict[int, str], own_frame=None):
+    """Добавляет стеки всех потоков в формате collapsed (поток;внешний;...;внутренний).
+
+    Свой поток берётся из own_frame (кадр, прерванный сигналом) или пропускается.
+    Потоки, которых нет в names, подписываются идентификатором.
+    """
+    own = threading.get_ident()
+    for thread_id, frame in sys._current_frames().items():
+        if thread_id == own:
+            frame = own_frame
+        if frame is None:
+            continue
+        leaf = frame.f_code
+        if (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_FUNCTIONS:
+            continue
+        labels = []
+        while frame is not None:
+            labels.append(_label(frame.f_code))
+            frame = frame.f_back
+        labels.append(names.get(thread_id, str(thread_id)))
+        stacks[";".join(reversed(labels))] += 1
+
+
+def sample_stacks(seconds: float, interval: float = SAMPLE_INTERVAL) -> tuple[Counter, int]:
+    """Снимает стеки других потоков из текущего раз в interval секунд.
+
+    Поток-сэмплер получает GIL, только когда его отпускают, поэтому поток
+    event loop почти всегда застаётся в select; для него нужен sample_with_signal.
+    """
+    stacks: Counter = Counter()
+    rounds = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        _sample_threads(stacks, _thread_names())
+        rounds += 1
+        time.sleep(interval)
+    return stacks, rounds
+
+
+async def sample_with_signal(seconds: float, interval: float = SAMPLE_INTERVAL) -> tuple[Counter, int]:
+    """Снимки по SIGPROF (таймер процессорного времени процесса) в главном потоке.
+
+    Обработчик сигнала прерывает именно выполняемый код event loop, а не
+    момент отпускания GIL; заодно снимаются стеки остальных потоков.
+    """
+    stacks: Counter = Counter()
+    rounds = 0
+    # Имена потоков - заранее: threading.enumerate() берёт нереентерабельный
+    # _active_limbo_lock, и сигнал посреди Thread.start() в главном потоке
+    # повесил бы процесс. В обработчике - только sys._current_frames()
+    names = _thread_names()
+
+    def on_sample(signum, frame):
+        nonlocal rounds
+        _sample_threads(stacks, names, frame)
+        rounds += 1
+
+    previous = signal.signal(signal.SIGPROF, on_sample)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+    return stacks, rounds
+
+
+def summarize_stacks(stacks: Counter, rounds: int, limit: int = 15) -> str:
+    """Загрузка по потокам и функции с наибольшим собственным временем"""
+    busy = sum(stacks.values())
+    threads: Counter = Counter()
+    own: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        threads[frames[0]] += count
+        own[frames[-1]] += count
+    lines = [f"Снимков: {rounds}, с работой: {busy}"]
+    for thread, count in threads.most_common():
+        lines.append(f"  {thread}: работа в {count / max(rounds, 1) * 100:.0f}% снимков")
+    if busy:
+        lines += ["", "Собственное время (доля снимков с работой):"]
+        for label, count in own.most_common(limit):
+            lines.append(f"{count / busy * 100:6.1f}%  {label}")
+    return "\n".join(lines)
+
+
+def collapsed_stacks(stacks: Counter) -> bytes:
+    """Формат flamegraph.pl / speedscope: «стек количество» построчно"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common()).encode()
+
+
+async def profile_sampling(seconds: float) -> tuple[str, bytes]:
+    """Сэмплер стеков всего процесса на seconds секунд: сводка и collapsed-стеки"""
+    async with _profile_lock:
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            stacks, rounds = await sample_with_signal(seconds)
+        else:
+            # Windows или loop не в главном потоке
+            stacks, rounds = await asyncio.to_thread(sample_stacks, seconds)
+    return summarize_stacks(stacks, rounds), collapsed_stacks(stacks)
+
+
+async def profile_cprofile(seconds: float, limit: int = 25) -> tuple[str, bytes]:
+    """cProfile потока event loop на seconds секунд: топ по собственному времени и .prof для snakeviz"""
+    async with _profile_lock:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    output = io.StringIO()
+    pstats.Stats(profiler, stream=output).strip_dirs().sort_stats("tottime").print_stats(limit)
+    profiler.create_stats()
+    return output.getvalue(), marshal.dumps(profiler.stats)
+
+
+def profiling_busy() -> bool:
+    return _profile_lock.locked()
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    # Выделения самого tracemalloc и импортов не интересны
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+
+
+def memory_snapshot_diff(limit: int = 15) -> tuple[str, Optional[bytes]]:
+    """Рост памяти с прошлого вызова по строкам кода; первый вызов включает tracemalloc"""
+    global _memory_baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        _memory_baseline = _take_snapshot()
+        return "tracemalloc включён; следующий вызов покажет рост памяти с этого момента", None
+
+    snapshot = _take_snapshot()
+    stats = snapshot.compare_to(_memory_baseline, "lineno")
+    _memory_baseline = snapshot
+    current, peak = tracemalloc.get_traced_memory()
+
+    def line(stat) -> str:
+        frame = stat.traceback[0]
+        return (f"{stat.size_diff / 1024:+10.1f} КБ {stat.count_diff:+7d} объектов  "
+                f"{_short_path(frame.filename)}:{frame.lineno}")
+
+    lines = [f"Отслеживается: {current / 1024 / 1024:.1f} МБ, пик {peak / 1024 / 1024:.1f} МБ", "",
+             "Рост с прошлого снимка:"]
+    lines += [line(stat) for stat in stats[:limit]]
+    full = "\n".join(line(stat) for stat in stats if stat.size_diff or stat.count_diff)
+    return "\n".join(lines), full.encode()
+
+
+def stop_memory_tracing():
+    global _memory_baseline
+    _memory_baseline = None
+    tracemalloc.stop()
@@ -0,0 +1,120 @@
+"""Квоты на тяжёлые медиа: скачанные байты и секунды сжатия за скользящее окно"""
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable
+from src.config import config
+
+# Уровни обслуживания медиа
+QUOTA_FULL = "full"
+QUOTA_REDUCED = "reduced"      # фото в меньшем размере, видео - превью
+QUOTA_TEXT_ONLY = "text_only"  # только текст карточки
+
+
+@dataclass
+class MediaUsage:
+    """Затраты на медиа одной карточки"""
+    bytes: int = 0
+    encode_seconds: float = 0.0
+
+
+class RollingUsage:
+    """Сумма затрат по ключам за последние window секунд.
+
+    Записи ключа лежат в очереди по времени и удаляются с её начала;
+    ключи без записей в окне вытесняются с начала OrderedDict без обхода.
+    """
+
+    def __init__(self, window: float, clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.clock = clock
+        # ключ -> (очередь (время, байты, секунды), [сумма байт, сумма секунд])
+        self._keys: OrderedDict[str, tuple[deque, list]] = OrderedDict()
+
+    def _expire_key(self, events: deque, totals: list, now: float):
+        while events and events[0][0] <= now - self.window:
+            _, spent_bytes, spent_seconds = events.popleft()
+            totals[0] -= spent_bytes
+            totals[1] -= spent_seconds
+
+    def _expire_idle(self, now: float):
+        while self._keys:
+            key, (events, _) = next(iter(self._keys.items()))
+            if events and events[-1][0] > now - self.window:
+                break
+            self._keys.popitem(last=False)
+
+    def add(self, key: str, usage: MediaUsage):
+        now = self.clock()
+        self._expire_idle(now)
+        entry = self._keys.get(key)
+        if entry is None:
+            entry = (deque(), [0, 0.0])
+            self._keys[key] = entry
+        events, totals = entry
+        events.append((now, usage.bytes, usage.encode_seconds))
+        totals[0] += usage.bytes
+        totals[1] += usage.encode_seconds
+        self._keys.move_to_end(key)
+
+    def get(self, key: str) -> MediaUsage:
+        entry = self._keys.get(key)
+        if entry is None:
+            return MediaUsage()
+        events, totals = entry
+        self._expire_key(events, totals, self.clock())
+        return MediaUsage(bytes=totals[0], encode_seconds=max(0.0, totals[1]))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class MediaQuota:
+    """Решает, в каком качестве отдавать медиа пользователю и чату.
+
+    До лимита - как есть; после лимита - облегчённые варианты; после
+    text_only_factor лимитов - только текст. Медиа из кэша file_id бесплатны.
+    """
+
+    def __init__(self, window: float, user_mb: float, user_encode_seconds: float,
+                 chat_mb: float, chat_encode_seconds: float, text_only_factor: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.usage = RollingUsage(window, clock)
+        self.limits = {
+            "user": (user_mb * 1024 * 1024, user_encode_seconds),
+            "chat": (chat_mb * 1024 * 1024, chat_encode_seconds),
+        }
+        self.text_only_factor = text_only_factor
+
+    def _ratio(self, kind: str, owner_id: int) -> float:
+        bytes_limit, seconds_limit = self.limits[kind]
+        usage = self.usage.get(f"{kind}:{owner_id}")
+        ratio = 0.0
+        if bytes_limit > 0:
+            ratio = max(ratio, usage.bytes / bytes_limit)
+        if seconds_limit > 0:
+            ratio = max(ratio, usage.encode_seconds / seconds_limit)
+        return ratio
+
+    def level(self, user_id: int, chat_id: int) -> str:
+        ratio = max(self._ratio("user", user_id), self._ratio("chat", chat_id))
+        if ratio >= self.text_only_factor:
+            return QUOTA_TEXT_ONLY
+        if ratio >= 1:
+            return QUOTA_REDUCED
+        return QUOTA_FULL
+
+    def charge(self, user_id: int, chat_id: int, usage: MediaUsage):
+        if usage.bytes or usage.encode_seconds:
+            self.usage.add(f"user:{user_id}", usage)
+            self.usage.add(f"chat:{chat_id}", usage)
+
+
+media_quota = MediaQuota(
+    window=config.MEDIA_QUOTA_WINDOW,
+    user_mb=config.MEDIA_QUOTA_USER_MB,
+    user_encode_seconds=config.MEDIA_QUOTA_USER_ENCODE_SECONDS,
+    chat_mb=config.MEDIA_QUOTA_CHAT_MB,
+    chat_encode_seconds=config.MEDIA_QUOTA_CHAT_ENCODE_SECONDS,
+    text_only_factor=config.MEDIA_QUOTA_TEXT_ONLY_FACTOR,
+)
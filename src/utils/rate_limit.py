@@ -1,50 +1,57 @@
-import time
-from collections import defaultdict
+import logging
 from src.config import config
+from src.storage.backends import StateBackend, state_backend
+
+logger = logging.getLogger(__name__)
 
 class RateLimiter:
-    def __init__(self):
-        self.user_timestamps = defaultdict(float)
-        self.chat_timestamps = defaultdict(float)
-    
-    def check_user_limit(self, user_id: int) -> bool:
-        """Проверяет, может ли пользователь сделать запрос"""
-        now = time.time()
-        last_request = self.user_timestamps.get(user_id, 0)
-        
-        if now - last_request < config.RATE_LIMIT_SECONDS:
-            return False
-        
-        self.user_timestamps[user_id] = now
-        return True
+    """Token bucket'ы на пользователя и на чат.
+
+    Bucket вмещает RATE_LIMIT_BURST запросов и пополняется на один запрос
+    за RATE_LIMIT_SECONDS; каждая ссылка в сообщении стоит один токен.
+    Bucket'ы хранятся в хранилище состояния, поэтому с общим хранилищем
+    лимит действует сразу для всех реплик.
+    """
+
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
     
-    def check_chat_limit(self, chat_id: int) -> bool:
-        """Проверяет, может ли чат сделать запрос"""
-        now = time.time()
-        last_request = self.chat_timestamps.get(chat_id, 0)
-        
-        if now - last_request < config.RATE_LIMIT_CHAT_SECONDS:
-            return False
-        
-        self.chat_timestamps[chat_id] = now
-        return True
+    @staticmethod
+    def _bucket(key: str, interval: float, burst: int, cost: int):
+        if interval <= 0:
+            return None
+        capacity = max(1, burst)
+        # Сообщение с большим числом ссылок, чем ёмкость, забирает весь bucket
+        return (key, float(capacity), 1.0 / interval, float(min(cost, capacity)))
     
-    def is_allowed(self, user_id: int, chat_id: int) -> bool:
-        """Проверяет оба лимита"""
-        return self.check_user_limit(user_id) and self.check_chat_limit(chat_id)
+    async def is_allowed(self, user_id: int, chat_id: int, cost: int = 1) -> bool:
+        """Проверяет оба лимита; токены списываются, только если хватает в обоих bucket'ах"""
+        buckets = [
+            bucket for bucket in (
+                self._bucket(f"rl:user:{user_id}", config.RATE_LIMIT_SECONDS, config.RATE_LIMIT_BURST, cost),
+                self._bucket(f"rl:chat:{chat_id}", config.RATE_LIMIT_CHAT_SECONDS, config.RATE_LIMIT_CHAT_BURST, cost),
+            )
+            if bucket is not None
+        ]
+        if not buckets:
+            return True
+        try:
+            return await self.backend.take_tokens(buckets)
+        except Exception as e:
+            # Недоступное хранилище не должно блокировать пользователей
+            logger.warning("Rate limit не проверен: %r", e)
+            return True
     
-    def cleanup_old_entries(self, max_age: int = 3600):
-        """Очищает старые записи (старше max_age секунд)"""
-        now = time.time()
-        
-        # Очистка пользователей
-        old_users = [uid for uid, ts in self.user_timestamps.items() if now - ts > max_age]
-        for uid in old_users:
-            del self.user_timestamps[uid]
-        
-        # Очистка чатов
-        old_chats = [cid for cid, ts in self.chat_timestamps.items() if now - ts > max_age]
-        for cid in old_chats:
-            del self.chat_timestamps[cid]
+    async def cleanup_old_entries(self):
+        """Очищает истёкшие записи (для хранилищ без собственного TTL)"""
+        await self.backend.purge_expired()
+
+def check_thread_cost():
+    """Предупреждает, если тред стоит больше, чем вмещает bucket пользователя"""
+    if config.THREAD_RATE_COST > config.RATE_LIMIT_BURST:
+        logger.warning(
+            "THREAD_RATE_COST=%s больше RATE_LIMIT_BURST=%s: тред спишет только %s токенов и опустошит bucket",
+            config.THREAD_RATE_COST, config.RATE_LIMIT_BURST, max(1, config.RATE_LIMIT_BURST),
+        )
 
-rate_limiter = RateLimiter()
\ No newline at end of file
+rate_limiter = RateLimiter(state_backend)
\ No newline at end of file
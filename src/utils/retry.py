@@ -0,0 +1,82 @@
+"""Планирование повторов HTTP запросов: Retry-After и бюджет повторов"""
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from src.config import config
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Разбирает заголовок Retry-After (секунды или HTTP-дата) в секунды ожидания"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def exponential_wait(attempt_number: int) -> float:
+    """Экспоненциальная задержка перед повтором (как tenacity.wait_exponential)"""
+    wait = config.RETRY_WAIT_MULTIPLIER * (2 ** (attempt_number - 1))
+    return max(config.RETRY_WAIT_MIN, min(wait, config.RETRY_WAIT_MAX))
+
+
+class RetryBudget:
+    """Ограничивает повторы долей от всех запросов в скользящем окне.
+
+    Когда источник деградирует, повторы не умножают нагрузку на него:
+    разрешено не больше ratio * запросов (и не меньше min_retries) за окно.
+    """
+
+    def __init__(self, ratio: float, min_retries: int, window_seconds: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window_seconds = window_seconds
+        # Посекундные счётчики: [секунда, запросы, повторы]
+        self._buckets: deque[list[int]] = deque()
+        self.denied = 0
+
+    def _bucket(self) -> list[int]:
+        now = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._buckets.append([now, 0, 0])
+        return self._buckets[-1]
+
+    def record_request(self):
+        """Учитывает новый (первичный) запрос"""
+        self._bucket()[1] += 1
+
+    def try_acquire_retry(self) -> bool:
+        """Разрешает повтор, если бюджет не исчерпан"""
+        bucket = self._bucket()
+        requests = sum(b[1] for b in self._buckets)
+        retries = sum(b[2] for b in self._buckets)
+        if retries >= max(self.min_retries, self.ratio * requests):
+            self.denied += 1
+            return False
+        bucket[2] += 1
+        return True
+
+
+# Бюджеты повторов по хостам
+_retry_budgets: dict[str, RetryBudget] = {}
+
+
+def get_retry_budget(host: str) -> RetryBudget:
+    budget = _retry_budgets.get(host)
+    if budget is None:
+        budget = RetryBudget(config.RETRY_BUDGET_RATIO, config.RETRY_BUDGET_MIN_RETRIES)
+        _retry_budgets[host] = budget
+    return budget
@@ -0,0 +1,81 @@
+"""Плавная остановка: учёт карточек в обработке и их дренаж до дедлайна"""
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Как часто drain проверяет, закончилась ли работа
+DRAIN_POLL_INTERVAL = 0.1
+
+
+class InflightTracker:
+    """Задачи, которые нельзя обрывать на полпути (скачивание, сжатие, отправка).
+
+    После stop_accepting новые задачи не запускаются; drain ждёт текущие
+    до дедлайна и отменяет оставшиеся - их finally-блоки удаляют файлы.
+    """
+
+    def __init__(self):
+        self.accepting = True
+        self._tasks: set[asyncio.Task] = set()
+        # Задачи, отменённые дренажом (Task.cancelling() есть только с Python 3.11)
+        self._drained: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def stop_accepting(self):
+        self.accepting = False
+
+    async def run(self, coro: Awaitable) -> bool:
+        """Выполняет coro отдельной задачей; False, если она не запущена или отменена дренажом"""
+        if not self.accepting:
+            coro.close()
+            return False
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        try:
+            await task
+        except asyncio.CancelledError:
+            # Отменили задачу дренажом - штатный выход; отменили вызывающего - отменяем дальше
+            if task in self._drained:
+                self._drained.discard(task)
+                return False
+            raise
+        return True
+
+    def spawn(self, coro: Awaitable) -> bool:
+        """Запускает coro фоном, не дожидаясь её; дренаж ждёт и отменяет её наравне с run"""
+        if not self.accepting:
+            coro.close()
+            return False
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._forget_spawned)
+        return True
+
+    def _forget_spawned(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._drained.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Фоновая задача завершилась с ошибкой: %s", task.exception())
+
+    async def drain(self, timeout: float, pending: Callable[[], int] = lambda: 0) -> int:
+        """Ждёт задачи и ещё не начатую работу (pending) до timeout; возвращает число отменённых"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (self._tasks or pending()) and loop.time() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        self.stop_accepting()
+        tasks = list(self._tasks)
+        for task in tasks:
+            self._drained.add(task)
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return len(tasks)
+
+
+# Карточки, которые обрабатываются прямо сейчас
+inflight = InflightTracker()
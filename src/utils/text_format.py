@@ -1,6 +1,6 @@
 import re
 from datetime import datetime
-from src.twitter.models import Tweet, Poll
+from src.twitter.models import Tweet, TweetStats, Poll
 from html import escape
 from typing import Optional
 
@@ -83,6 +83,42 @@ def format_poll(poll: Poll) -> str:
     
     return "\n".join(lines)
 
+def format_stats_line(stats: TweetStats) -> str:
+    """Форматирует строку статистики твита"""
+    stats_parts = []
+    
+    if stats.replies is not None:
+        stats_parts.append(f"💬 {format_number(stats.replies)}")
+    else:
+        stats_parts.append("💬 —")
+    
+    if stats.reposts is not None:
+        stats_parts.append(f"🔁 {format_number(stats.reposts)}")
+    else:
+        stats_parts.append("🔁 —")
+    
+    if stats.likes is not None:
+        stats_parts.append(f"❤️ {format_number(stats.likes)}")
+    else:
+        stats_parts.append("❤️ —")
+    
+    if stats.views is not None:
+        stats_parts.append(f"👁 {format_number(stats.views)}")
+    else:
+        stats_parts.append("👁 —")
+    
+    return "  ".join(stats_parts)
+
+STATS_LINE_PATTERN = re.compile(r'^💬 \S+  🔁 \S+  ❤️ \S+  👁 \S+$', re.MULTILINE)
+
+def replace_stats_line(card_text: str, stats: TweetStats) -> str:
+    """Заменяет строку статистики в готовой карточке (последнее совпадение)"""
+    matches = list(STATS_LINE_PATTERN.finditer(card_text))
+    if not matches:
+        return card_text
+    last = matches[-1]
+    return card_text[:last.start()] + format_stats_line(stats) + card_text[last.end():]
+
 def format_tweet_card(tweet: Tweet, include_translation: bool = False, user_comment: Optional[str] = None) -> str:
     """Форматирует карточку твита"""
     date_str, time_str = format_date(tweet.date)
@@ -250,30 +286,7 @@ def format_tweet_card(tweet: Tweet, include_translation: bool = False, user_comm
         lines.append("")
     
     # Статистика
-    stats = tweet.stats
-    stats_parts = []
-    
-    if stats.replies is not None:
-        stats_parts.append(f"💬 {format_number(stats.replies)}")
-    else:
-        stats_parts.append("💬 —")
-    
-    if stats.reposts is not None:
-        stats_parts.append(f"🔁 {format_number(stats.reposts)}")
-    else:
-        stats_parts.append("🔁 —")
-    
-    if stats.likes is not None:
-        stats_parts.append(f"❤️ {format_number(stats.likes)}")
-    else:
-        stats_parts.append("❤️ —")
-    
-    if stats.views is not None:
-        stats_parts.append(f"👁 {format_number(stats.views)}")
-    else:
-        stats_parts.append("👁 —")
-    
-    lines.append("  ".join(stats_parts))
+    lines.append(format_stats_line(tweet.stats))
     
     # Добавляем информацию о переводе если есть
     if include_translation and tweet.translated_text and tweet.source_language:
@@ -282,6 +295,68 @@ def format_tweet_card(tweet: Tweet, include_translation: bool = False, user_comm
     
     return "\n".join(lines)
 
+TELEGRAM_TEXT_LIMIT = 4096
+
+def _split_post_text(text: str, limit: int) -> list[str]:
+    """Делит текст поста по словам на части, которые после clean_tweet_text влезают в limit.
+    
+    Длина очищенного текста почти аддитивна по словам (экранирование и ссылки
+    на @упоминания не выходят за слово), поэтому части набираются по сумме длин.
+    """
+    text = normalize_line_indents(re.sub(r'<br\s*/?>', '\n', text or ""))
+    chunks = []
+    current: list[str] = []
+    size = 0
+    # Экранирование удлиняет символ максимум в 6 раз (&quot;): длиннее режем на куски
+    piece = max(1, limit // 6)
+    tokens = []
+    for token in re.split(r'(\s+)', text):
+        if len(token) > piece and not token.isspace():
+            tokens.extend(token[i:i + piece] for i in range(0, len(token), piece))
+        elif token:
+            tokens.append(token)
+    for token in tokens:
+        token_size = len(token) if token.isspace() else len(clean_tweet_text(token))
+        if current and size + token_size > limit:
+            chunks.append("".join(current))
+            current, size = [], 0
+            if token.isspace():
+                continue
+        current.append(token)
+        size += token_size
+    if current:
+        chunks.append("".join(current))
+    return [clean_tweet_text(chunk) for chunk in chunks if chunk.strip()]
+
+def format_thread_messages(tweets: list[Tweet], limit: int = TELEGRAM_TEXT_LIMIT) -> list[str]:
+    """Тред одним текстом: шапка с автором, пронумерованные посты; разбит на минимум сообщений по limit"""
+    first = tweets[0]
+    date_str, time_str = format_date(first.date)
+    header = (
+        f'🧵 {escape(first.display_name)} (<a href="https://x.com/{escape(first.username)}">@{escape(first.username)}</a>)'
+        f' — {date_str}, {time_str} · постов: {len(tweets)}'
+    )
+    
+    # Блоки по абзацу на пост; номер - ссылка на сам твит
+    blocks = [header]
+    for number, tweet in enumerate(tweets, 1):
+        label = f'<a href="{escape(tweet.url)}">{number}/{len(tweets)}</a>'
+        parts = _split_post_text(tweet.text, limit - len(label) - 1) or [""]
+        blocks.append(f"{label}\n{parts[0]}".rstrip())
+        blocks.extend(parts[1:])
+    
+    messages = []
+    current = ""
+    for block in blocks:
+        if current and len(current) + 2 + len(block) <= limit:
+            current += "\n\n" + block
+            continue
+        if current:
+            messages.append(current)
+        current = block
+    messages.append(current)
+    return messages
+
 def shorten_text_for_caption(text: str, max_length: int = 1024) -> tuple[str, bool]:
     """Укорачивает текст для caption, возвращает (текст, был_обрезан)"""
     if len(text) <= max_length:
@@ -0,0 +1,57 @@
+"""Token bucket'ы в памяти с вытеснением простаивающих без полного обхода"""
+import time
+from collections import OrderedDict
+from typing import Callable, Sequence
+
+# (ключ, ёмкость, пополнение в секунду, стоимость)
+BucketRequest = tuple[str, float, float, float]
+
+
+class TokenBuckets:
+    """Набор token bucket'ов по ключам.
+
+    Bucket'ы упорядочены по последнему обращению; bucket, который успел снова
+    наполниться, равен отсутствующему и удаляется с начала очереди при
+    следующих обращениях. Память ограничена числом ключей, активных за время
+    полного пополнения, без периодического сканирования.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        # ключ -> (токены, время обновления, когда bucket снова полон)
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+
+    def _expire(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            key, (_, _, full_at) = next(iter(buckets.items()))
+            if full_at > now:
+                break
+            buckets.popitem(last=False)
+
+    def _tokens(self, key: str, capacity: float, rate: float, now: float) -> float:
+        state = self._buckets.get(key)
+        if state is None:
+            return capacity
+        tokens, updated_at, _ = state
+        return min(capacity, tokens + (now - updated_at) * rate)
+
+    def take(self, requests: Sequence[BucketRequest]) -> bool:
+        """Списывает стоимость сразу со всех bucket'ов или ни с одного"""
+        now = self.clock()
+        self._expire(now)
+
+        remaining = []
+        for key, capacity, rate, cost in requests:
+            tokens = self._tokens(key, capacity, rate, now)
+            if tokens < cost:
+                return False
+            remaining.append(tokens - cost)
+
+        for (key, capacity, rate, _), tokens in zip(requests, remaining):
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            self._buckets.move_to_end(key)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._buckets)
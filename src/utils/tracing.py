@@ -0,0 +1,132 @@
+"""Трассировка обработки сообщения: спаны этапов и сохранение медленных запросов"""
+import logging
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+from src.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Этап обработки: длительность, атрибуты и вложенные этапы"""
+
+    __slots__ = ("name", "trace_id", "attributes", "children", "start", "end", "error")
+
+    def __init__(self, name: str, trace_id: str, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.attributes = attributes
+        self.children: list[Span] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin: Optional[float] = None) -> dict:
+        origin = self.start if origin is None else origin
+        return {
+            "name": self.name,
+            "offset": self.start - origin,
+            "duration": self.duration,
+            "attributes": dict(self.attributes),
+            "error": self.error,
+            "finished": self.end is not None,
+            "children": [child.to_dict(origin) for child in list(self.children)],
+        }
+
+
+# Текущий спан; задачи asyncio наследуют его при создании
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+# Последние медленные трассы (дерево спанов)
+slow_traces: deque[dict] = deque(maxlen=config.TRACE_BUFFER_SIZE)
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def _enter(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = type(e).__name__
+        raise
+    finally:
+        span.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Span]:
+    """Корневой спан запроса; медленные трассы сохраняются в slow_traces"""
+    root = Span(name, uuid.uuid4().hex[:12], attributes)
+    try:
+        with _enter(root):
+            yield root
+    finally:
+        if root.duration >= config.TRACE_SLOW_SECONDS:
+            trace = root.to_dict()
+            trace["trace_id"] = root.trace_id
+            trace["started_at"] = time.time() - root.duration
+            slow_traces.append(trace)
+            logger.warning("Медленный запрос %s: %.1fс", name, root.duration)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Вложенный спан; вне трассы ничего не делает и возвращает None"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent.trace_id, attributes)
+    parent.children.append(child)
+    with _enter(child):
+        yield child
+
+
+def set_attributes(**attributes: Any):
+    """Добавляет атрибуты к текущему спану, если он есть"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def format_trace(trace: dict) -> str:
+    """Дерево спанов текстом: смещение, длительность, имя и атрибуты"""
+    lines = []
+
+    def walk(node: dict, depth: int):
+        attributes = " ".join(f"{key}={value}" for key, value in node["attributes"].items())
+        status = f" ✗{node['error']}" if node["error"] else ("" if node["finished"] else " …")
+        lines.append(
+            f"{'  ' * depth}+{node['offset'] * 1000:.0f}мс {node['duration'] * 1000:.0f}мс "
+            f"{node['name']}{status} {attributes}".rstrip()
+        )
+        for child in node["children"]:
+            walk(child, depth + 1)
+
+    walk(trace, 0)
+    return "\n".join(lines)
+
+
+class TraceIdFilter(logging.Filter):
+    """Добавляет trace_id текущего запроса в каждую запись лога"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
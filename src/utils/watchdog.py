@@ -0,0 +1,109 @@
+"""Поиск блокирующих вызовов: сторожевой поток снимает стек event loop, если тот завис"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+from src.utils.metrics import LOOP_BLOCKED_SECONDS, LOOP_BLOCKED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних блокировок хранить для /perf
+RECENT_BLOCKS = 20
+
+# Корень проекта: место блокировки ищется в своём коде, а не в библиотеках
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def blocking_location(stack: traceback.StackSummary) -> str:
+    """Самый глубокий кадр из кода бота (или просто самый глубокий), как путь:строка функция"""
+    frames = [frame for frame in stack if frame.filename.startswith(os.path.join(PROJECT_ROOT, "src"))]
+    frame = (frames or list(stack))[-1]
+    filename = os.path.relpath(frame.filename, PROJECT_ROOT) if frames else os.path.basename(frame.filename)
+    return f"{filename}:{frame.lineno} {frame.name}"
+
+
+class LoopWatchdog:
+    """Event loop отмечается каждые interval секунд; сторожевой поток ищет пропуски.
+
+    Если отметки нет дольше threshold, поток снимает стек потока event loop
+    и пишет его в лог сразу - даже если loop так и не освободится. Длительность
+    блокировки и место в коде попадают в метрики, когда loop оживает.
+    """
+
+    def __init__(self):
+        self.threshold = 0.0
+        self.interval = 0.0
+        self.recent: deque[dict] = deque(maxlen=RECENT_BLOCKS)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._pending: Optional[dict] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, threshold: float):
+        """Запускает отметки в текущем event loop и сторожевой поток"""
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._loop.call_later(self.interval, self._beat)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Поиск блокировок event loop включён: порог %.0f мс", threshold * 1000)
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _beat(self):
+        """Отметка в потоке event loop; заодно отчитывается о закончившейся блокировке"""
+        now = time.monotonic()
+        with self._lock:
+            blocked, self._pending = self._pending, None
+            previous, self._last_beat = self._last_beat, now
+        if blocked is not None:
+            blocked["seconds"] = now - previous - self.interval
+            LOOP_BLOCKED_TOTAL.inc(location=blocked["location"])
+            LOOP_BLOCKED_SECONDS.observe(blocked["seconds"])
+            self.recent.append(blocked)
+            logger.warning("Event loop был заблокирован %.0f мс: %s", blocked["seconds"] * 1000, blocked["location"])
+        if not self._stopped.is_set():
+            self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                stalled = time.monotonic() - self._last_beat - self.interval
+                if stalled < self.threshold or self._pending is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                stack = traceback.extract_stack(frame)
+                blocked = self._pending = {
+                    "time": time.time(),
+                    "location": blocking_location(stack),
+                    "stack": "".join(stack.format()),
+                }
+            logger.warning(
+                "Event loop заблокирован дольше %.0f мс, стек:\n%s", self.threshold * 1000, blocked["stack"]
+            )
+
+
+# Включается в post_init при LOOP_WATCHDOG_SECONDS > 0
+loop_watchdog = LoopWatchdog()
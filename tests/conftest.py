@@ -4,3 +4,5 @@ import os
 # Test suite imports modules that load src.config at import time.
 # Ensure required env var is always present in CI during collection.
 os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+# Do not create the preferences database inside the working tree.
+os.environ.setdefault("STORAGE_PATH", ":memory:")
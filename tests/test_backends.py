@@ -0,0 +1,200 @@
+import asyncio
+import pickle
+import time
+from datetime import datetime, timezone
+import pytest
+from src.storage.backends import _DELETE_IF_EQUALS_SCRIPT, MemoryBackend, RedisBackend, SQLiteBackend, create_backend
+from src.twitter.models import MediaItem, Poll, PollOption, QuotedTweet, Tweet, tweet_from_dict, tweet_to_dict
+from src.utils.cache import TieredCache, TTLCache
+from src.utils.rate_limit import RateLimiter
+
+
+class FakeRedis:
+    """Минимальный RESP-сервер: GET, SET [NX] [PX], DEL, AUTH, SELECT и EVAL снятия блокировки"""
+
+    def __init__(self):
+        self.data = {}
+        self.server = None
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"redis://:secret@127.0.0.1:{port}/1"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                count = int((await reader.readuntil(b"\r\n"))[1:-2])
+                args = []
+                for _ in range(count):
+                    length = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2])
+                writer.write(self._handle(args))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    def _alive(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def _handle(self, args):
+        command = args[0].upper()
+        if command in (b"AUTH", b"SELECT"):
+            return b"+OK\r\n"
+        if command == b"GET":
+            entry = self._alive(args[1])
+            return b"$-1\r\n" if entry is None else b"$%d\r\n%s\r\n" % (len(entry[0]), entry[0])
+        if command == b"SET":
+            key, value, options = args[1], args[2], [a.upper() for a in args[3:]]
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+            if b"NX" in options and self._alive(key) is not None:
+                return b"$-1\r\n"
+            self.data[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            return b":%d\r\n" % int(self.data.pop(args[1], None) is not None)
+        if command == b"EVAL" and args[1].decode() == _DELETE_IF_EQUALS_SCRIPT:
+            entry = self._alive(args[3])
+            if entry is None or entry[0] != args[4]:
+                return b":0\r\n"
+            del self.data[args[3]]
+            return b":1\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+async def check_contract(backend):
+    assert await backend.get("missing") is None
+    await backend.set("key", b"value")
+    assert await backend.get("key") == b"value"
+
+    assert await backend.set_if_absent("lock", b"a", ttl=0.05)
+    assert not await backend.set_if_absent("lock", b"b", ttl=0.05)
+    await asyncio.sleep(0.1)
+    assert await backend.set_if_absent("lock", b"c", ttl=5)
+    assert await backend.get("lock") == b"c"
+
+    # Чужую (перехваченную после истечения) блокировку не снимаем
+    assert not await backend.delete_if_equals("lock", b"a")
+    assert await backend.get("lock") == b"c"
+    assert await backend.delete_if_equals("lock", b"c")
+    assert await backend.get("lock") is None
+
+    await backend.delete("key")
+    assert await backend.get("key") is None
+    await backend.close()
+
+
+def test_memory_backend_contract():
+    asyncio.run(check_contract(MemoryBackend()))
+
+
+def test_sqlite_backend_contract(tmp_path):
+    backend = create_backend(f"sqlite:///{tmp_path}/state.db")
+    assert isinstance(backend, SQLiteBackend) and backend.shared
+    asyncio.run(check_contract(backend))
+
+
+def test_redis_backend_contract():
+    async def scenario():
+        fake = FakeRedis()
+        url = await fake.start()
+        backend = create_backend(url)
+        assert isinstance(backend, RedisBackend) and backend.shared
+        try:
+            await check_contract(backend)
+        finally:
+            await fake.stop()
+
+    asyncio.run(scenario())
+
+
+def test_create_backend_rejects_unknown_scheme():
+    with pytest.raises(ValueError):
+        create_backend("mongodb://localhost")
+
+
+def test_replicas_share_cache_and_rate_limit(tmp_path):
+    path = f"{tmp_path}/state.db"
+    # Две «реплики» с собственными L1 и общим файлом SQLite
+    first = TieredCache(TTLCache(maxsize=10, ttl=60), "tweet", SQLiteBackend(path))
+    second = TieredCache(TTLCache(maxsize=10, ttl=60), "tweet", SQLiteBackend(path))
+
+    async def scenario():
+        await first.set(("1", ""), {"text": "hello"})
+        assert await second.get(("1", "")) == {"text": "hello"}
+        assert second.local.get(("1", "")) == {"text": "hello"}
+
+        limiter_a = RateLimiter(SQLiteBackend(path))
+        limiter_b = RateLimiter(SQLiteBackend(path))
+        assert await limiter_a.is_allowed(42, 42, cost=3)
+        assert not await limiter_b.is_allowed(42, 42)
+
+    asyncio.run(scenario())
+
+
+def test_shared_cache_stores_tweets_as_json_and_ignores_pickle(tmp_path):
+    backend = SQLiteBackend(f"{tmp_path}/state.db")
+    tweet = Tweet(
+        display_name="User",
+        username="user",
+        url="https://x.com/user/status/1",
+        text="Hello",
+        date=datetime(2026, 2, 14, 12, 0, tzinfo=timezone.utc),
+        media=[MediaItem(type="video", url="https://video.twimg.com/v.mp4", thumbnail_url="https://pbs.twimg.com/t.jpg")],
+        quoted_tweet=QuotedTweet(display_name="Other", username="other", url="https://x.com/other", text="Quoted"),
+        poll=Poll(question="Q?", options=[PollOption(text="A", votes=3, percent=75.0)], total_votes=4),
+    )
+
+    def make_cache():
+        return TieredCache(TTLCache(maxsize=10, ttl=60), "tweet", backend, encode=tweet_to_dict, decode=tweet_from_dict)
+
+    class Evil:
+        def __reduce__(self):
+            return (exec, ("raise SystemExit('выполнен код из кэша')",))
+
+    async def scenario():
+        await make_cache().set(("1", ""), tweet)
+        assert await make_cache().get(("1", "")) == tweet
+
+        await backend.set("tweet:2:", pickle.dumps(Evil()), ttl=60)
+        assert await make_cache().get(("2", "")) is None
+
+    asyncio.run(scenario())
+
+
+def test_get_tweet_waits_for_replica_holding_lock(tmp_path, monkeypatch):
+    from src.twitter import service
+
+    backend = SQLiteBackend(f"{tmp_path}/state.db")
+    other = TieredCache(TTLCache(maxsize=10, ttl=60), "tweet", backend)
+    monkeypatch.setattr(service, "state_backend", backend)
+    monkeypatch.setattr(service, "shared_tweet_cache", TieredCache(TTLCache(maxsize=10, ttl=60), "tweet", backend))
+    monkeypatch.setattr(service, "SHARED_POLL_INTERVAL", 0.01)
+
+    async def fail_fetch(*args):
+        raise AssertionError("твит должна загрузить другая реплика")
+
+    monkeypatch.setattr(service, "fetch_tweet_html", fail_fetch)
+
+    async def scenario():
+        assert await backend.set_if_absent("lock:tweet:7:", b"other", ttl=5)
+
+        async def other_replica():
+            await asyncio.sleep(0.05)
+            await other.set(("7", ""), "tweet from replica")
+            await backend.delete("lock:tweet:7:")
+
+        asyncio.create_task(other_replica())
+        return await service.get_tweet("7", "user", None, "https://x.com/user/status/7")
+
+    assert asyncio.run(scenario()) == "tweet from replica"
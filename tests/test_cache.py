@@ -0,0 +1,51 @@
+from src.utils import cache as cache_module
+from src.utils.cache import TTLCache
+
+
+def test_ttl_cache_returns_stored_value_and_counts_hits():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("missing") is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_serves_stale_entries_within_stale_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5, stale_ttl=10)
+    cache.set("a", 1)
+
+    assert cache.get_with_staleness("a") == (1, False)
+    now[0] += 6
+    assert cache.get("a") is None
+    assert cache.get_with_staleness("a") == (1, True)
+    now[0] += 10
+    assert cache.get_with_staleness("a") == (None, False)
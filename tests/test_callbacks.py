@@ -0,0 +1,50 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import BadRequest
+
+from src.config import config
+from src.handlers import callbacks
+from src.storage.backends import MemoryBackend
+from src.twitter.models import TweetStats
+from src.utils.rate_limit import RateLimiter
+
+
+class FakeQuery:
+    def __init__(self, too_old_after: int = 99):
+        self.message = SimpleNamespace(chat=SimpleNamespace(id=5), text=None, caption=None)
+        self.answers = []
+        self.too_old_after = too_old_after
+
+    async def answer(self, text=None, show_alert=False):
+        if len(self.answers) >= self.too_old_after:
+            raise BadRequest("Query is too old and response timeout expired")
+        self.answers.append(text)
+
+
+def test_refresh_stats_is_rate_limited_and_survives_expired_query(monkeypatch):
+    refreshed = []
+
+    async def fake_refresh(tweet_id, username, lang_code, url):
+        refreshed.append(tweet_id)
+        return SimpleNamespace(stats=TweetStats(likes=1))
+
+    monkeypatch.setattr(callbacks, "refresh_tweet", fake_refresh)
+    monkeypatch.setattr(callbacks, "rate_limiter", RateLimiter(MemoryBackend()))
+    monkeypatch.setattr(config, "RATE_LIMIT_BURST", 1)
+
+    async def scenario():
+        monkeypatch.setattr(config, "TELEGRAM_USER_IDS", [2])
+        denied = FakeQuery()
+        await callbacks.handle_refresh_stats(denied, 1, "user/1")
+        assert denied.answers == ["⛔ Нет доступа"]
+
+        monkeypatch.setattr(config, "TELEGRAM_USER_IDS", None)
+        # Ответ опоздал: ошибка Telegram не вылетает из обработчика
+        await callbacks.handle_refresh_stats(FakeQuery(too_old_after=0), 1, "user/1")
+        limited = FakeQuery()
+        await callbacks.handle_refresh_stats(limited, 1, "user/1")
+        assert limited.answers[0].startswith("⏳")
+
+    asyncio.run(scenario())
+    assert refreshed == ["1"]
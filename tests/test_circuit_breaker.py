@@ -0,0 +1,64 @@
+import asyncio
+from src.twitter import fetcher
+from src.utils import circuit_breaker as breaker_module
+from src.utils.circuit_breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    get_breaker,
+)
+
+
+def test_breaker_opens_probes_and_closes(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("host.test", failure_threshold=2, reset_timeout=10, half_open_probes=1)
+
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+    now[0] += 10
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request()
+
+
+def test_breaker_reopens_when_probe_fails(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("host.test", failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    now[0] += 10
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+
+    assert breaker.state == STATE_OPEN
+    assert breaker.times_opened == 2
+
+
+def test_get_with_retry_fails_fast_when_breaker_is_open():
+    class NeverCalledClient:
+        async def send(self, *args, **kwargs):
+            raise AssertionError("запрос не должен уйти")
+
+    breaker = get_breaker("open-breaker.test")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    try:
+        asyncio.run(fetcher._get_with_retry(NeverCalledClient(), "https://open-breaker.test/x", {}))
+    except CircuitOpenError as e:
+        assert e.host == "open-breaker.test"
+    else:
+        raise AssertionError("ожидался CircuitOpenError")
+    assert breaker.rejected == 1
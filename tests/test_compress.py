@@ -0,0 +1,34 @@
+import os
+from PIL import Image
+from src.config import config
+from src.media.compress import compress_image
+from src.utils.metrics import COMPRESS_ATTEMPTS
+
+
+def _noisy_png(tmp_path, size=(600, 400)) -> str:
+    path = tmp_path / "noise.png"
+    Image.merge("RGB", [Image.effect_noise(size, 80)] * 3).save(path)
+    return str(path)
+
+
+def test_compress_image_reduces_quality_until_it_fits(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COMPRESS_MEDIA", True)
+    source = _noisy_png(tmp_path)
+    attempts = COMPRESS_ATTEMPTS.value(type="photo")
+
+    output = compress_image(source, max_size_mb=0.08)
+    try:
+        assert output != source and output.endswith(".jpg")
+        assert os.path.getsize(output) <= 0.08 * 1024 * 1024
+        assert COMPRESS_ATTEMPTS.value(type="photo") - attempts > 1
+    finally:
+        os.remove(output)
+
+
+def test_compress_image_keeps_small_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "COMPRESS_MEDIA", True)
+    source = _noisy_png(tmp_path, size=(50, 50))
+    attempts = COMPRESS_ATTEMPTS.value(type="photo")
+
+    assert compress_image(source, max_size_mb=1) == source
+    assert COMPRESS_ATTEMPTS.value(type="photo") == attempts
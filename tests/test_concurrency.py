@@ -0,0 +1,129 @@
+import asyncio
+import httpx
+import pytest
+from src.twitter import fetcher
+from src.utils import concurrency
+from src.utils.concurrency import AdaptiveLimiter, get_limiter
+from src.utils.deadline import request_deadline
+
+
+def test_limiter_increases_additively_and_halves_on_overload():
+    limiter = AdaptiveLimiter("host.test", initial=4, min_limit=1, max_limit=8, latency_factor=0)
+
+    async def scenario():
+        for _ in range(4):
+            await limiter.acquire()
+            limiter.release(latency=0.1)
+
+    asyncio.run(scenario())
+    assert limiter.limit == pytest.approx(5, abs=0.2)
+
+    asyncio.run(limiter.acquire())
+    limiter.release(latency=0.1, overloaded=True)
+    assert int(limiter.limit) == 2
+    assert limiter.decreases == 1
+
+
+def test_limiter_decreases_on_latency_spike(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(concurrency.time, "monotonic", lambda: now[0])
+    limiter = AdaptiveLimiter("host.test", initial=8, min_limit=1, max_limit=64, latency_factor=3.0)
+
+    async def call(latency):
+        await limiter.acquire()
+        limiter.release(latency=latency)
+
+    asyncio.run(call(0.2))
+    asyncio.run(call(2.0))
+    assert int(limiter.limit) == 4
+
+
+def test_limiter_queues_over_limit_and_times_out():
+    limiter = AdaptiveLimiter("host.test", initial=1, min_limit=1, max_limit=1, latency_factor=0)
+
+    async def scenario():
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.queued == 1
+
+        limiter.release(latency=0.05)
+        await waiter
+        assert limiter.in_flight == 1
+        assert limiter.queued == 0
+
+        with pytest.raises(asyncio.TimeoutError):
+            await limiter.acquire(timeout=0.01)
+        assert limiter.queued == 0
+        limiter.release()
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_fetcher_goes_through_limiter(monkeypatch):
+    monkeypatch.setattr(concurrency, "_limiters", {})
+
+    def handler(request):
+        return httpx.Response(429 if request.url.path == "/busy" else 200, request=request)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await fetcher._get_once(client, "https://limit.test/ok", {}, host="limit.test")
+            with pytest.raises(httpx.HTTPStatusError):
+                await fetcher._get_once(client, "https://limit.test/busy", {}, host="limit.test")
+
+    asyncio.run(scenario())
+    limiter = get_limiter("limit.test")
+    assert limiter.in_flight == 0
+    assert limiter.decreases == 1
+
+
+def test_limiter_latency_excludes_body_download(monkeypatch):
+    monkeypatch.setattr(concurrency, "_limiters", {})
+
+    async def slow_body():
+        # Большое медиа: заголовки пришли сразу, тело качается долго
+        for _ in range(3):
+            await asyncio.sleep(0.05)
+            yield b"chunk"
+
+    async def handler(request):
+        return httpx.Response(200, content=slow_body(), request=request)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await fetcher._get_once(client, "https://media.test/video.mp4", {}, host="media.test")
+
+    response = asyncio.run(scenario())
+    assert response.content == b"chunkchunkchunk"
+    limiter = get_limiter("media.test")
+    assert limiter.in_flight == 0
+    assert limiter.latency_ewma < 0.1
+
+
+def test_request_timeout_excludes_time_spent_in_queue(monkeypatch):
+    limiter = AdaptiveLimiter("queue.test", initial=1, min_limit=1, max_limit=1, latency_factor=0)
+    monkeypatch.setattr(concurrency, "_limiters", {"queue.test": limiter})
+    timeouts = []
+
+    class RecordingClient:
+        timeout = httpx.Timeout(30.0)
+
+        def build_request(self, method, url, headers=None, timeout=None):
+            timeouts.append(timeout)
+            return httpx.Request(method, url)
+
+        async def send(self, request, stream=False):
+            return httpx.Response(200, request=request)
+
+    async def scenario():
+        await limiter.acquire()
+        asyncio.get_running_loop().call_later(0.3, limiter.release, 0.01)
+        with request_deadline(1.0):
+            await fetcher._get_once(RecordingClient(), "https://queue.test/a", {}, host="queue.test")
+
+    asyncio.run(scenario())
+    # 0.3 с в очереди вычтены из таймаута запроса
+    assert timeouts[0].read < 0.75
+    assert limiter.in_flight == 0
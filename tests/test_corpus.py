@@ -0,0 +1,32 @@
+from benchmarks.corpus import anonymize, classify, load_corpus
+from src.twitter.parser import parse_tweet_html
+
+
+def test_corpus_pages_parse_into_recorded_kinds():
+    entries = load_corpus()
+    kinds = {kind for entry in entries for kind in entry["kinds"]}
+    assert {"plain", "quote", "poll", "mosaic", "video", "photo"} <= kinds
+    assert len({kind for kind in kinds if kind.startswith("translated:")}) >= 3
+
+    for entry in entries:
+        tweet = parse_tweet_html(entry["html"], entry["url"])
+        assert tweet is not None, entry["file"]
+        assert classify(tweet, entry["html"]) == entry["kinds"], entry["file"]
+
+
+def test_anonymize_replaces_identifiers_consistently():
+    html = (
+        '<meta property="og:title" content="Jane Roe (@jane_roe)"/>'
+        '<meta property="og:description" content="hi @bob_k&#10;&#10;Quoting Bob K (@bob_k)&#10;text"/>'
+        '<meta property="og:image" content="https://pbs.twimg.com/media/GkAbCdEf123?format=jpg"/>'
+        '<link href="https://fxtwitter.com/owoembed?author=jane_roe&amp;status=1893456789012345671"/>'
+    )
+    anonymized, url = anonymize(html, "https://x.com/jane_roe/status/1893456789012345671")
+
+    for secret in ("jane_roe", "Jane Roe", "bob_k", "Bob K", "GkAbCdEf123", "1893456789012345671"):
+        assert secret not in anonymized and secret not in url
+    assert "User 1 (@user1)" in anonymized
+    assert "Quoting User 2 (@user2)" in anonymized and "hi @user2" in anonymized
+    assert url.startswith("https://x.com/user1/status/")
+    assert url.rsplit("/", 1)[1] in anonymized
+    assert anonymize(html, "https://x.com/jane_roe/status/1893456789012345671") == (anonymized, url)
@@ -0,0 +1,21 @@
+import asyncio
+import httpx
+from src.twitter import fetcher
+
+
+def test_unavailable_tweet_is_answered_from_negative_cache(monkeypatch):
+    calls = []
+
+    async def fake_get(client, url, headers):
+        calls.append(url)
+        return httpx.Response(404, request=httpx.Request("GET", url))
+
+    monkeypatch.setattr(fetcher, "_get_with_retry", fake_get)
+    fetcher.negative_cache.pop("404404")
+
+    assert asyncio.run(fetcher.fetch_tweet_html("404404", "user")) is None
+    assert asyncio.run(fetcher.fetch_tweet_html("404404", "user", "ru")) is None
+
+    assert len(calls) == 1
+    assert fetcher.get_unavailable_reason("404404") == "not_found"
+    fetcher.negative_cache.pop("404404")
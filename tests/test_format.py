@@ -1,6 +1,6 @@
 import pytest
-from src.utils.text_format import format_number, create_progress_bar, format_poll
-from src.twitter.models import Poll, PollOption
+from src.utils.text_format import format_number, create_progress_bar, format_poll, replace_stats_line
+from src.twitter.models import Poll, PollOption, TweetStats
 
 def test_format_number():
     """Тест форматирования чисел"""
@@ -40,4 +40,13 @@ def test_format_poll():
     assert "Python" in result
     assert "60%" in result
     assert "250 голосов" in result
-    assert "завершён" in result
\ No newline at end of file
+    assert "завершён" in result
+
+def test_replace_stats_line_updates_only_stats():
+    """Тест замены строки статистики в готовой карточке"""
+    card = "User (@user) — 14.02.2026, 12:00\n\nПривет\n\n💬 1  🔁 2  ❤️ 3  👁 —"
+
+    result = replace_stats_line(card, TweetStats(replies=10, reposts=2, likes=1500, views=2000000))
+
+    assert result == "User (@user) — 14.02.2026, 12:00\n\nПривет\n\n💬 10  🔁 2  ❤️ 1.5K  👁 2M"
+    assert replace_stats_line("без статистики", TweetStats()) == "без статистики"
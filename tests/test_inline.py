@@ -0,0 +1,72 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from telegram import InlineQueryResultArticle, InlineQueryResultCachedPhoto, InlineQueryResultPhoto
+from src.handlers import inline
+from src.handlers.inline import build_inline_results
+from src.twitter.models import Tweet, MediaItem
+from src.utils.cache import file_id_cache
+
+
+def make_tweet(media):
+    return Tweet(
+        display_name="User",
+        username="user",
+        url="https://x.com/user/status/1",
+        text="Hello",
+        date=datetime(2026, 2, 14, 12, 0),
+        media=media,
+    )
+
+
+def test_build_inline_results_uses_cached_file_id():
+    photo_url = "https://pbs.twimg.com/media/cached.jpg"
+    file_id_cache.set(photo_url, "FILE_ID")
+    try:
+        results = build_inline_results(make_tweet([MediaItem(type="photo", url=photo_url)]), "1", "card")
+    finally:
+        file_id_cache.pop(photo_url)
+
+    assert isinstance(results[0], InlineQueryResultCachedPhoto)
+    assert results[0].photo_file_id == "FILE_ID"
+    assert isinstance(results[-1], InlineQueryResultArticle)
+
+
+def test_build_inline_results_falls_back_to_urls_and_skips_video_without_thumbnail():
+    media = [
+        MediaItem(type="photo", url="https://pbs.twimg.com/media/new.jpg"),
+        MediaItem(type="video", url="https://video.twimg.com/v.mp4"),
+    ]
+
+    results = build_inline_results(make_tweet(media), "1", "card")
+
+    assert isinstance(results[0], InlineQueryResultPhoto)
+    assert results[0].caption == "card"
+    assert len(results) == 2
+    assert isinstance(results[1], InlineQueryResultArticle)
+
+
+def test_failed_inline_lookup_is_not_cached(monkeypatch):
+    answers = []
+
+    async def fake_answer(results, cache_time, is_personal):
+        answers.append((results, cache_time))
+
+    async def no_tweet(*args, **kwargs):
+        return None
+
+    async def settled(user_id):
+        return True
+
+    monkeypatch.setattr(inline, "get_cached_tweet", no_tweet)
+    monkeypatch.setattr(inline, "get_tweet", no_tweet)
+    monkeypatch.setattr(inline, "_wait_for_typing_to_settle", settled)
+    monkeypatch.setattr(inline.translate_settings, "get_language", no_tweet)
+    query = SimpleNamespace(
+        from_user=SimpleNamespace(id=1),
+        query="https://x.com/user/status/1",
+        answer=fake_answer,
+    )
+
+    asyncio.run(inline.handle_inline_query(SimpleNamespace(inline_query=query), None))
+    assert answers == [([], 0)]
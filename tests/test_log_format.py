@@ -0,0 +1,35 @@
+import json
+import logging
+from src.utils.log_format import JsonFormatter
+from src.utils.tracing import TraceIdFilter, start_trace
+
+
+def _record(msg, *args, **extra):
+    record = logging.LogRecord("src.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_renders_lazy_message_and_extra_fields():
+    record = _record("Карточка %s: %.2fс", "https://x.com/a/status/1", 1.234, total_seconds=1.234)
+    TraceIdFilter().filter(record)
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["message"] == "Карточка https://x.com/a/status/1: 1.23с"
+    assert payload["level"] == "INFO" and payload["logger"] == "src.test"
+    assert payload["total_seconds"] == 1.234
+    assert "trace_id" not in payload and "args" not in payload
+
+
+def test_json_formatter_includes_trace_id_and_exception():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        import sys
+        record = logging.LogRecord("src.test", logging.ERROR, __file__, 1, "failed", None, sys.exc_info())
+    with start_trace("message") as root:
+        TraceIdFilter().filter(record)
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert payload["trace_id"] == root.trace_id
+    assert "ValueError: boom" in payload["exception"]
@@ -0,0 +1,268 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from src.config import config
+from src.handlers import messages
+from src.twitter import service
+from src.twitter.models import Tweet, MediaItem, QuotedTweet
+from src.utils.quota import QUOTA_REDUCED, QUOTA_TEXT_ONLY
+
+
+class FakeMessage:
+    def __init__(self, message_id, **fields):
+        self.message_id = message_id
+        self.photo = fields.get("photo")
+        self.video = fields.get("video")
+        self.edits = []
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    async def send_message(self, **kwargs):
+        self.calls.append(("send_message", kwargs))
+        return FakeMessage(len(self.calls))
+
+    async def send_video(self, **kwargs):
+        self.calls.append(("send_video", kwargs))
+        return FakeMessage(len(self.calls), video=SimpleNamespace(file_id="VIDEO_ID"))
+
+    async def send_media_group(self, **kwargs):
+        self.calls.append(("send_media_group", kwargs))
+        return [FakeMessage(len(self.calls)) for _ in kwargs["media"]]
+
+    async def send_chat_action(self, **kwargs):
+        self.calls.append(("send_chat_action", kwargs))
+
+
+def make_update(message_id=10):
+    return SimpleNamespace(
+        effective_chat=SimpleNamespace(id=1),
+        effective_user=SimpleNamespace(id=1),
+        message=SimpleNamespace(message_id=message_id),
+    )
+
+
+def test_progressive_delivery_sends_card_before_media(monkeypatch, tmp_path):
+    video_path = tmp_path / "video.mp4"
+    video_path.write_bytes(b"video")
+    video_url = "https://video.twimg.com/progressive.mp4"
+
+    async def fake_download(url, media_type):
+        return str(video_path)
+
+    monkeypatch.setattr(config, "PROGRESSIVE_DELIVERY", True)
+    monkeypatch.setattr(messages, "download_media_file", fake_download)
+    monkeypatch.setattr(messages, "compress_video", lambda path: path)
+    monkeypatch.setattr(messages, "delete_files", lambda paths: None)
+
+    tweet = Tweet(
+        display_name="User",
+        username="user",
+        url="https://x.com/user/status/1",
+        text="Hello",
+        date=datetime(2026, 2, 14, 12, 0),
+        media=[MediaItem(type="video", url=video_url)],
+    )
+    bot = FakeBot()
+    context = SimpleNamespace(bot=bot)
+
+    asyncio.run(messages.send_tweet_card(make_update(), context, tweet))
+
+    sends = [name for name, _ in bot.calls if name != "send_chat_action"]
+    assert sends == ["send_message", "send_video"]
+    card_call = bot.calls[0][1]
+    video_call = next(kwargs for name, kwargs in bot.calls if name == "send_video")
+    assert "Hello" in card_call["text"]
+    assert video_call["caption"] is None
+    assert video_call["reply_to_message_id"] == 1
+    assert messages.file_id_cache.pop(video_url) == "VIDEO_ID"
+
+
+def test_reduce_media_over_quota():
+    photo = MediaItem(type="photo", url="https://pbs.twimg.com/media/a?format=jpg&name=orig")
+    video = MediaItem(type="video", url="https://video.twimg.com/v.mp4", thumbnail_url="https://pbs.twimg.com/thumb.jpg")
+    cached = MediaItem(type="video", url="https://video.twimg.com/cached.mp4")
+    messages.file_id_cache.set(cached.url, "CACHED_ID")
+    try:
+        reduced = messages.reduce_media([photo, video, cached], QUOTA_REDUCED)
+        text_only = messages.reduce_media([photo, video, cached], QUOTA_TEXT_ONLY)
+    finally:
+        messages.file_id_cache.pop(cached.url)
+
+    assert [(m.type, m.url) for m in reduced] == [
+        ("photo", "https://pbs.twimg.com/media/a?format=jpg&name=medium"),
+        ("photo", "https://pbs.twimg.com/thumb.jpg"),
+        ("video", cached.url),
+    ]
+    assert text_only == [cached]
+
+
+def test_medium_photo_url_sets_name_without_existing_parameter():
+    assert messages.medium_photo_url("https://pbs.twimg.com/media/X?format=jpg") == (
+        "https://pbs.twimg.com/media/X?format=jpg&name=medium"
+    )
+    assert messages.medium_photo_url("https://pbs.twimg.com/media/X.jpg") == "https://pbs.twimg.com/media/X.jpg?name=medium"
+    assert messages.medium_photo_url("https://pbs.twimg.com/media/X?name=large&format=png") == (
+        "https://pbs.twimg.com/media/X?format=png&name=medium"
+    )
+    # Чужие хосты не знают параметр name
+    assert messages.medium_photo_url("https://example.com/a.jpg?name=orig") == "https://example.com/a.jpg?name=orig"
+
+
+def test_quoted_tweet_loads_alongside_media_and_joins_album(monkeypatch, tmp_path):
+    own_url = "https://pbs.twimg.com/media/own.jpg"
+    quoted_url = "https://pbs.twimg.com/media/quoted.jpg"
+    events = []
+
+    async def fake_fetch_tweet_data(tweet_id, username, lang_code=None):
+        events.append("fetch start")
+        await asyncio.sleep(0.05)
+        events.append("fetch end")
+        return {"code": 200, "tweet": {"id": tweet_id, "quote": {"id": "2", "author": {"screen_name": "other"}}}}
+
+    async def fake_get_tweet(tweet_id, username, lang_code, url):
+        assert (tweet_id, username) == ("2", "other")
+        return Tweet(
+            display_name="Other",
+            username="other",
+            url=url,
+            text="Quoted",
+            date=datetime(2025, 1, 2, 3, 4),
+            media=[MediaItem(type="photo", url=quoted_url)],
+        )
+
+    async def fake_download(url, media_type):
+        events.append(f"download start {url.rsplit('/', 1)[1]}")
+        await asyncio.sleep(0.05)
+        path = tmp_path / url.rsplit("/", 1)[1]
+        path.write_bytes(b"photo")
+        return str(path)
+
+    monkeypatch.setattr(config, "INCLUDE_QUOTED_MEDIA", True)
+    monkeypatch.setattr(service, "fetch_tweet_data", fake_fetch_tweet_data)
+    monkeypatch.setattr(service, "get_tweet", fake_get_tweet)
+    monkeypatch.setattr(messages, "download_media_file", fake_download)
+    monkeypatch.setattr(messages, "compress_image", lambda path: path)
+    monkeypatch.setattr(messages, "delete_files", lambda paths: None)
+
+    tweet = Tweet(
+        display_name="User",
+        username="user",
+        url="https://x.com/user/status/1",
+        text="Look",
+        date=datetime(2026, 2, 14, 12, 0),
+        media=[MediaItem(type="photo", url=own_url)],
+        quoted_tweet=QuotedTweet(display_name="Other", username="other", url="https://x.com/other", text="Quoted"),
+    )
+    bot = FakeBot()
+
+    async def main():
+        quoted_task = messages.start_quoted_load(tweet, "1", "user", None)
+        await messages.send_tweet_card(make_update(), SimpleNamespace(bot=bot), tweet, quoted_task=quoted_task)
+
+    try:
+        asyncio.run(main())
+    finally:
+        service.tweet_links_cache.pop("1", None)
+
+    album = next(kwargs for name, kwargs in bot.calls if name == "send_media_group")
+    assert len(album["media"]) == 2
+    assert "02.01.2025, 03:04" in album["media"][0].caption
+    # Своё фото начало скачиваться до того, как загрузилась цитата, а медиа цитаты - после
+    assert events.index("download start own.jpg") < events.index("fetch end")
+    assert events.index("fetch end") < events.index("download start quoted.jpg")
+
+
+def test_text_card_is_edited_with_quote_in_background(monkeypatch):
+    events = []
+    release_fetch = None
+
+    async def fake_fetch_tweet_data(tweet_id, username, lang_code=None):
+        await release_fetch.wait()
+        events.append("fetch end")
+        return {"code": 200, "tweet": {"id": tweet_id, "quote": {"id": "2", "author": {"screen_name": "other"}}}}
+
+    async def fake_get_tweet(tweet_id, username, lang_code, url):
+        return Tweet(display_name="Other", username="other", url=url, text="Quoted", date=datetime(2025, 1, 2, 3, 4))
+
+    monkeypatch.setattr(service, "fetch_tweet_data", fake_fetch_tweet_data)
+    monkeypatch.setattr(service, "get_tweet", fake_get_tweet)
+    tweet = Tweet(
+        display_name="User",
+        username="user",
+        url="https://x.com/user/status/1",
+        text="Look",
+        date=datetime(2026, 2, 14, 12, 0),
+        quoted_tweet=QuotedTweet(display_name="Other", username="other", url="https://x.com/other", text="Quoted"),
+    )
+    card = FakeMessage(1)
+    bot = FakeBot()
+
+    async def send_message(**kwargs):
+        bot.calls.append(("send_message", kwargs))
+        return card
+
+    bot.send_message = send_message
+
+    async def main():
+        nonlocal release_fetch
+        release_fetch = asyncio.Event()
+        quoted_task = messages.start_quoted_load(tweet, "1", "user", None)
+        await messages.send_tweet_card(make_update(), SimpleNamespace(bot=bot), tweet, quoted_task=quoted_task)
+        # Обработчик вернулся сразу после отправки, цитата ещё грузится
+        events.append("card sent")
+        release_fetch.set()
+        while not card.edits:
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(asyncio.wait_for(main(), 2.0))
+    finally:
+        service.tweet_links_cache.pop("1", None)
+
+    assert events == ["card sent", "fetch end"]
+    assert [name for name, _ in bot.calls] == ["send_message"]
+    assert "02.01.2025, 03:04" in card.edits[0]
+
+
+def test_prepare_card_media_waits_for_cancelled_download(monkeypatch):
+    events = []
+    started = None
+
+    async def fake_download(url, media_type):
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        finally:
+            events.append("download stopped")
+
+    async def broken_quote(tweet, quoted_task):
+        await started.wait()
+        raise RuntimeError("quote")
+
+    monkeypatch.setattr(messages, "download_media_file", fake_download)
+    monkeypatch.setattr(messages, "wait_quoted_tweet", broken_quote)
+    tweet = Tweet(
+        display_name="User",
+        username="user",
+        url="https://x.com/user/status/1",
+        text="Look",
+        date=datetime(2026, 2, 14, 12, 0),
+        media=[MediaItem(type="photo", url="https://pbs.twimg.com/media/slow.jpg")],
+    )
+
+    async def main():
+        nonlocal started
+        started = asyncio.Event()
+        try:
+            await messages.prepare_card_media(tweet, None, messages.QUOTA_FULL, [], messages.MediaUsage())
+        except RuntimeError:
+            events.append("caller cleanup")
+
+    asyncio.run(main())
+    assert events == ["download stopped", "caller cleanup"]
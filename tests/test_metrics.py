@@ -0,0 +1,153 @@
+import asyncio
+import pytest
+from src.utils.metrics import RateWindow, Registry, registry, start_metrics_server
+
+
+def test_registry_renders_prometheus_text():
+    reg = Registry()
+    requests = reg.counter("app_requests", "Запросы", ("host", "status"))
+    latency = reg.histogram("app_latency_seconds", "Задержка", ("host",), buckets=(0.1, 1.0))
+    requests.inc(host="a", status=200)
+    requests.inc(2, host="a", status=200)
+    latency.observe(0.05, host="a")
+    latency.observe(0.5, host="a")
+    reg.register_collector(lambda: [("app_queue", "gauge", "Очередь", [({"name": 'q"1'}, 3)])])
+
+    text = reg.render()
+    assert "# TYPE app_requests_total counter" in text
+    assert 'app_requests_total{host="a",status="200"} 3' in text
+    assert 'app_latency_seconds_bucket{host="a",le="0.1"} 1' in text
+    assert 'app_latency_seconds_bucket{host="a",le="+Inf"} 2' in text
+    assert 'app_latency_seconds_count{host="a"} 2' in text
+    assert 'app_queue{name="q\\"1"} 3' in text
+
+
+def test_histogram_quantile_interpolates_within_bucket():
+    hist = Registry().histogram("h", "", buckets=(1.0, 2.0, 4.0))
+    for value in (0.5, 1.5, 1.5, 3.0):
+        hist.observe(value)
+    assert hist.quantile(0.5) == pytest.approx(1.5)
+    assert 2.0 <= hist.quantile(0.95) <= 4.0
+
+    by_stage = Registry().histogram("s", "", ("stage",))
+    by_stage.observe(0.2, stage="parse")
+    assert by_stage.quantile(0.5, stage="fetch") is None
+    assert by_stage.quantile(0.5) is not None
+
+
+def test_metrics_endpoint_serves_registry():
+    # Кэши регистрируют свои метрики при импорте
+    import src.utils.cache  # noqa: F401
+
+    async def scenario():
+        server = await start_metrics_server("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response.decode()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    response = asyncio.run(scenario())
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert 'pmtwitter_cache_entries{cache="tweet"}' in response
+    assert registry.render().split("\n")[0] in response
+
+
+def test_rate_window_counts_growth_per_minute():
+    now = [0.0]
+    value = [0]
+    rate = RateWindow(lambda: value[0], window=60, step=5, clock=lambda: now[0])
+    assert rate.per_minute() is None
+
+    for _ in range(30):
+        rate.sample()
+        now[0] += 5
+        value[0] += 10
+    # Снимки старше окна выброшены, скорость - по последней минуте
+    assert len(rate._samples) <= 14
+    assert rate.per_minute() == pytest.approx(120)
+
+    rate.sample()
+    rate.sample()  # чаще step не снимает
+    assert rate._samples[-1][0] == now[0] and rate._samples[-2][0] < now[0]
+
+
+def test_perf_command_reports_live_numbers(monkeypatch):
+    from types import SimpleNamespace
+    from src.config import config
+    from src.handlers import admin
+    from src.utils.metrics import STAGE_SECONDS
+
+    STAGE_SECONDS.observe(0.2, stage="fetch")
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=7),
+        message=SimpleNamespace(reply_text=reply_text),
+    )
+    monkeypatch.setattr(config, "ADMIN_USER_IDS", [])
+    asyncio.run(admin.perf(update, SimpleNamespace(args=[])))
+    assert replies == []
+
+    monkeypatch.setattr(config, "ADMIN_USER_IDS", [7])
+    asyncio.run(admin.perf(update, SimpleNamespace(args=[])))
+    text = replies[0]
+    assert "• fetch:" in text
+    assert "• tweet:" in text
+    assert "Сжатие: выполняется 0, в очереди 0" in text
+
+
+def test_compression_runs_in_thread_and_tracks_queue(monkeypatch):
+    import threading
+    from src.handlers import messages
+    from src.utils.metrics import COMPRESS_QUEUED, COMPRESS_RUNNING
+
+    seen = []
+
+    def fake_compress(path):
+        seen.append((threading.current_thread() is threading.main_thread(), COMPRESS_RUNNING.value()))
+        return path + ".small"
+
+    monkeypatch.setattr(messages, "compress_video", fake_compress)
+    monkeypatch.setattr(messages, "_compress_slots", asyncio.Semaphore(1))
+
+    async def scenario():
+        return await asyncio.gather(*(messages.run_compression("video", f"/tmp/{i}") for i in range(3)))
+
+    assert asyncio.run(scenario()) == ["/tmp/0.small", "/tmp/1.small", "/tmp/2.small"]
+    assert seen == [(False, 1)] * 3
+    assert COMPRESS_QUEUED.value() == 0 and COMPRESS_RUNNING.value() == 0
+
+
+def test_loop_watchdog_records_stack_of_blocking_call():
+    import time
+    from src.utils.metrics import LOOP_BLOCKED_TOTAL
+    from src.utils.watchdog import LoopWatchdog
+
+    watchdog = LoopWatchdog()
+    blocked_before = LOOP_BLOCKED_TOTAL.total()
+
+    def blocking_work():
+        time.sleep(0.3)
+
+    async def scenario():
+        watchdog.start(0.05)
+        await asyncio.sleep(0.1)
+        blocking_work()
+        await asyncio.sleep(0.1)
+        watchdog.stop()
+
+    asyncio.run(scenario())
+    assert LOOP_BLOCKED_TOTAL.total() == blocked_before + 1
+    block = watchdog.recent[-1]
+    assert "blocking_work" in block["location"] and "blocking_work" in block["stack"]
+    assert 0.2 < block["seconds"] < 0.5
@@ -0,0 +1,48 @@
+import asyncio
+import httpx
+from src.config import config
+from src.twitter.mirrors import MirrorPool
+
+
+def test_mirror_pool_hedges_slow_primary_and_cancels_it(monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_REQUESTS", True)
+    monkeypatch.setattr(config, "HEDGE_DELAY_MAX", 0.05)
+    pool = MirrorPool(["https://slow.test", "https://fast.test"])
+    cancelled = []
+
+    async def fetch(base_url):
+        if base_url == "https://slow.test":
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(base_url)
+                raise
+        return httpx.Response(200, text=base_url)
+
+    response = asyncio.run(pool.request(fetch))
+
+    assert response.text == "https://fast.test"
+    assert cancelled == ["https://slow.test"]
+    slow, fast = pool.mirrors
+    assert fast.wins == 1 and fast.hedges == 1
+    # Отменённый запрос - замер задержки снизу: медленное зеркало уходит вниз
+    assert slow.requests == 1 and slow.latency_ewma >= 0.05
+    assert [m.host for m in pool.ranked()] == ["fast.test", "slow.test"]
+
+    # Следующий запрос идёт сразу на быстрое зеркало, без ожидания хеджа
+    cancelled.clear()
+    assert asyncio.run(pool.request(fetch)).text == "https://fast.test"
+    assert cancelled == [] and fast.hedges == 1
+
+
+def test_mirror_pool_fails_over_and_ranks_healthy_mirror_first(monkeypatch):
+    monkeypatch.setattr(config, "HEDGE_REQUESTS", False)
+    pool = MirrorPool(["https://broken.test", "https://ok.test"])
+
+    async def fetch(base_url):
+        if base_url == "https://broken.test":
+            raise httpx.ConnectError("down")
+        return httpx.Response(200)
+
+    assert asyncio.run(pool.request(fetch)).status_code == 200
+    assert [m.host for m in pool.ranked()] == ["ok.test", "broken.test"]
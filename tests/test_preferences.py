@@ -0,0 +1,66 @@
+import asyncio
+import json
+from src.storage.backends import SQLiteBackend
+from src.storage.preferences import SCOPE_CHAT, SCOPE_USER, PreferencesStore
+from src.twitter.translate import TranslateSettings
+
+
+def test_store_persists_across_instances(tmp_path):
+    path = str(tmp_path / "prefs.db")
+
+    async def scenario():
+        backend = SQLiteBackend(path)
+        store = PreferencesStore(backend)
+        await store.set(SCOPE_USER, 1, "translate_lang", "en")
+        await store.set(SCOPE_CHAT, -100, "flags", {"spoilers": True})
+        await store.delete(SCOPE_USER, 2, "translate_lang")
+        await backend.close()
+
+        reopened = PreferencesStore(SQLiteBackend(path))
+        assert await reopened.get(SCOPE_USER, 1, "translate_lang") == "en"
+        assert await reopened.get(SCOPE_CHAT, -100, "flags") == {"spoilers": True}
+        assert await reopened.get(SCOPE_USER, 2, "translate_lang", "off") == "off"
+        assert reopened.backend._connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    asyncio.run(scenario())
+
+
+def test_translate_settings_migrates_legacy_json_once(tmp_path):
+    legacy = tmp_path / "translate_settings.json"
+    legacy.write_text(json.dumps({"1": "de", "2": "off"}), encoding="utf-8")
+    store = PreferencesStore(SQLiteBackend(str(tmp_path / "prefs.db")))
+
+    async def scenario():
+        settings = TranslateSettings(store, legacy_path=str(legacy))
+        assert await settings.get_language(1) == "de"
+        assert await settings.get_language(2) is None
+        assert not legacy.exists()
+        assert (tmp_path / "translate_settings.json.migrated").exists()
+
+        await settings.set_language(1, "fr")
+        # Повторная миграция не затирает новые значения
+        legacy.write_text(json.dumps({"1": "de"}), encoding="utf-8")
+        again = TranslateSettings(store, legacy_path=str(legacy))
+        assert await again.get_language(1) == "fr"
+
+    asyncio.run(scenario())
+
+
+def test_failed_json_read_is_retried_on_next_start(tmp_path):
+    legacy = tmp_path / "translate_settings.json"
+    legacy.write_text("{broken", encoding="utf-8")
+    backend = SQLiteBackend(str(tmp_path / "prefs.db"))
+    store = PreferencesStore(backend)
+
+    async def scenario():
+        settings = TranslateSettings(store, legacy_path=str(legacy))
+        assert await settings.get_language(8) is None
+        # JSON не прочитался - отметки нет, следующий запуск повторит перенос
+        assert await backend.get("migration:translate_settings_json") is None
+
+        legacy.write_text(json.dumps({"8": "ko"}), encoding="utf-8")
+        again = TranslateSettings(store, legacy_path=str(legacy))
+        assert await again.get_language(8) == "ko"
+        assert await backend.get("migration:translate_settings_json") is not None
+
+    asyncio.run(scenario())
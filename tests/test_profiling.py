@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from src.config import config
+from src.handlers import admin
+from src.utils import profiling
+from src.utils.profiling import (
+    memory_snapshot_diff,
+    sample_stacks,
+    sample_with_signal,
+    stop_memory_tracing,
+    summarize_stacks,
+)
+
+
+def busy_parsing(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampler_finds_busy_function_in_other_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_parsing, args=(stop,), name="worker")
+    worker.start()
+    try:
+        stacks, rounds = sample_stacks(0.3, interval=0.002)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert rounds > 10
+    worker_stacks = [stack for stack in stacks if stack.startswith("worker;")]
+    assert worker_stacks and all("busy_parsing (tests/test_profiling.py:" in stack for stack in worker_stacks)
+    summary = summarize_stacks(stacks, rounds)
+    assert "worker: работа в" in summary and "test_profiling.py" in summary
+
+
+def test_signal_sampler_catches_work_inside_event_loop(monkeypatch):
+    async def loop_work():
+        while True:
+            sorted(range(20000), key=lambda value: -value)
+            await asyncio.sleep(0)
+
+    async def scenario():
+        work = asyncio.create_task(loop_work())
+        try:
+            return await sample_with_signal(0.3, interval=0.002)
+        finally:
+            work.cancel()
+
+    enumerated = []
+    real_enumerate = threading.enumerate
+
+    def counting_enumerate():
+        enumerated.append(threading.get_ident())
+        return real_enumerate()
+
+    monkeypatch.setattr(profiling.threading, "enumerate", counting_enumerate)
+    stacks, rounds = asyncio.run(scenario())
+    assert rounds > 10
+    # Обработчик сигнала не трогает блокировки threading: список потоков снят один раз до таймера
+    assert len(enumerated) == 1
+    assert sum(count for stack, count in stacks.items() if "loop_work" in stack) > rounds / 2
+
+
+def test_memsnap_reports_growth_by_line():
+    kept = []
+    try:
+        first, data = memory_snapshot_diff()
+        assert "tracemalloc включён" in first and data is None
+        kept.append([bytearray(1024) for _ in range(2000)])
+        summary, data = memory_snapshot_diff()
+        assert "tests/test_profiling.py" in summary.splitlines()[3]
+        assert b"tests/test_profiling.py" in data
+    finally:
+        stop_memory_tracing()
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_command_sends_summary_and_file(monkeypatch):
+    replies, documents = [], []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    async def reply_document(document, filename, **kwargs):
+        documents.append((filename, document))
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=3),
+        message=SimpleNamespace(reply_text=reply_text, reply_document=reply_document),
+    )
+    monkeypatch.setattr(config, "ADMIN_USER_IDS", [3])
+    monkeypatch.setattr(admin, "PROFILE_MAX_SECONDS", 1)
+
+    async def scenario():
+        profiling = asyncio.create_task(admin.profile(update, SimpleNamespace(args=["5", "cprofile"])))
+        await asyncio.sleep(0.1)
+        await admin.profile(update, SimpleNamespace(args=[]))
+        # Работа в event loop во время профиля попадает в отчёт
+        started = time.monotonic()
+        while time.monotonic() - started < 0.1:
+            sorted(range(1000), key=lambda value: -value)
+        await profiling
+
+    asyncio.run(scenario())
+    assert replies[0] == "Профилирую 1 с (cprofile)..."
+    assert "уже идёт" in replies[1]
+    assert "tottime" in replies[2]
+    assert documents[0][0].endswith(".prof") and documents[0][1]
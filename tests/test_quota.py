@@ -0,0 +1,43 @@
+from src.utils.quota import QUOTA_FULL, QUOTA_REDUCED, QUOTA_TEXT_ONLY, MediaQuota, MediaUsage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_quota(clock):
+    return MediaQuota(
+        window=60, user_mb=10, user_encode_seconds=30,
+        chat_mb=100, chat_encode_seconds=300, text_only_factor=2, clock=clock,
+    )
+
+
+def test_quota_degrades_by_bytes_and_encode_time():
+    clock = FakeClock()
+    quota = make_quota(clock)
+    assert quota.level(1, 1) == QUOTA_FULL
+
+    quota.charge(1, 1, MediaUsage(bytes=12 * 1024 * 1024))
+    assert quota.level(1, 1) == QUOTA_REDUCED
+    # Другой пользователь в другом чате не затронут
+    assert quota.level(2, 2) == QUOTA_FULL
+
+    quota.charge(1, 1, MediaUsage(encode_seconds=61))
+    assert quota.level(1, 1) == QUOTA_TEXT_ONLY
+
+
+def test_quota_window_rolls_and_idle_keys_are_evicted():
+    clock = FakeClock()
+    quota = make_quota(clock)
+    quota.charge(1, 1, MediaUsage(bytes=25 * 1024 * 1024))
+    assert quota.level(1, 1) == QUOTA_TEXT_ONLY
+
+    clock.now += 61
+    assert quota.level(1, 1) == QUOTA_FULL
+
+    quota.charge(2, 2, MediaUsage(bytes=1))
+    assert len(quota.usage) == 2  # ключи user:1/chat:1 вытеснены
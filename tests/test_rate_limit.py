@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from src.config import config
+from src.storage.backends import MemoryBackend, SQLiteBackend
+from src.utils.rate_limit import check_thread_cost
+from src.utils.token_bucket import TokenBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_allows_burst_then_refills():
+    clock = FakeClock()
+    buckets = TokenBuckets(clock)
+    request = [("user", 3, 0.5, 1)]
+
+    assert all(buckets.take(request) for _ in range(3))
+    assert not buckets.take(request)
+
+    clock.now += 2  # один токен за 2 секунды
+    assert buckets.take(request)
+    assert not buckets.take(request)
+
+
+def test_bucket_takes_all_or_nothing():
+    buckets = TokenBuckets(FakeClock())
+    assert buckets.take([("chat", 2, 1, 2)])
+
+    # В bucket'е чата токенов нет: пользовательский bucket не должен пострадать
+    assert not buckets.take([("user", 2, 1, 2), ("chat", 2, 1, 1)])
+    assert buckets.take([("user", 2, 1, 2)])
+
+
+def test_refilled_buckets_are_evicted_without_scan():
+    clock = FakeClock()
+    buckets = TokenBuckets(clock)
+    for user_id in range(1000):
+        buckets.take([(f"user:{user_id}", 3, 1, 1)])
+    assert len(buckets) == 1000
+
+    clock.now += 1  # все bucket'ы снова полны
+    buckets.take([("fresh", 3, 1, 1)])
+    assert len(buckets) == 1
+
+
+@pytest.mark.parametrize("make_backend", [MemoryBackend, lambda: SQLiteBackend(":memory:")])
+def test_backend_take_tokens(make_backend):
+    backend = make_backend()
+
+    async def scenario():
+        assert await backend.take_tokens([("rl:user:1", 2, 0.2, 2), ("rl:chat:1", 5, 0.2, 2)])
+        assert not await backend.take_tokens([("rl:user:1", 2, 0.2, 1), ("rl:chat:1", 5, 0.2, 1)])
+        assert await backend.take_tokens([("rl:user:2", 2, 0.2, 1), ("rl:chat:1", 5, 0.2, 3)])
+        assert not await backend.take_tokens([("rl:user:3", 2, 0.2, 1), ("rl:chat:1", 5, 0.2, 1)])
+
+    asyncio.run(scenario())
+
+
+def test_thread_cost_above_burst_is_reported(monkeypatch, caplog):
+    monkeypatch.setattr(config, "RATE_LIMIT_BURST", 3)
+    monkeypatch.setattr(config, "THREAD_RATE_COST", 3)
+    check_thread_cost()
+    assert "THREAD_RATE_COST" not in caplog.text
+
+    monkeypatch.setattr(config, "THREAD_RATE_COST", 5)
+    check_thread_cost()
+    assert "THREAD_RATE_COST=5 больше RATE_LIMIT_BURST=3" in caplog.text
@@ -0,0 +1,78 @@
+import asyncio
+import httpx
+from src.config import config
+from src.twitter import fetcher
+from src.utils import retry as retry_module
+from src.utils.deadline import request_deadline
+from src.utils.retry import RetryBudget, parse_retry_after
+
+
+class FakeClient:
+    timeout = httpx.Timeout(30.0)
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def build_request(self, method, url, headers=None, **kwargs):
+        return httpx.Request(method, url, headers=headers)
+
+    async def send(self, request, stream=False):
+        self.calls += 1
+        response = self.responses.pop(0)
+        response.request = request
+        return response
+
+
+def test_parse_retry_after_seconds_and_garbage():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_retry_budget_caps_retries_by_ratio(monkeypatch):
+    monkeypatch.setattr(retry_module.time, "monotonic", lambda: 100.0)
+    budget = RetryBudget(ratio=0.2, min_retries=1)
+    for _ in range(10):
+        budget.record_request()
+
+    assert budget.try_acquire_retry()
+    assert budget.try_acquire_retry()
+    assert not budget.try_acquire_retry()
+    assert budget.denied == 1
+
+
+def test_get_with_retry_honors_retry_after(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    client = FakeClient([
+        httpx.Response(429, headers={"Retry-After": "2"}),
+        httpx.Response(200, text="ok"),
+    ])
+
+    response = asyncio.run(fetcher._get_with_retry(client, "https://retry-after.test/a", {}))
+
+    assert response.status_code == 200
+    assert sleeps == [2.0]
+
+
+def test_get_with_retry_stops_when_deadline_is_too_close(monkeypatch):
+    monkeypatch.setattr(config, "RETRY_MAX_ATTEMPTS", 5)
+    client = FakeClient([httpx.Response(503, headers={"Retry-After": "10"})])
+
+    async def run():
+        with request_deadline(1.0):
+            return await fetcher._get_with_retry(client, "https://deadline.test/a", {})
+
+    try:
+        asyncio.run(run())
+    except httpx.HTTPStatusError as e:
+        assert e.response.status_code == 503
+    else:
+        raise AssertionError("ожидалась ошибка HTTP 503")
+    assert client.calls == 1
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+
+from src.media import compress
+from src.media.cleanup import cleanup_tracked_files, delete_file, track_file, tracked_files
+from src.utils.shutdown import InflightTracker
+
+
+def test_drain_waits_for_fast_cards_and_cancels_slow_ones():
+    tracker = InflightTracker()
+    cleaned = []
+
+    async def card(seconds: float, name: str):
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            cleaned.append(name)
+
+    async def main():
+        fast = asyncio.create_task(tracker.run(card(0.05, "fast")))
+        slow = asyncio.create_task(tracker.run(card(10, "slow")))
+        await asyncio.sleep(0)
+        assert len(tracker) == 2
+
+        cancelled = await tracker.drain(timeout=0.3)
+        assert cancelled == 1
+        assert await fast is True
+        assert await slow is False
+        assert await tracker.run(card(0, "late")) is False
+
+    asyncio.run(main())
+    assert cleaned == ["fast", "slow"]
+    assert not tracker.accepting and len(tracker) == 0
+
+
+def test_cancelling_caller_is_not_mistaken_for_drain():
+    tracker = InflightTracker()
+
+    async def main():
+        caller = asyncio.create_task(tracker.run(asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        caller.cancel()
+        try:
+            await caller
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+    assert tracker.accepting and len(tracker) == 0
+
+
+def test_tracked_files_are_cleaned_without_scanning_tmp(tmp_path):
+    old, fresh, untracked = (tmp_path / name for name in ("old", "fresh", "untracked"))
+    for path in (old, fresh, untracked):
+        path.write_bytes(b"x")
+    track_file(str(old))
+    track_file(str(fresh))
+    delete_file(str(fresh))
+    fresh.write_bytes(b"x")
+
+    assert cleanup_tracked_files() >= 1
+    assert not old.exists() and fresh.exists() and untracked.exists()
+    assert str(old) not in tracked_files()
+
+
+def test_terminate_ffmpeg_stops_running_children():
+    result = {}
+    worker = threading.Thread(target=lambda: result.setdefault("code", compress._run_ffmpeg(["sleep", "30"], 60)))
+    started = time.monotonic()
+    worker.start()
+    while not compress._ffmpeg_processes and time.monotonic() - started < 5:
+        time.sleep(0.01)
+
+    assert compress.terminate_ffmpeg() == 1
+    worker.join(5)
+    assert not worker.is_alive() and result["code"] != 0
+    assert not compress._ffmpeg_processes
+    assert time.monotonic() - started < 5
+
+
+def test_drain_cancels_spawned_background_tasks():
+    tracker = InflightTracker()
+    cleaned = []
+
+    async def edit():
+        try:
+            await asyncio.sleep(10)
+        finally:
+            cleaned.append("edit")
+
+    async def main():
+        assert tracker.spawn(edit())
+        await asyncio.sleep(0)
+        assert len(tracker) == 1
+        assert await tracker.drain(timeout=0.1) == 1
+        assert not tracker.spawn(edit())
+
+    asyncio.run(main())
+    assert cleaned == ["edit"] and len(tracker) == 0
@@ -0,0 +1,16 @@
+from benchmarks.startup import DEFAULT_FORBIDDEN, forbidden_imports, parse_importtime, run
+
+
+def test_parse_importtime_skips_header():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   encodings\n"
+        "import time:      3148 |       3539 |       src.twitter.fetcher\n"
+    )
+    assert parse_importtime(stderr) == [("encodings", 120, 120), ("src.twitter.fetcher", 3148, 3539)]
+
+
+def test_bot_starts_without_heavy_modules():
+    result = run("src.bot", repeat=1)
+    assert "src.handlers.messages" in result["modules"]
+    assert forbidden_imports(result, DEFAULT_FORBIDDEN.split(",")) == []
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from src.config import config
+from src.handlers import messages
+from src.twitter import service, thread
+from src.twitter.models import Tweet
+from src.utils.cache import tweet_links_cache
+from src.utils.text_format import format_thread_messages
+
+
+def make_tweet(tweet_id: str, text: str = "post") -> Tweet:
+    return Tweet(
+        display_name="Author",
+        username="author",
+        url=f"https://x.com/author/status/{tweet_id}",
+        text=text,
+        date=datetime(2026, 2, 14, 12, 0),
+    )
+
+
+def test_unroll_walks_self_replies_with_bounded_concurrency(monkeypatch):
+    # 105 -> 104 -> 103 -> 102 (ответ другому пользователю, тред начинается с 102)
+    parents = {"105": ("104", "author"), "104": ("103", "Author"), "103": ("102", "author"), "102": ("101", "someone")}
+    api_calls = []
+    active = peak = 0
+
+    async def fake_fetch_tweet_data(tweet_id, username, lang_code=None):
+        api_calls.append(tweet_id)
+        parent, replying_to = parents[tweet_id]
+        return {"code": 200, "tweet": {"id": tweet_id, "replying_to_status": parent, "replying_to": replying_to}}
+
+    async def fake_get_tweet(tweet_id, username, lang_code, url):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return None if tweet_id == "103" else make_tweet(tweet_id)
+
+    tweet_links_cache.clear()
+    monkeypatch.setattr(service, "fetch_tweet_data", fake_fetch_tweet_data)
+    monkeypatch.setattr(thread, "get_tweet", fake_get_tweet)
+    monkeypatch.setattr(config, "THREAD_FETCH_CONCURRENCY", 2)
+
+    tweets = asyncio.run(thread.unroll_thread("105", "author", None))
+    assert [t.url.rsplit("/", 1)[1] for t in tweets] == ["102", "104", "105"]
+    assert peak <= 2
+
+    # Связи закэшированы: повторный разворот не ходит в API
+    api_calls.clear()
+    monkeypatch.setattr(config, "THREAD_MAX_TWEETS", 2)
+    tweets = asyncio.run(thread.unroll_thread("105", "author", None))
+    assert [t.url.rsplit("/", 1)[1] for t in tweets] == ["104", "105"]
+    assert api_calls == []
+
+
+def test_thread_text_is_merged_into_fewest_messages():
+    short = [make_tweet(str(i), f"post {i} & @friend") for i in range(1, 6)]
+    messages = format_thread_messages(short)
+    assert len(messages) == 1
+    assert "5/5" in messages[0] and "&amp;" in messages[0]
+
+    long = [make_tweet(str(i), "word " * 300) for i in range(1, 5)]
+    messages = format_thread_messages(long, limit=4096)
+    assert all(len(message) <= 4096 for message in messages)
+    assert len(messages) == 2
+    assert sum(message.count("word") for message in messages) == 1200
+
+    huge = [make_tweet("1", "@" + "a" * 30 + " " + "слово " * 2000)]
+    messages = format_thread_messages(huge, limit=1000)
+    assert all(len(message) <= 1000 for message in messages)
+    assert sum(message.count("слово") for message in messages) == 2000
+
+
+def test_single_tweet_thread_hints_to_send_last_tweet(monkeypatch):
+    sent = []
+
+    async def fake_unroll(tweet_id, username, lang_code):
+        return [make_tweet(tweet_id)]
+
+    async def fake_card(*args):
+        sent.append("card")
+
+    async def fake_send_message(**kwargs):
+        sent.append(kwargs["text"])
+
+    monkeypatch.setattr(messages, "unroll_thread", fake_unroll)
+    monkeypatch.setattr(messages, "send_tweet_card", fake_card)
+    update = SimpleNamespace(
+        effective_chat=SimpleNamespace(id=1),
+        effective_user=SimpleNamespace(id=1),
+        message=SimpleNamespace(message_id=10),
+    )
+    context = SimpleNamespace(bot=SimpleNamespace(send_message=fake_send_message))
+
+    assert asyncio.run(messages.process_tweet_url(update, context, "https://x.com/author/status/1", unroll=True))
+    assert sent[0] == "card" and "последний твит" in sent[1]
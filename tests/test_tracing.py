@@ -0,0 +1,102 @@
+import asyncio
+import html
+import logging
+from types import SimpleNamespace
+from src.config import config
+from src.handlers import admin
+from src.utils import tracing
+from src.utils.tracing import TraceIdFilter, format_trace, set_attributes, span, start_trace
+
+
+def test_spans_nest_across_tasks_and_slow_traces_are_kept(monkeypatch):
+    monkeypatch.setattr(config, "TRACE_SLOW_SECONDS", 0)
+    tracing.slow_traces.clear()
+
+    async def fetch():
+        with span("http", host="fx.test") as http_span:
+            await asyncio.sleep(0)
+            http_span.set(status=200)
+
+    async def scenario():
+        with start_trace("message", chat_id=1) as root:
+            set_attributes(links=1)
+            with span("card"):
+                await asyncio.create_task(fetch())
+        return root
+
+    root = asyncio.run(scenario())
+    assert root.attributes == {"chat_id": 1, "links": 1}
+    trace = tracing.slow_traces[-1]
+    assert trace["trace_id"] == root.trace_id
+    http = trace["children"][0]["children"][0]
+    assert http["name"] == "http" and http["attributes"] == {"host": "fx.test", "status": 200}
+
+    text = format_trace(trace)
+    assert text.splitlines()[2].startswith("    +")
+    assert "http host=fx.test status=200" in text
+
+
+def test_span_outside_trace_is_noop():
+    with span("orphan") as orphan:
+        assert orphan is None
+    assert tracing.current_trace_id() is None
+
+
+def test_log_records_get_trace_id():
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", None, None)
+    TraceIdFilter().filter(record)
+    assert record.trace_id == "-"
+
+    with start_trace("message") as root:
+        TraceIdFilter().filter(record)
+    assert record.trace_id == root.trace_id
+
+
+def test_traces_command_is_admin_only(monkeypatch):
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=5),
+        message=SimpleNamespace(reply_text=reply_text),
+    )
+    context = SimpleNamespace(args=[])
+
+    monkeypatch.setattr(config, "ADMIN_USER_IDS", [])
+    asyncio.run(admin.traces(update, context))
+    assert replies == []
+
+    monkeypatch.setattr(config, "ADMIN_USER_IDS", [5])
+    tracing.slow_traces.clear()
+    asyncio.run(admin.traces(update, context))
+    assert "Медленных запросов" in replies[0]
+
+
+def test_long_trace_is_cut_before_escaping(monkeypatch):
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    def node(name, children=()):
+        return {
+            "name": name, "offset": 0.0, "duration": 0.5, "error": None, "finished": True,
+            "attributes": {"url": "https://x.com/a?b=1&c=2&d=<3>"}, "children": list(children),
+        }
+
+    trace = node("message", [node(f"card {i}") for i in range(200)])
+    trace.update(trace_id="t1", started_at=0.0)
+    monkeypatch.setattr(config, "ADMIN_USER_IDS", [5])
+    monkeypatch.setattr(tracing, "slow_traces", [trace])
+    monkeypatch.setattr(admin, "slow_traces", tracing.slow_traces)
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=5), message=SimpleNamespace(reply_text=reply_text))
+
+    asyncio.run(admin.traces(update, SimpleNamespace(args=[])))
+    text = replies[0]
+    assert len(text) <= admin.MESSAGE_LIMIT
+    assert text.startswith("<b>") and text.endswith("</pre>")
+    body = text.split("<pre>", 1)[1][:-len("</pre>")]
+    # Ни одна сущность не разрезана: текст заново экранируется в тот же HTML
+    assert html.escape(html.unescape(body)) == body